@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from settings import CACHE_DIR, env_bool, env_int
+from singleflight import try_file_lock
+
+logger = logging.getLogger(__name__)
+
+# Artifact kinds stored per video
+KIND_AUDIO = "audio"      # the downloaded audio stream, in whatever container YouTube served
+KIND_PCM = "pcm16k"       # 16 kHz mono s16le PCM, ready for either Whisper backend
+
+# Partial files older than this are leftovers from a crashed process
+_STALE_TMP_SECONDS = 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    video_id    TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    size_bytes  INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (video_id, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_last_access ON artifacts (last_access);
+"""
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class AudioCache:
+    """
+    A size-capped, content-addressed store for downloaded audio and decoded PCM.
+
+    Blobs live under objects/<sha[:2]>/<sha> and a SQLite index maps (video_id, kind) to a
+    blob. New artifacts are written under tmp/ and only renamed into objects/ (and indexed)
+    once complete, so a partial download is never picked up. When the total exceeds
+    max_bytes the least recently used artifacts are evicted, skipping any video whose lock
+    file is held, since that video is being worked on by this or another process.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, "objects")
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.locks_dir = os.path.join(root, "locks")
+        for path in (self.objects_dir, self.tmp_dir, self.locks_dir):
+            os.makedirs(path, exist_ok=True)
+        self.db_path = os.path.join(root, "index.sqlite3")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        self._clean_stale_tmp()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _clean_stale_tmp(self) -> None:
+        cutoff = time.time() - _STALE_TMP_SECONDS
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _blob_path(self, sha: str) -> str:
+        return os.path.join(self.objects_dir, sha[:2], sha)
+
+    def lock_path(self, video_id: str) -> str:
+        """The lock file guarding work on one video's artifacts."""
+        return os.path.join(self.locks_dir, f"{video_id}.lock")
+
+    def tmp_path(self, suffix: str = "") -> str:
+        """A fresh path under tmp/ to write a new artifact to before put()."""
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}{suffix}")
+
+    def partial_path(self, video_id: str) -> str:
+        """A stable tmp/ path for downloading one video's audio, so an interrupted download can resume."""
+        return os.path.join(self.tmp_dir, f"{video_id}.download")
+
+    def get(self, video_id: str, kind: str) -> str | None:
+        """Return the path of a cached artifact, or None. Marks it as recently used."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM artifacts WHERE video_id = ? AND kind = ?", (video_id, kind)
+            ).fetchone()
+            if row is None:
+                return None
+            path = self._blob_path(row[0])
+            if not os.path.exists(path):
+                conn.execute("DELETE FROM artifacts WHERE video_id = ? AND kind = ?", (video_id, kind))
+                return None
+            conn.execute(
+                "UPDATE artifacts SET last_access = ? WHERE video_id = ? AND kind = ?",
+                (time.time(), video_id, kind),
+            )
+        return path
+
+    def put(self, video_id: str, kind: str, tmp_path: str) -> str:
+        """Move a completed file from tmp/ into the store, index it and enforce the size cap."""
+        sha = _sha256_file(tmp_path)
+        size = os.path.getsize(tmp_path)
+        blob = self._blob_path(sha)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(tmp_path, blob)  # atomic on the same filesystem
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts (video_id, kind, sha256, size_bytes, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, kind, sha, size, now, now),
+            )
+        logger.info(f"Stored {kind} for {video_id} in audio cache ({size} bytes, {sha[:12]})")
+        self.evict()
+        return blob
+
+    def evict(self) -> None:
+        """Evict least recently used artifacts until the store fits within max_bytes."""
+        if self.max_bytes <= 0:
+            return
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM artifacts").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = conn.execute(
+                "SELECT video_id, kind, sha256, size_bytes FROM artifacts ORDER BY last_access ASC"
+            ).fetchall()
+            for video_id, kind, sha, size in rows:
+                if total <= self.max_bytes:
+                    break
+                with try_file_lock(self.lock_path(video_id)) as acquired:
+                    if not acquired:
+                        continue
+                    conn.execute("DELETE FROM artifacts WHERE video_id = ? AND kind = ?", (video_id, kind))
+                    still_used = conn.execute("SELECT 1 FROM artifacts WHERE sha256 = ?", (sha,)).fetchone()
+                    if not still_used:
+                        try:
+                            os.remove(self._blob_path(sha))
+                        except FileNotFoundError:
+                            pass
+                    total -= size
+                    logger.info(f"Evicted {kind} for {video_id} from audio cache ({size} bytes)")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Keep decoded 16 kHz PCM next to the download so re-transcribing skips both download and ffmpeg
+KEEP_PCM = env_bool("AUDIO_CACHE_KEEP_PCM", False)
+
+
+def get_audio_cache() -> AudioCache:
+    """Return the process-wide audio cache, configured from AUDIO_CACHE_DIR / AUDIO_CACHE_MAX_MB."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            root = os.getenv("AUDIO_CACHE_DIR", os.path.join(CACHE_DIR, "audio"))
+            max_bytes = env_int("AUDIO_CACHE_MAX_MB", 2048) * 1024 * 1024
+            logger.info(f"Opening audio cache at {root} (max={max_bytes} bytes, keep_pcm={KEEP_PCM})")
+            _cache = AudioCache(root, max_bytes)
+        return _cache
@@ -0,0 +1,83 @@
+import logging
+import re
+
+from settings import env_int
+
+logger = logging.getLogger(__name__)
+
+# Whisper resamples everything to 16 kHz mono, so anything much above speech quality is wasted
+# bandwidth. YouTube's low-bitrate opus (~50-70 kbps) and 48 kbps m4a are plenty for ASR.
+MIN_AUDIO_KBPS = env_int("AUDIO_MIN_KBPS", 32)
+# Fragments fetched in parallel for DASH/HLS formats, and the range size used to split plain
+# HTTP downloads (YouTube throttles long single requests).
+FRAGMENT_CONCURRENCY = env_int("AUDIO_DOWNLOAD_FRAGMENTS", 4)
+HTTP_CHUNK_BYTES = env_int("AUDIO_DOWNLOAD_CHUNK_MB", 10) * 1024 * 1024
+
+
+# yt-dlp format sort that ranks the *smallest* stream as "best". yt-dlp's own worstaudio/worst
+# rank by codec and container preference first, so they can still pick a 128 kbps m4a.
+ASR_FORMAT_SORT = ['+abr', '+size', '+res']
+
+
+def audio_format_selector(min_kbps: int = MIN_AUDIO_KBPS) -> str:
+    """
+    The yt-dlp format selector for ASR, used together with ASR_FORMAT_SORT: the smallest
+    audio-only format of at least min_kbps, then the smallest audio-only format, and only if
+    there is none, the smallest muxed format rather than a full-quality video.
+    """
+    return f"bestaudio[abr>={min_kbps}]/bestaudio/best"
+
+
+def ydl_download_options(outtmpl: str, progress_hooks: list | None = None) -> dict:
+    """
+    yt-dlp options for downloading audio to outtmpl. Partial downloads are kept and resumed
+    (outtmpl + '.part'), so outtmpl should be stable per video for a retry to pick them up.
+    """
+    return {
+        'format': audio_format_selector(),
+        'format_sort': ASR_FORMAT_SORT,
+        'outtmpl': outtmpl,
+        'quiet': True,
+        'noprogress': True,
+        'continuedl': True,
+        'nopart': False,
+        'overwrites': False,
+        'concurrent_fragment_downloads': FRAGMENT_CONCURRENCY,
+        'http_chunk_size': HTTP_CHUNK_BYTES,
+        'retries': 5,
+        'fragment_retries': 5,
+        'logger': logger,
+        'progress_hooks': progress_hooks or [],
+    }
+
+
+def _kbps(abr: str | None) -> int | None:
+    """Parse pytube's '48kbps' style bitrate."""
+    match = re.match(r"(\d+)", abr or "")
+    return int(match.group(1)) if match else None
+
+
+def pick_pytube_stream(streams, min_kbps: int = MIN_AUDIO_KBPS):
+    """
+    Apply the same policy to a pytube StreamQuery: the lowest-bitrate audio-only stream of at
+    least min_kbps, else the lowest-bitrate audio-only stream, else the smallest progressive one.
+    """
+    audio = sorted(
+        (s for s in streams.filter(only_audio=True) if _kbps(s.abr) is not None),
+        key=lambda s: _kbps(s.abr),
+    )
+    sufficient = [s for s in audio if _kbps(s.abr) >= min_kbps]
+    if sufficient:
+        return sufficient[0]
+    if audio:
+        # Like yt-dlp's 'bestaudio' under ASR_FORMAT_SORT, which ranks the lowest bitrate first
+        return audio[0]
+    return streams.filter(progressive=True).order_by('resolution').asc().first()
+
+
+def describe_format(info: dict) -> str:
+    """A short human-readable label for a yt-dlp format dict, e.g. '249 opus 50 kbps'."""
+    parts = [str(info.get("format_id") or "?"), info.get("acodec") or info.get("ext") or ""]
+    if info.get("abr"):
+        parts.append(f"{round(info['abr'])} kbps")
+    return " ".join(p for p in parts if p)
@@ -0,0 +1,142 @@
+import io
+import logging
+import queue
+import subprocess
+import threading
+import wave
+from typing import TYPE_CHECKING
+
+from audio_formats import ASR_FORMAT_SORT, audio_format_selector, describe_format
+
+if TYPE_CHECKING:
+    import numpy as np  # imported on first use; only needed for the annotation here
+
+logger = logging.getLogger(__name__)
+
+# Whisper (both backends) works on 16 kHz mono 16-bit PCM
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+# Sentinel placed on the chunk queue when ffmpeg has no more output
+_EOF = object()
+
+
+def resolve_stream_url(video_url: str) -> tuple[str, dict, dict] | None:
+    """
+    Resolve the direct media URL (and the HTTP headers yt-dlp would send) for the smallest audio
+    format that is good enough for ASR, so ffmpeg can read it straight from the network.
+    Returns (url, headers, {'format', 'filesize', 'duration'}), or None if there isn't one. filesize
+    is yt-dlp's (possibly approximate) size of the stream, or 0 if unknown; duration is in seconds,
+    or None if unknown.
+    """
+    import yt_dlp
+
+    ydl_opts = {
+        'format': audio_format_selector(),
+        'format_sort': ASR_FORMAT_SORT,
+        'noplaylist': True,
+        'quiet': True,
+        'noprogress': True,
+        'logger': logger,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(video_url, download=False)
+    stream_url = info.get("url")
+    if not stream_url:
+        logger.warning("yt-dlp did not return a direct stream URL.")
+        return None
+    stream_format = {
+        "format": describe_format(info),
+        "filesize": int(info.get("filesize") or info.get("filesize_approx") or 0),
+        "duration": info.get("duration"),
+    }
+    logger.info(f"Streaming audio format {stream_format['format']} (~{stream_format['filesize']} bytes)")
+    return stream_url, info.get("http_headers") or {}, stream_format
+
+
+class PcmStream:
+    """
+    Downloads and decodes an audio stream with a single ffmpeg process, yielding 16 kHz mono
+    PCM in fixed-length chunks as soon as each one is decoded.
+
+    A reader thread drains ffmpeg's stdout into a bounded queue, so download and decode keep
+    going while the consumer transcribes the previous chunk, and nothing is written to disk.
+    """
+
+    def __init__(self, source: str, headers: dict | None = None, chunk_seconds: int = 120, max_buffered: int = 8):
+        self.source = source
+        self.headers = headers or {}
+        self.chunk_bytes = max(1, chunk_seconds) * SAMPLE_RATE * BYTES_PER_SAMPLE
+        self._chunks = queue.Queue(maxsize=max_buffered)
+        self._proc = None
+        self._reader = None
+        self.bytes_decoded = 0
+
+    def _command(self) -> list[str]:
+        cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error']
+        if self.headers and "://" in self.source:
+            header_blob = "".join(f"{k}: {v}\r\n" for k, v in self.headers.items())
+            cmd += ['-headers', header_blob]
+        cmd += ['-i', self.source, '-vn', '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1']
+        return cmd
+
+    def _read_loop(self):
+        try:
+            while True:
+                chunk = self._proc.stdout.read(self.chunk_bytes)
+                if not chunk:
+                    break
+                self.bytes_decoded += len(chunk)
+                self._chunks.put(chunk)
+        finally:
+            self._chunks.put(_EOF)
+
+    def __enter__(self):
+        logger.info("Starting streaming ffmpeg decode...")
+        self._proc = subprocess.Popen(self._command(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._reader = threading.Thread(target=self._read_loop, name="pcm-reader", daemon=True)
+        self._reader.start()
+        return self
+
+    def __iter__(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is _EOF:
+                break
+            yield chunk
+        returncode = self._proc.wait()
+        if returncode != 0:
+            stderr = self._proc.stderr.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"ffmpeg streaming decode failed ({returncode}): {stderr.strip()}")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._proc and self._proc.poll() is None:
+            self._proc.kill()
+            # Unblock the reader if it is waiting on a full queue
+            while self._reader.is_alive():
+                try:
+                    self._chunks.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._proc.wait()
+        if self._proc:
+            self._proc.stdout.close()
+            self._proc.stderr.close()
+        return False
+
+
+def pcm_to_float32(chunk: bytes) -> "np.ndarray":
+    """Convert s16le PCM bytes to the float32 array Python Whisper accepts directly."""
+    import numpy as np
+    return np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def pcm_to_wav_bytes(chunk: bytes) -> bytes:
+    """Wrap s16le PCM bytes in an in-memory WAV container for whisper.cpp's stdin input."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(BYTES_PER_SAMPLE)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(chunk)
+    return buffer.getvalue()
@@ -0,0 +1,112 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from youtube_transcript_api import YouTubeTranscriptApi
+
+from concurrency import NETWORK_CONCURRENCY
+from segments import Segments
+
+logger = logging.getLogger(__name__)
+
+# One adapter, and therefore one urllib3 connection pool, shared by every caption request.
+# Keep-alive connections to youtube.com are reused across calls and threads, so only the
+# first request per connection pays for the TCP and TLS handshakes. requests speaks HTTP/1.1
+# only, so concurrent fetches use one pooled connection each rather than HTTP/2 streams.
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=NETWORK_CONCURRENCY,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504)),
+)
+
+# YouTubeTranscriptApi and its Session (cookies, headers) are not thread-safe, so each worker
+# thread gets its own pair, all mounted on the shared adapter above.
+_local = threading.local()
+
+
+def _api() -> YouTubeTranscriptApi:
+    api = getattr(_local, "api", None)
+    if api is None:
+        session = requests.Session()
+        session.mount("https://", _adapter)
+        session.mount("http://", _adapter)
+        api = YouTubeTranscriptApi(http_client=session)
+        _local.api = api
+    return api
+
+
+def list_captions(video_id: str):
+    """Return the video's TranscriptList using the pooled HTTP client."""
+    return _api().list(video_id)
+
+
+def _language_matches(code: str, wanted: str) -> bool:
+    """'en' matches 'en', 'en-US', 'en-GB', ...; a regional code only matches itself."""
+    code, wanted = code.lower(), wanted.lower()
+    return code == wanted or code.split("-")[0] == wanted
+
+
+def select_captions(transcript_list, languages: list[str] | None = None, translate_to: str | None = None):
+    """
+    Pick the caption track to fetch and return (transcript, translated_from), or None if nothing fits.
+
+    Preference is ranked by language: translate_to (if set) first, then languages in order,
+    and within a language a manual track beats an auto-generated one. If no track is in a
+    preferred language, YouTube's server-side translation of the best translatable track is
+    used instead (translated_from is then its original language). With translate_to set, a
+    track that can't be delivered in that language is never returned, so the caller can fall
+    back to Whisper's translate task. Without any preference, the first manual track wins,
+    otherwise the first auto-generated one.
+    """
+    preferences = ([translate_to] if translate_to else []) + [code for code in languages or [] if code]
+
+    def rank(t) -> tuple[int, bool]:
+        for i, code in enumerate(preferences):
+            if _language_matches(t.language_code, code):
+                return i, t.is_generated
+        return len(preferences), t.is_generated
+
+    # sorted() is stable, so YouTube's own order breaks ties
+    ranked = sorted(transcript_list, key=rank)
+    if not ranked:
+        return None
+    best = ranked[0]
+    targets = [translate_to] if translate_to else preferences
+    if not targets or any(_language_matches(best.language_code, code) for code in targets):
+        return best, None
+
+    # Nothing in a wanted language: ask YouTube to translate, starting from the best-ranked track
+    for code in targets:
+        for t in ranked:
+            if t.is_translatable and code in {lang.language_code for lang in t.translation_languages}:
+                logger.info(f"Using YouTube's translation of the '{t.language_code}' captions into '{code}'")
+                return t.translate(code), t.language_code
+
+    if translate_to:
+        return None
+    logger.info(f"No captions in {preferences}; using the best track available ('{best.language_code}')")
+    return best, None
+
+
+def fetch_best_captions(video_id: str, languages: list[str] | None = None,
+                        translate_to: str | None = None) -> tuple[Segments, str] | None:
+    """
+    Fetch the best official transcript for the given language preferences (see select_captions).
+    Returns (timestamped segments, source label), or None if the video has no suitable transcript. Library
+    exceptions (NoTranscriptFound, TranscriptsDisabled, ...) propagate to the caller.
+    """
+    selected = select_captions(list_captions(video_id), languages, translate_to)
+    if selected is None:
+        return None
+    transcript_obj, translated_from = selected
+    # Fetch the actual transcript parts
+    transcript_parts = transcript_obj.fetch()
+    segments = Segments()
+    for item in transcript_parts:
+        segments.append(item.start, item.start + item.duration, item.text)
+    if translated_from:
+        return segments, (f"Official YouTube Captions (Translated from {translated_from} "
+                          f"to {transcript_obj.language_code})")
+    return segments, f"Official YouTube Captions ({'Generated' if transcript_obj.is_generated else 'Manual'})"
@@ -0,0 +1,61 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from metrics import observe, span
+from settings import env_int
+
+logger = logging.getLogger(__name__)
+
+# How many pipeline runs may be in flight at once. Each run occupies one worker thread.
+MAX_WORKERS = max(1, env_int("MCP_MAX_WORKERS", 8))
+# Threads for quick local store reads and writes (job queue, transcript store, search), kept apart from the
+# pipeline pool so polling and reading stay responsive while every pipeline worker is busy.
+STORE_WORKERS = max(1, env_int("MCP_STORE_WORKERS", 4))
+# Network-bound stages: search, caption fetch and audio download.
+NETWORK_CONCURRENCY = max(1, env_int("NETWORK_CONCURRENCY", 8))
+# Whisper transcriptions running at once; the scheduler splits the CPU budget between them.
+TRANSCRIBE_CONCURRENCY = max(1, env_int("TRANSCRIBE_CONCURRENCY", 1))
+# Videos from one batch tool call that may be in the pipeline at once, and the batch size cap.
+BATCH_CONCURRENCY = max(1, env_int("BATCH_CONCURRENCY", 4))
+BATCH_MAX_ITEMS = max(1, env_int("BATCH_MAX_ITEMS", 200))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pipeline")
+_store_executor = ThreadPoolExecutor(max_workers=STORE_WORKERS, thread_name_prefix="store")
+_network_slots = threading.BoundedSemaphore(NETWORK_CONCURRENCY)
+
+
+async def run_in_worker(func, *args, **kwargs):
+    """Run a blocking pipeline function on the worker pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_in_store_worker(func, *args, **kwargs):
+    """Run a quick blocking call against a local store (SQLite) on its own small pool, never behind pipeline runs."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_store_executor, functools.partial(func, *args, **kwargs))
+
+
+@contextmanager
+def _stage(slots: threading.BoundedSemaphore, kind: str, name: str):
+    """Hold a slot for the block. Time spent waiting for the slot and in the stage are recorded separately."""
+    if not slots.acquire(blocking=False):
+        logger.info(f"Waiting for a free {kind} slot for stage '{name}'...")
+        wait_started = time.perf_counter()
+        slots.acquire()
+        observe(f"{name}:wait", time.perf_counter() - wait_started)
+    try:
+        with span(name):
+            yield
+    finally:
+        slots.release()
+
+
+def network_stage(name: str):
+    """Context manager bounding concurrent network-bound work (search, captions, downloads)."""
+    return _stage(_network_slots, "network", name)
@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from settings import CACHE_DIR, env_float, env_int
+from singleflight import file_lock, try_file_lock
+
+logger = logging.getLogger(__name__)
+
+# Job states. A job is queued until a worker claims it, then running until it succeeds or fails.
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# get_youtube_transcript arguments a job may carry; output format and paging are chosen when
+# the result is read, from the transcript store
+JOB_PARAMS = ("query", "force_whisper", "model", "languages", "translate_to")
+
+# Worker threads per server process. The pipeline's own network/CPU stage limits still apply.
+JOB_WORKERS = max(1, env_int("JOB_WORKERS", 2))
+# How often idle workers look for jobs submitted by other processes, and recover orphaned ones
+_POLL_SECONDS = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    state       TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    params_key  TEXT NOT NULL,
+    owner       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_params_key ON jobs (params_key, state);
+"""
+
+
+class JobQueue:
+    """
+    A persistent transcription job queue backed by a SQLite file.
+
+    Jobs survive restarts: queued jobs simply wait for the next worker, and a job left running
+    by a process that died is put back in the queue (up to max_attempts times, so a video that
+    crashes the server can't do so forever). Each process marks the jobs it runs with an owner
+    ID and holds an owner lock file for its lifetime; a running job whose owner lock can be
+    taken belongs to a dead process. Finished jobs are kept for retention_seconds.
+    """
+
+    def __init__(self, db_path: str, retention_seconds: float, max_attempts: int):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+        self.owners_dir = os.path.join(os.path.dirname(db_path) or ".", "job_owners")
+        self.owner = uuid.uuid4().hex
+        os.makedirs(self.owners_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # A fresh connection per operation keeps us safe to call from worker threads.
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def owner_lock_path(self, owner: str) -> str:
+        return os.path.join(self.owners_dir, f"{owner}.lock")
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        del job["params_key"]
+        return job
+
+    def submit(self, params: dict) -> tuple[dict, bool]:
+        """
+        Queue a job for params (see JOB_PARAMS). If an identical job is already queued or running,
+        that job is returned instead. Returns (job, created).
+        """
+        params = {name: params[name] for name in JOB_PARAMS if params.get(name) is not None}
+        params_key = json.dumps(params, sort_keys=True)
+        now = time.time()
+        with self._connect() as conn:
+            self._prune(conn, now)
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE params_key = ? AND state IN (?, ?) ORDER BY created_at LIMIT 1",
+                (params_key, JOB_QUEUED, JOB_RUNNING),
+            ).fetchone()
+            if row is not None:
+                return self._to_job(row), False
+            job_id = uuid.uuid4().hex[:16]
+            conn.execute(
+                "INSERT INTO jobs (id, state, params, params_key, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps(params), params_key, now),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        logger.info(f"Queued job {job_id}: {params}")
+        return self._to_job(row), True
+
+    def get(self, job_id: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def queue_position(self, job: dict) -> int | None:
+        """1-based position of a queued job among all queued jobs, or None once it has started."""
+        if job["state"] != JOB_QUEUED:
+            return None
+        with self._connect() as conn:
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = ? AND created_at < ?", (JOB_QUEUED, job["created_at"])
+            ).fetchone()[0]
+        return ahead + 1
+
+    def claim(self) -> dict | None:
+        """Atomically move the oldest queued job to running under this process's owner ID."""
+        conn = self._connect()
+        try:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET state = ?, owner = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (JOB_RUNNING, self.owner, time.time(), row["id"]),
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.get(row["id"]) if row is not None else None
+
+    def finish(self, job_id: str, result: dict | None = None, error: str | None = None) -> None:
+        """Record a job's outcome: succeeded with result, or failed with error."""
+        state = JOB_FAILED if error else JOB_SUCCEEDED
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (state, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+        logger.info(f"Job {job_id} {state}" + (f": {error}" if error else ""))
+
+    def recover_orphans(self) -> int:
+        """Requeue (or fail, after max_attempts) running jobs whose owning process has died."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner, attempts FROM jobs WHERE state = ? AND owner != ?", (JOB_RUNNING, self.owner)
+            ).fetchall()
+        recovered = 0
+        for row in rows:
+            owner_lock = self.owner_lock_path(row["owner"])
+            with try_file_lock(owner_lock) as owner_dead:
+                pass
+            if not owner_dead:
+                continue
+            try:
+                os.remove(owner_lock)
+            except OSError:
+                pass
+            with self._connect() as conn:
+                if row["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET state = ?, error = ?, finished_at = ? WHERE id = ? AND state = ?",
+                        (JOB_FAILED, f"Abandoned after {row['attempts']} attempts that did not finish",
+                         time.time(), row["id"], JOB_RUNNING),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET state = ?, owner = NULL, started_at = NULL WHERE id = ? AND state = ?",
+                        (JOB_QUEUED, row["id"], JOB_RUNNING),
+                    )
+            recovered += 1
+            logger.info(f"Recovered job {row['id']} from a server process that exited")
+        return recovered
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.retention_seconds > 0:
+            conn.execute("DELETE FROM jobs WHERE state IN (?, ?) AND finished_at < ?",
+                         (*FINISHED_STATES, now - self.retention_seconds))
+
+
+class JobRunner:
+    """
+    A pool of worker threads that claim jobs from a JobQueue and run them through run_job.
+    run_job(params) returns the result dict to store; it raises, or returns a result whose status
+    is not 'success', to fail the job.
+    """
+
+    def __init__(self, queue: JobQueue, run_job, workers: int):
+        self.queue = queue
+        self.run_job = run_job
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._owner_lock = ExitStack()
+        self._threads = []
+
+    def start(self) -> None:
+        # Held for the life of the process, so other processes can tell our running jobs aren't orphans
+        self._owner_lock.enter_context(file_lock(self.queue.owner_lock_path(self.queue.owner)))
+        self.queue.recover_orphans()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} job workers")
+
+    def notify(self) -> None:
+        """Wake an idle worker, e.g. right after a submit."""
+        self._wakeup.set()
+
+    def _work(self) -> None:
+        while True:
+            try:
+                job = self.queue.claim()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to claim a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(_POLL_SECONDS)
+                self._wakeup.clear()
+                try:
+                    self.queue.recover_orphans()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to recover orphaned jobs: {e}")
+                continue
+
+            try:
+                result = self.run_job(job["params"])
+                if result.get("status") == "success":
+                    self.queue.finish(job["id"], result=result)
+                else:
+                    self.queue.finish(job["id"], error=result.get("message", "Unknown error occurred"))
+            except Exception as e:
+                logger.error(f"Job {job['id']} raised: {e}", exc_info=True)
+                self.queue.finish(job["id"], error=f"An unexpected error occurred: {e}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it from the environment on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            db_path = os.getenv("JOB_DB_PATH", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+            retention_seconds = env_float("JOB_RETENTION", 7 * 24 * 3600)
+            max_attempts = max(1, env_int("JOB_MAX_ATTEMPTS", 3))
+            logger.info(f"Opening job queue at {db_path} (retention={retention_seconds}s)")
+            _queue = JobQueue(db_path, retention_seconds, max_attempts)
+        return _queue
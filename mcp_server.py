@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 
+import hmac
+import json
 import logging
 import os
 import asyncio
 import sys
+import time
+import weakref
+from contextlib import asynccontextmanager, nullcontext
 from typing import Any
 
 # --- Start of Logging Setup ---
@@ -11,10 +16,14 @@ from typing import Any
 log_file_path = os.path.join(os.path.dirname(__file__), 'mcp_server.log')
 logging.basicConfig(
     filename=log_file_path,
-    filemode='w',
+    filemode='a',  # keep history across restarts
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - [%(funcName)s] - %(message)s'
 )
+if os.getenv("MCP_LOG_FORMAT", "text").lower() == "json":
+    from metrics import JsonFormatter  # stdlib only, so safe to import this early
+    for _handler in logging.getLogger().handlers:
+        _handler.setFormatter(JsonFormatter())
 logging.info("--- Log system initialised, server starting up... ---")
 # --- End of Logging Setup ---
 
@@ -30,20 +39,51 @@ try:
             raise  # Re-raise the exception to halt execution if this critical step fails
     # --------------------------------
 
-    logging.info("Importing libraries... (This may take a moment)")
+    # Only the MCP SDK and our lightweight modules are imported here; Whisper, yt-dlp and the caption
+    # client load on first use or in the background warm-up, so initialize/list_tools answer immediately.
+    logging.info("Importing libraries...")
     from mcp.server import Server
     from mcp.server.models import InitializationOptions
+    from mcp.server.lowlevel.helper_types import ReadResourceContents
     from mcp.server.stdio import stdio_server
-    from mcp.types import Tool, TextContent, ServerCapabilities, ToolsCapability
-    # --- The import is now here, at startup! ---
-    from youtube_tool import get_youtube_transcript
+    from mcp.types import (Resource, ResourceTemplate, ResourcesCapability, Tool, TextContent, ServerCapabilities,
+                           ToolsCapability)
+    from youtube_tool import get_youtube_transcript, list_playlist_videos, warm_up
+    from model_registry import AVAILABLE_MODELS
+    from segments import OUTPUT_FORMATS
+    from transcript_resources import (SEARCH_MAX_PER_VIDEO, SEARCH_MAX_RESULTS, URI_TEMPLATE, list_transcripts,
+                                      parse_transcript_uri, read_transcript, search_transcripts)
+    from video_lookup import parse_video_id
+    from concurrency import BATCH_CONCURRENCY, BATCH_MAX_ITEMS, run_in_store_worker, run_in_worker
+    from jobs import FINISHED_STATES, JOB_SUCCEEDED, JOB_WORKERS, JobRunner, get_job_queue
+    from metrics import incr, render_prometheus, snapshot, start_metrics_server
+    from scheduler import get_scheduler
+    from settings import env_bool, env_int
 
     logging.info("Libraries imported successfully.")
 
+    class TranscribeServer(Server):
+        def create_initialization_options(self, notification_options=None, experimental_capabilities=None):
+            """The same capabilities over every transport: subscribable resources with list-change notifications."""
+            return InitializationOptions(
+                server_name="MCP-YouTube-Transcribe",
+                server_version="1.0.0",
+                capabilities=ServerCapabilities(
+                    tools=ToolsCapability(listChanged=False),
+                    resources=ResourcesCapability(subscribe=True, listChanged=True)
+                ),
+            )
+
+
     # Create the server instance
-    server = Server("MCP-YouTube-Transcribe")
+    server = TranscribeServer("MCP-YouTube-Transcribe")
     logging.info("Server instance created.")
 
+    # Longest get_job_status may wait; kept below common client tool-call timeouts
+    JOB_STATUS_MAX_WAIT = env_int("JOB_STATUS_MAX_WAIT", 50)
+    # Started in main(); None when this module is imported without running the server
+    _job_runner: JobRunner | None = None
+
 
     @server.list_tools()
     async def handle_list_tools() -> list[Tool]:
@@ -64,51 +104,588 @@ try:
                             "type": "boolean",
                             "description": "Force the use of Whisper for transcription, even if an official transcript is available",
                             "default": False
+                        },
+                        "model": {
+                            "type": "string",
+                            "enum": list(AVAILABLE_MODELS),
+                            "description": "Whisper model to use when transcribing (larger is slower but more accurate). Defaults to the server's configured model."
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(OUTPUT_FORMATS),
+                            "description": "Transcript format: plain text, SRT or WebVTT subtitles, or JSON segments with start/end times",
+                            "default": "plain"
+                        },
+                        "languages": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Preferred caption languages, most preferred first (e.g. ['de', 'en']). If none is available, YouTube's translation of another track is used."
+                        },
+                        "translate_to": {
+                            "type": "string",
+                            "description": "Return the transcript in this language (e.g. 'en'), via YouTube's caption translation when available, otherwise Whisper's translate task (English only)"
+                        },
+                        "start_time": {
+                            "type": "number",
+                            "minimum": 0,
+                            "description": "Only return segments from this many seconds into the video"
+                        },
+                        "end_time": {
+                            "type": "number",
+                            "minimum": 0,
+                            "description": "Only return segments before this many seconds into the video"
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "Page cursor from a previous response's 'Next cursor' line; repeat the other arguments unchanged"
+                        },
+                        "max_chars": {
+                            "type": "integer",
+                            "minimum": 0,
+                            "description": "Maximum transcript characters per page (0 for no limit). Defaults to the server's page size."
+                        }
+                    },
+                    "required": ["query"]
+                }
+            ),
+            Tool(
+                name="get_youtube_transcripts_batch",
+                description="Get transcripts for many YouTube videos in one call, from a list of queries/URLs/video IDs and/or a playlist or channel URL. Videos are processed concurrently; failures are reported per item without aborting the batch.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "queries": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Search queries, video URLs or 11-character video IDs"
+                        },
+                        "playlist_url": {
+                            "type": "string",
+                            "description": "A playlist or channel URL whose videos should be added to the batch"
+                        },
+                        "max_items": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": BATCH_MAX_ITEMS,
+                            "description": f"Maximum number of videos to process (default and cap: {BATCH_MAX_ITEMS})"
+                        },
+                        "force_whisper": {
+                            "type": "boolean",
+                            "description": "Force the use of Whisper for every video",
+                            "default": False
+                        },
+                        "model": {
+                            "type": "string",
+                            "enum": list(AVAILABLE_MODELS),
+                            "description": "Whisper model to use when transcribing. Defaults to the server's configured model."
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(OUTPUT_FORMATS),
+                            "description": "Transcript format for every video (plain, srt, vtt or json)",
+                            "default": "plain"
+                        },
+                        "languages": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Preferred caption languages for every video, most preferred first"
+                        },
+                        "translate_to": {
+                            "type": "string",
+                            "description": "Return every transcript in this language (e.g. 'en')"
+                        }
+                    }
+                }
+            ),
+            Tool(
+                name="get_server_stats",
+                description="Report the server's counters (cache hits/misses, download fallbacks, transcription backends) and per-stage timings (search, captions, download, ffmpeg, Whisper).",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "format": {
+                            "type": "string",
+                            "enum": ["json", "prometheus"],
+                            "description": "JSON (default) or the Prometheus text exposition format",
+                            "default": "json"
+                        }
+                    }
+                }
+            ),
+            Tool(
+                name="search_transcripts",
+                description="Full-text search over every transcript the server has already fetched or generated, without any network access or transcription. Returns the best matching videos with matching snippets and the time in the video where each match is, for finding which already-seen video covers a topic. Use get_youtube_transcript with start_time to read around a match.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Words to search for; all must match (if nothing matches all of them, any may). Put a phrase in double quotes to match it exactly."
+                        },
+                        "limit": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": SEARCH_MAX_RESULTS,
+                            "description": "Maximum number of videos to return",
+                            "default": 10
+                        },
+                        "matches_per_video": {
+                            "type": "integer",
+                            "minimum": 1,
+                            "maximum": SEARCH_MAX_PER_VIDEO,
+                            "description": "Maximum number of matching passages to show per video",
+                            "default": 3
+                        }
+                    },
+                    "required": ["query"]
+                }
+            ),
+            Tool(
+                name="submit_transcription",
+                description="Queue a transcript job and return its job ID immediately. Use this for long videos or force_whisper runs that might outlast a tool call timeout; poll get_job_status, then read the transcript with get_job_result. Queued jobs survive a server restart.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "query": {
+                            "type": "string",
+                            "description": "Search query, video URL or 11-character video ID"
+                        },
+                        "force_whisper": {
+                            "type": "boolean",
+                            "description": "Force the use of Whisper for transcription, even if an official transcript is available",
+                            "default": False
+                        },
+                        "model": {
+                            "type": "string",
+                            "enum": list(AVAILABLE_MODELS),
+                            "description": "Whisper model to use when transcribing. Defaults to the server's configured model."
+                        },
+                        "languages": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Preferred caption languages, most preferred first"
+                        },
+                        "translate_to": {
+                            "type": "string",
+                            "description": "Return the transcript in this language (e.g. 'en')"
                         }
                     },
                     "required": ["query"]
                 }
+            ),
+            Tool(
+                name="get_job_status",
+                description="Report a transcript job's state (queued, running, succeeded or failed), its queue position and timings. With wait_seconds, waits for the job to finish (sending progress notifications as its state changes) before answering.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "The job ID returned by submit_transcription"
+                        },
+                        "wait_seconds": {
+                            "type": "number",
+                            "minimum": 0,
+                            "maximum": JOB_STATUS_MAX_WAIT,
+                            "description": f"Wait up to this many seconds for the job to finish (max {JOB_STATUS_MAX_WAIT})",
+                            "default": 0
+                        }
+                    },
+                    "required": ["job_id"]
+                }
+            ),
+            Tool(
+                name="get_job_result",
+                description="Return the transcript of a finished job from the transcript store, with the same format, time range and paging options as get_youtube_transcript. Reports the result as expired if the store no longer holds it.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "job_id": {
+                            "type": "string",
+                            "description": "The job ID returned by submit_transcription"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(OUTPUT_FORMATS),
+                            "description": "Transcript format: plain text, SRT or WebVTT subtitles, or JSON segments with start/end times",
+                            "default": "plain"
+                        },
+                        "start_time": {
+                            "type": "number",
+                            "minimum": 0,
+                            "description": "Only return segments from this many seconds into the video"
+                        },
+                        "end_time": {
+                            "type": "number",
+                            "minimum": 0,
+                            "description": "Only return segments before this many seconds into the video"
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "Page cursor from a previous response's 'Next cursor' line"
+                        },
+                        "max_chars": {
+                            "type": "integer",
+                            "minimum": 0,
+                            "description": "Maximum transcript characters per page (0 for no limit). Defaults to the server's page size."
+                        }
+                    },
+                    "required": ["job_id"]
+                }
             )
         ]
 
 
-    @server.call_tool()
-    async def handle_call_tool(name: str, arguments: dict[str, Any] | None) -> list[TextContent]:
-        """Handle tool calls."""
-        logging.info(f"handle_call_tool called for tool: {name}")
-        if name != "get_youtube_transcript":
-            logging.error(f"Unknown tool called: {name}")
-            raise ValueError(f"Unknown tool: {name}")
+    # Resource URI -> sessions subscribed to it; weak, so clients that disconnect drop out
+    _subscriptions: dict[str, weakref.WeakSet] = {}
+
+
+    @server.list_resources()
+    async def handle_list_resources() -> list[Resource]:
+        """List the transcripts already in the store; reading one costs a disk read, not a pipeline run."""
+        entries = await run_in_store_worker(list_transcripts)
+        return [
+            Resource(uri=e["uri"], name=e["name"], description=e["description"], mimeType="text/plain",
+                     size=e["size"])
+            for e in entries
+        ]
+
+
+    @server.list_resource_templates()
+    async def handle_list_resource_templates() -> list[ResourceTemplate]:
+        return [
+            ResourceTemplate(
+                uriTemplate=URI_TEMPLATE,
+                name="YouTube transcript",
+                description="A stored transcript by video ID. 'model' selects a Whisper model's transcript and "
+                            f"'format' one of {', '.join(OUTPUT_FORMATS)}. Only transcripts that were already "
+                            "produced by get_youtube_transcript can be read.",
+            )
+        ]
+
+
+    @server.read_resource()
+    async def handle_read_resource(uri) -> list[ReadResourceContents]:
+        text, mime_type = await run_in_store_worker(read_transcript, str(uri))
+        return [ReadResourceContents(content=text, mime_type=mime_type)]
+
+
+    @server.subscribe_resource()
+    async def handle_subscribe_resource(uri) -> None:
+        parse_transcript_uri(str(uri))
+        _subscriptions.setdefault(str(uri), weakref.WeakSet()).add(server.request_context.session)
+
+
+    @server.unsubscribe_resource()
+    async def handle_unsubscribe_resource(uri) -> None:
+        _subscriptions.get(str(uri), weakref.WeakSet()).discard(server.request_context.session)
+
+
+    async def _notify_transcript_stored(result: dict) -> None:
+        """Tell subscribers of a video's transcript URIs (and the calling client's listing) about a new transcript."""
+        if result.get("status") != "success" or result.get("cache") != "miss":
+            return
+        video_id = parse_video_id(result["url"])
+        if not video_id:
+            return
+        for uri, sessions in list(_subscriptions.items()):
+            if parse_transcript_uri(uri)[0] != video_id:
+                continue
+            for session in list(sessions):
+                try:
+                    await session.send_resource_updated(uri)
+                except Exception as e:
+                    logging.warning(f"Dropping subscription to {uri} after failed notification: {e}")
+                    sessions.discard(session)
+        try:
+            await server.request_context.session.send_resource_list_changed()
+        except Exception as e:
+            logging.warning(f"Failed to send resource list change notification: {e}")
 
-        if not arguments:
-            logging.error("Tool call missing arguments.")
-            raise ValueError("Missing arguments")
 
+    def _format_timings(timings: dict) -> str:
+        """One line of per-stage seconds, e.g. '**Timings:** search 0.41s, captions 0.92s, total 1.38s'."""
+        return "**Timings:** " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()) + "\n"
+
+
+    def _format_result(result: dict) -> str:
+        """Render a get_youtube_transcript result as the markdown returned to clients."""
+        if result.get("status") == "success":
+            download = result.get("download")
+            downloaded = ""
+            if download:
+                downloaded = f"**Downloaded:** {download['bytes_fetched'] / 1e6:.1f} MB via {download['method']} ({download['format']})\n"
+            vad = result.get("vad")
+            if vad:
+                downloaded += f"**Speech:** {vad['speech_seconds']:.0f}s of {vad['audio_seconds']:.0f}s transcribed ({vad['skipped_fraction']:.0%} skipped as silence)\n"
+            paging = ""
+            page = result.get("page")
+            if page and (page["first_segment"] > 0 or result.get("next_cursor")):
+                paging = f"**Page:** segments {page['first_segment'] + 1}-{page['end_segment']} of {page['total_segments']}\n"
+                if result.get("next_cursor"):
+                    paging += f"**Next cursor:** {result['next_cursor']}\n"
+            timings = _format_timings(result["timings"]) if result.get("timings") else ""
+            return f"**Title:** {result['title']}\n**URL:** {result['url']}\n**Source:** {result['source']}\n**Cache:** {result.get('cache', 'miss')}\n{downloaded}{paging}{timings}\n**Transcript:**\n{result['transcript']}"
+        return f"**Error:** {result.get('message', 'Unknown error occurred')}"
+
+
+    async def _call_get_youtube_transcript(arguments: dict[str, Any]) -> list[TextContent]:
         query = arguments.get("query")
         if not query:
             logging.error("Tool call missing required argument: query")
             raise ValueError("Missing required argument: query")
 
         force_whisper = arguments.get("force_whisper", False)
+        model = arguments.get("model")
 
         try:
-            # The import is no longer here. We just call the function directly.
-            result = get_youtube_transcript(query=query, force_whisper=force_whisper)
+            # The pipeline is blocking (network + Whisper), so run it on the worker pool to keep
+            # the event loop free for other requests while it runs.
+            result = await run_in_worker(get_youtube_transcript, query=query, force_whisper=force_whisper,
+                                         model=model, output_format=arguments.get("format", "plain"),
+                                         start_time=arguments.get("start_time"), end_time=arguments.get("end_time"),
+                                         cursor=arguments.get("cursor"), max_chars=arguments.get("max_chars"),
+                                         languages=arguments.get("languages"),
+                                         translate_to=arguments.get("translate_to"))
             logging.info(f"youtube_tool returned with status: {result.get('status')}")
-
-            if result.get("status") == "success":
-                content = f"**Title:** {result['title']}\n**URL:** {result['url']}\n**Source:** {result['source']}\n\n**Transcript:**\n{result['transcript']}"
-            else:
-                content = f"**Error:** {result.get('message', 'Unknown error occurred')}"
-
-            return [TextContent(type="text", text=content)]
+            await _notify_transcript_stored(result)
+            return [TextContent(type="text", text=_format_result(result))]
         except Exception as e:
             logging.error(f"An exception occurred during tool execution: {str(e)}", exc_info=True)
             return [TextContent(type="text", text=f"**Error:** An unexpected error occurred: {str(e)}")]
 
 
-    async def main():
-        logging.info("Main function started.")
+    async def _call_batch(arguments: dict[str, Any]) -> list[TextContent]:
+        queries = list(arguments.get("queries") or [])
+        playlist_url = arguments.get("playlist_url")
+        max_items = min(arguments.get("max_items") or BATCH_MAX_ITEMS, BATCH_MAX_ITEMS)
+        force_whisper = arguments.get("force_whisper", False)
+        model = arguments.get("model")
+        output_format = arguments.get("format", "plain")
+        languages = arguments.get("languages")
+        translate_to = arguments.get("translate_to")
+
+        if playlist_url:
+            try:
+                queries += await run_in_worker(list_playlist_videos, playlist_url, max_items)
+            except Exception as e:
+                logging.error(f"Failed to expand playlist {playlist_url}: {e}", exc_info=True)
+                if not queries:
+                    return [TextContent(type="text", text=f"**Error:** Could not read playlist: {str(e)}")]
+        queries = queries[:max_items]
+        if not queries:
+            raise ValueError("Provide 'queries' and/or 'playlist_url'")
+
+        ctx = server.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        logging.info(f"Batch of {len(queries)} videos started (progress token: {progress_token})")
+
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        results = [None] * len(queries)
+        completed = 0
+
+        async def run_one(index: int, query: str):
+            nonlocal completed
+            async with semaphore:
+                try:
+                    result = await run_in_worker(get_youtube_transcript, query=query, force_whisper=force_whisper,
+                                                 model=model, output_format=output_format, languages=languages,
+                                                 translate_to=translate_to)
+                except Exception as e:
+                    logging.error(f"Batch item '{query}' failed: {e}", exc_info=True)
+                    result = {"status": "error", "message": f"An unexpected error occurred: {str(e)}"}
+            results[index] = result
+            await _notify_transcript_stored(result)
+            completed += 1
+            if progress_token is not None:
+                label = result.get("title") if result.get("status") == "success" else result.get("message")
+                await ctx.session.send_progress_notification(
+                    progress_token, completed, len(queries),
+                    message=f"[{index + 1}] {result.get('status')}: {label}"
+                )
+
+        await asyncio.gather(*(run_one(i, q) for i, q in enumerate(queries)))
+
+        failed = sum(1 for r in results if r.get("status") != "success")
+        summary = f"**Batch complete:** {len(results) - failed} of {len(results)} succeeded, {failed} failed."
+        contents = [TextContent(type="text", text=summary)]
+        for index, (query, result) in enumerate(zip(queries, results), start=1):
+            contents.append(TextContent(type="text", text=f"### [{index}] {query}\n{_format_result(result)}"))
+        return contents
+
+
+    def _run_job(params: dict) -> dict:
+        """Job worker entry point: run the pipeline (which fills the transcript store) and keep the metadata."""
+        # Jobs are already queued, so they wait for CPU rather than being refused when the server is busy
+        with get_scheduler().waits_for_cpu():
+            result = get_youtube_transcript(**params)
+        if result.get("status") != "success":
+            return result
+        return {key: result.get(key) for key in
+                ("status", "title", "url", "source", "cache", "bytes_fetched", "download", "vad", "timings")}
+
+
+    def _job_status_text(job: dict, position: int | None) -> str:
+        lines = [f"**Job:** {job['id']}", f"**State:** {job['state']}", f"**Query:** {job['params']['query']}"]
+        if position is not None:
+            lines.append(f"**Queue position:** {position}")
+        if job["finished_at"] and job["started_at"]:
+            lines.append(f"**Took:** {job['finished_at'] - job['started_at']:.1f}s")
+        elif job["started_at"]:
+            lines.append(f"**Running for:** {time.time() - job['started_at']:.1f}s")
+        if job["attempts"] > 1:
+            lines.append(f"**Attempts:** {job['attempts']}")
+        result = job["result"]
+        if result:
+            lines.append(f"**Title:** {result['title']}\n**Source:** {result['source']}")
+            if result.get("timings"):
+                lines.append(_format_timings(result["timings"]).rstrip("\n"))
+        if job["error"]:
+            lines.append(f"**Error:** {job['error']}")
+        if job["state"] == JOB_SUCCEEDED:
+            lines.append("Call get_job_result to read the transcript.")
+        return "\n".join(lines)
+
+
+    async def _call_submit_transcription(arguments: dict[str, Any]) -> list[TextContent]:
+        if not arguments.get("query"):
+            raise ValueError("Missing required argument: query")
+        model = arguments.get("model")
+        if model and model not in AVAILABLE_MODELS:
+            raise ValueError(f"Unknown Whisper model '{model}'. Choose one of: {', '.join(AVAILABLE_MODELS)}")
+        queue = get_job_queue()
+        job, created = await run_in_store_worker(queue.submit, arguments)
+        if _job_runner is not None:
+            _job_runner.notify()
+        position = await run_in_store_worker(queue.queue_position, job)
+        note = "" if created else "An identical job was already in progress; returning it.\n"
+        return [TextContent(type="text", text=note + _job_status_text(job, position))]
+
+
+    async def _call_get_job_status(arguments: dict[str, Any]) -> list[TextContent]:
+        job_id = arguments.get("job_id")
+        if not job_id:
+            raise ValueError("Missing required argument: job_id")
+        queue = get_job_queue()
+        job = await run_in_store_worker(queue.get, job_id)
+        if job is None:
+            return [TextContent(type="text", text=f"**Error:** Unknown job: {job_id}")]
+
+        # Long-poll: wait for the job to finish, reporting each state change as progress (queued 0, running 1, done 2)
+        wait = min(float(arguments.get("wait_seconds") or 0), JOB_STATUS_MAX_WAIT)
+        ctx = server.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        deadline = time.monotonic() + wait
+        last_state = None
+        while True:
+            if progress_token is not None and job["state"] != last_state:
+                step = {"queued": 0, "running": 1}.get(job["state"], 2)
+                await ctx.session.send_progress_notification(progress_token, step, 2, message=f"Job {job['state']}")
+            last_state = job["state"]
+            if job["state"] in FINISHED_STATES or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(min(1.0, max(deadline - time.monotonic(), 0)))
+            job = await run_in_store_worker(queue.get, job_id)
+        position = await run_in_store_worker(queue.queue_position, job)
+        return [TextContent(type="text", text=_job_status_text(job, position))]
+
+
+    async def _call_get_job_result(arguments: dict[str, Any]) -> list[TextContent]:
+        job_id = arguments.get("job_id")
+        if not job_id:
+            raise ValueError("Missing required argument: job_id")
+        job = await run_in_store_worker(get_job_queue().get, job_id)
+        if job is None:
+            return [TextContent(type="text", text=f"**Error:** Unknown job: {job_id}")]
+        if job["state"] != JOB_SUCCEEDED:
+            return [TextContent(type="text", text=_job_status_text(job, None))]
+
+        # The job stored the transcript; read it back for the resolved URL with the job's options. Only the
+        # store is read: a transcript that has since expired is reported, not produced again inside this call.
+        params = dict(job["params"], query=job["result"]["url"])
+        result = await run_in_store_worker(get_youtube_transcript, **params, cache_only=True,
+                                           output_format=arguments.get("format", "plain"),
+                                           start_time=arguments.get("start_time"), end_time=arguments.get("end_time"),
+                                           cursor=arguments.get("cursor"), max_chars=arguments.get("max_chars"))
+        if result.get("status") != "success" and result.get("cache") == "miss":
+            return [TextContent(type="text", text=f"**Result expired:** job {job_id} finished, but its transcript is no "
+                                                  f"longer stored. Submit the job again to produce it.")]
+        return [TextContent(type="text", text=_format_result(result))]
+
+
+    def _clock(seconds: float) -> str:
+        minutes, secs = divmod(int(seconds), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+    async def _call_search_transcripts(arguments: dict[str, Any]) -> list[TextContent]:
+        query = arguments.get("query")
+        if not query:
+            raise ValueError("Missing required argument: query")
+        results = await run_in_store_worker(search_transcripts, query, int(arguments.get("limit") or 10),
+                                            int(arguments.get("matches_per_video") or 3))
+        if not results:
+            return [TextContent(type="text", text=f"No stored transcript matches '{query}'.")]
+        lines = [f"Found {len(results)} videos matching '{query}' in stored transcripts:"]
+        for i, result in enumerate(results, start=1):
+            lines.append(f"\n{i}. **{result['title'] or result['video_id']}** - {result['url']}")
+            lines.append(f"   **Resource:** {result['uri']} ({result['source_label']})")
+            for match in result["matches"]:
+                lines.append(f"   - [{_clock(match['start'])}] (start_time={match['start']:g}) {match['snippet']}")
+        return [TextContent(type="text", text="\n".join(lines))]
+
+
+    async def _call_get_server_stats(arguments: dict[str, Any]) -> list[TextContent]:
+        if arguments.get("format") == "prometheus":
+            return [TextContent(type="text", text=render_prometheus())]
+        return [TextContent(type="text", text=json.dumps({**snapshot(), "scheduler": get_scheduler().snapshot()},
+                                                         indent=2))]
+
+
+    @server.call_tool()
+    async def handle_call_tool(name: str, arguments: dict[str, Any] | None) -> list[TextContent]:
+        """Handle tool calls."""
+        logging.info(f"handle_call_tool called for tool: {name}")
+        handlers = {
+            "get_youtube_transcript": _call_get_youtube_transcript,
+            "get_youtube_transcripts_batch": _call_batch,
+            "get_server_stats": _call_get_server_stats,
+            "search_transcripts": _call_search_transcripts,
+            "submit_transcription": _call_submit_transcription,
+            "get_job_status": _call_get_job_status,
+            "get_job_result": _call_get_job_result,
+        }
+        if name not in handlers:
+            logging.error(f"Unknown tool called: {name}")
+            raise ValueError(f"Unknown tool: {name}")
+
+        # Each handler checks its own required arguments; the stats tool needs none
+        async with _client_slot():
+            return await handlers[name](arguments or {})
+
+
+    # Concurrent tool calls allowed per client session when serving over HTTP; 0 for no limit.
+    # Set in main(): a stdio server has a single client.
+    _client_limit = 0
+    _client_slots: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+    def _client_slot():
+        """Hold one of the calling client's tool call slots; calls beyond the limit wait their turn."""
+        if not _client_limit:
+            return nullcontext()
+        session = server.request_context.session
+        slots = _client_slots.get(session)
+        if slots is None:
+            slots = _client_slots[session] = asyncio.Semaphore(_client_limit)
+        if slots.locked():
+            logging.info(f"Client is at its limit of {_client_limit} concurrent tool calls; queueing this call")
+            incr("client_calls_queued")
+        return slots
+
+
+    async def _serve_stdio():
         # --- Add this for Windows stdio encoding ---
         if sys.platform == "win32":
             try:
@@ -122,23 +699,101 @@ try:
         # -------------------------------------------
         async with stdio_server() as (read_stream, write_stream):
             logging.info("Stdio server context entered.")
-
-            capabilities = ServerCapabilities(tools=ToolsCapability(listChanged=False))
-
             logging.info("About to call server.run(). This should block and wait for requests.")
-            await server.run(
-                read_stream,
-                write_stream,
-                InitializationOptions(
-                    server_name="MCP-YouTube-Transcribe",
-                    server_version="1.0.0",
-                    capabilities=capabilities
-                ),
-            )
+            await server.run(read_stream, write_stream, server.create_initialization_options())
             logging.warning("server.run() returned. This means the server loop has exited, which is unexpected.")
         logging.info("Stdio server context exited.")
 
 
+    async def _serve_http(host: str, port: int):
+        """
+        Serve many clients from this one process: MCP's streamable HTTP transport at /mcp and the
+        older HTTP+SSE transport at /sse (messages posted to /messages/). Every client shares the
+        transcript cache, the loaded Whisper models, the worker pool and the job queue.
+        """
+        import uvicorn
+        from mcp.server.sse import SseServerTransport
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+        from starlette.applications import Starlette
+        from starlette.responses import Response
+        from starlette.routing import Mount, Route
+
+        session_manager = StreamableHTTPSessionManager(app=server)
+        sse = SseServerTransport("/messages/")
+
+        class StreamableHTTPEndpoint:
+            # An ASGI app rather than a function, so Starlette passes the raw request through
+            async def __call__(self, scope, receive, send):
+                await session_manager.handle_request(scope, receive, send)
+
+        async def handle_sse(request):
+            async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+                await server.run(read_stream, write_stream, server.create_initialization_options())
+            return Response()
+
+        @asynccontextmanager
+        async def lifespan(app):
+            async with session_manager.run():
+                logging.info(f"Serving MCP over HTTP on http://{host}:{port}/mcp (SSE: /sse)")
+                yield
+
+        app = Starlette(
+            routes=[
+                Route("/mcp", endpoint=StreamableHTTPEndpoint()),
+                Route("/sse", endpoint=handle_sse, methods=["GET"]),
+                Mount("/messages/", app=sse.handle_post_message),
+            ],
+            lifespan=lifespan,
+        )
+        token = os.getenv("MCP_HTTP_TOKEN")
+        if token:
+            app = _require_token(app, token)
+        elif host not in ("127.0.0.1", "localhost", "::1"):
+            logging.warning(f"Serving on {host} without MCP_HTTP_TOKEN: anyone who can reach the port can use the server")
+        # log_config=None keeps uvicorn's records in our log file
+        await uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_config=None)).serve()
+
+
+    def _require_token(app, token: str):
+        """Wrap an ASGI app so HTTP requests must carry 'Authorization: Bearer <token>'."""
+        expected = f"Bearer {token}".encode()
+
+        async def guarded(scope, receive, send):
+            if scope["type"] == "http" and not hmac.compare_digest(dict(scope["headers"]).get(b"authorization", b""),
+                                                                   expected):
+                await send({"type": "http.response.start", "status": 401,
+                            "headers": [(b"content-type", b"text/plain"), (b"www-authenticate", b"Bearer")]})
+                await send({"type": "http.response.body", "body": b"Unauthorized"})
+                return
+            await app(scope, receive, send)
+
+        return guarded
+
+
+    async def main():
+        logging.info("Main function started.")
+        # Optional Prometheus scrape endpoint on localhost
+        metrics_port = env_int("METRICS_PORT", 0)
+        if metrics_port:
+            start_metrics_server(metrics_port)
+        # Probe backends, import yt-dlp and preload Whisper models in the background while the handshake runs
+        if env_bool("MCP_WARMUP", True):
+            asyncio.get_running_loop().run_in_executor(None, warm_up)
+        # Job workers pick up where the last server left off: queued jobs, and running ones it abandoned
+        global _job_runner, _client_limit
+        _job_runner = JobRunner(get_job_queue(), _run_job, JOB_WORKERS)
+        asyncio.get_running_loop().run_in_executor(None, _job_runner.start)
+
+        transport = os.getenv("MCP_TRANSPORT", "stdio").lower()
+        if transport == "http":
+            _client_limit = max(0, env_int("MCP_CLIENT_MAX_CONCURRENCY", 4))
+            await _serve_http(os.getenv("MCP_HTTP_HOST", "127.0.0.1"), env_int("MCP_HTTP_PORT", 8000))
+        else:
+            if transport != "stdio":
+                logging.warning(f"Unknown MCP_TRANSPORT '{transport}'; using stdio")
+            await _serve_stdio()
+
+
     if __name__ == "__main__":
         logging.info("Executing main block.")
         try:
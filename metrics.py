@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Prefix for every exported metric name
+NAMESPACE = "yt_transcribe"
+
+_lock = threading.Lock()
+_started_at = time.time()
+# (name, sorted label items) -> value
+_counters: dict[tuple, float] = {}
+# stage -> [count, total seconds, max seconds]
+_stages: dict[str, list] = {}
+# The trace of the request running on this thread, if any
+_local = threading.local()
+
+
+def incr(name: str, amount: float = 1, **labels) -> None:
+    """Add amount to a counter, e.g. incr("transcript_cache", result="hit")."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record one timing for a stage, globally and on the current request's trace."""
+    with _lock:
+        entry = _stages.setdefault(stage, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace["stages"][stage] = round(trace["stages"].get(stage, 0.0) + seconds, 4)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one occurrence of stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def annotate(**fields) -> None:
+    """Attach fields (cache status, source, bytes fetched, ...) to the current request's trace."""
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.update(fields)
+
+
+@contextmanager
+def request_trace(request: str, **fields):
+    """
+    Collect the stage timings of one request made on this thread and log them as a single JSON
+    line when it finishes. Nested calls join the outer trace.
+    """
+    if getattr(_local, "trace", None) is not None:
+        yield _local.trace
+        return
+    trace = {"request": request, **fields, "stages": {}}
+    _local.trace = trace
+    start = time.perf_counter()
+    try:
+        yield trace
+    except BaseException:
+        trace.setdefault("status", "exception")
+        raise
+    finally:
+        _local.trace = None
+        trace["seconds"] = round(time.perf_counter() - start, 4)
+        observe(f"request:{request}", trace["seconds"])
+        incr("requests", request=request, status=trace.get("status", "unknown"))
+        logger.info(json.dumps(trace, default=str))
+
+
+def snapshot() -> dict:
+    """All counters and stage timings as plain data, for the stats tool."""
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        stages = {
+            stage: {"count": count, "total_seconds": round(total, 4), "avg_seconds": round(total / count, 4),
+                    "max_seconds": round(peak, 4)}
+            for stage, (count, total, peak) in sorted(_stages.items())
+        }
+    return {"uptime_seconds": round(time.time() - _started_at, 1), "counters": counters, "stages": stages}
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def render_prometheus() -> str:
+    """The metrics in the Prometheus text exposition format."""
+    lines = [f"# TYPE {NAMESPACE}_uptime_seconds gauge", f"{NAMESPACE}_uptime_seconds {time.time() - _started_at:.1f}"]
+    with _lock:
+        counters = sorted(_counters.items())
+        stages = sorted(_stages.items())
+    seen = set()
+    for (name, labels), value in counters:
+        metric = f"{NAMESPACE}_{name}_total"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{metric}{_labels(labels)} {value:g}")
+    if stages:
+        # Each metric family's samples must be contiguous
+        lines.append(f"# TYPE {NAMESPACE}_stage_seconds summary")
+        for stage, (count, total, _) in stages:
+            label = _labels((("stage", stage),))
+            lines.append(f"{NAMESPACE}_stage_seconds_count{label} {count}")
+            lines.append(f"{NAMESPACE}_stage_seconds_sum{label} {total:.6f}")
+        lines.append(f"# TYPE {NAMESPACE}_stage_seconds_max gauge")
+        for stage, (_, _, peak) in stages:
+            lines.append(f"{NAMESPACE}_stage_seconds_max{_labels((('stage', stage),))} {peak:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats every log record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "function": record.funcName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve render_prometheus() at http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics at http://{host}:{httpd.server_address[1]}/metrics")
+    return httpd
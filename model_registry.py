@@ -0,0 +1,139 @@
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from settings import env_int
+
+logger = logging.getLogger(__name__)
+
+# Models we accept from clients, with a rough fp32 footprint in MB used before a model is loaded
+MODEL_SIZES_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3000,
+    "large": 6200,
+    "turbo": 3200,
+}
+AVAILABLE_MODELS = tuple(MODEL_SIZES_MB)
+
+
+def _loaded_size_bytes(model) -> int:
+    """Measure a loaded torch model's parameter and buffer memory."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except AttributeError:
+        return 0
+
+
+class ModelRegistry:
+    """
+    Keeps several loaded Whisper models in memory under a RAM budget.
+
+    Models are loaded on first use and kept in LRU order. Loading a model that would push
+    the total over budget_bytes evicts the least recently used models that are not
+    currently in use. Loads of different models can proceed in parallel; concurrent
+    requests for the same model wait for a single load.
+
+    Entries can also be memory held elsewhere, such as a process pool whose workers each load a
+    model: use() then takes the loader, its estimated size and a release function that frees it
+    on eviction.
+    """
+
+    def __init__(self, loader, budget_bytes: int):
+        self._loader = loader
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # name -> (model, size_bytes, release)
+        self._in_use = {}
+        self._load_locks = {}
+
+    def _evict_for(self, incoming_bytes: int) -> None:
+        """Evict idle models until incoming_bytes fits. Caller holds self._lock."""
+        total = sum(size for _, size, _ in self._models.values())
+        for name in list(self._models):
+            if total + incoming_bytes <= self.budget_bytes:
+                break
+            if self._in_use.get(name, 0):
+                continue
+            model, size, release = self._models.pop(name)
+            if release is not None:
+                release(model)
+            total -= size
+            logger.info(f"Evicted Whisper model '{name}' ({size // (1024 * 1024)} MB) to stay within the RAM budget")
+        if total + incoming_bytes > self.budget_bytes:
+            logger.warning("Whisper models in use exceed the RAM budget; loading anyway")
+
+    def _load(self, name: str, loader, size_bytes: int | None, release):
+        estimate = size_bytes if size_bytes is not None else MODEL_SIZES_MB.get(name, 0) * 1024 * 1024
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    return entry[0]
+                self._evict_for(estimate)
+            logger.info(f"Whisper model not loaded. Loading '{name}' model now...")
+            model = loader(name)
+            size = _loaded_size_bytes(model) or estimate
+            logger.info(f"Whisper model '{name}' loaded successfully ({size // (1024 * 1024)} MB).")
+            with self._lock:
+                self._models[name] = (model, size, release)
+            return model
+
+    @contextmanager
+    def use(self, name: str, loader=None, size_bytes: int | None = None, release=None):
+        """
+        Yield the loaded model, pinning it against eviction for the duration of the block.
+        loader (default: the registry's), size_bytes (default: measured after loading, else
+        MODEL_SIZES_MB) and release (called with the entry when it is evicted) describe entries
+        that aren't plain Whisper models.
+        """
+        with self._lock:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+        try:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    self._models.move_to_end(name)
+            model = entry[0] if entry is not None else self._load(name, loader or self._loader, size_bytes, release)
+            yield model
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+
+    def preload(self, names: list[str]) -> None:
+        """Load models ahead of time so the first request doesn't pay the load latency."""
+        for name in names:
+            try:
+                with self.use(name):
+                    pass
+            except Exception as e:
+                logger.error(f"Failed to preload Whisper model '{name}': {e}", exc_info=True)
+
+    def loaded(self) -> list[str]:
+        with self._lock:
+            return list(self._models)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _load_whisper_model(name: str):
+    import whisper
+    return whisper.load_model(name)
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry, sized from WHISPER_RAM_BUDGET_MB."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            budget_mb = env_int("WHISPER_RAM_BUDGET_MB", 4096)
+            logger.info(f"Creating Whisper model registry with a {budget_mb} MB budget")
+            _registry = ModelRegistry(_load_whisper_model, budget_mb * 1024 * 1024)
+        return _registry
@@ -0,0 +1,161 @@
+import logging
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+import numpy as np
+
+from audio_stream import SAMPLE_RATE
+from model_registry import MODEL_SIZES_MB, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# Frame size used when looking for quiet split points
+_FRAME_SECONDS = 0.03
+
+# Per-worker-process model, loaded once by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model_name: str):
+    """Pool initializer: load the model once per worker."""
+    global _worker_model
+    import whisper
+    _worker_model = whisper.load_model(model_name)
+
+
+def _transcribe_chunk(index: int, audio: np.ndarray, offset: float, task: str = "transcribe",
+                      torch_threads: int = 1) -> tuple[int, list[tuple[float, float, str]]]:
+    """
+    Worker task: transcribe (or translate) one chunk with torch_threads intra-op threads and rebase
+    its segment timestamps onto the full audio.
+    """
+    import torch
+    torch.set_num_threads(torch_threads)
+    result = _worker_model.transcribe(audio, fp16=False, task=task)
+    segments = [(seg["start"] + offset, seg["end"] + offset, seg["text"].strip()) for seg in result["segments"]]
+    return index, segments
+
+
+def _frame_energy(audio: np.ndarray) -> np.ndarray:
+    """RMS energy per fixed-size frame."""
+    frame = int(SAMPLE_RATE * _FRAME_SECONDS)
+    usable = len(audio) - len(audio) % frame
+    frames = audio[:usable].reshape(-1, frame)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def find_split_points(audio: np.ndarray, chunk_seconds: float, search_seconds: float = 10.0) -> list[int]:
+    """
+    Choose sample offsets near every chunk_seconds boundary, snapped to the quietest frame
+    within search_seconds either side, so chunks tend to break between words.
+    """
+    energy = _frame_energy(audio)
+    frame = int(SAMPLE_RATE * _FRAME_SECONDS)
+    frames_per_chunk = int(chunk_seconds / _FRAME_SECONDS)
+    search = int(search_seconds / _FRAME_SECONDS)
+    splits = []
+    target = frames_per_chunk
+    while target < len(energy) - search:
+        lo, hi = max(0, target - search), min(len(energy), target + search)
+        best = lo + int(np.argmin(energy[lo:hi]))
+        splits.append(best * frame)
+        target = best + frames_per_chunk
+    return splits
+
+
+def split_audio(audio: np.ndarray, chunk_seconds: float, overlap_seconds: float) -> list[tuple[np.ndarray, float, float]]:
+    """
+    Split audio at quiet points into (chunk, offset_seconds, owned_from_seconds) tuples.
+    Every chunk but the first starts overlap_seconds early; owned_from marks where the
+    chunk's own region begins, and is used to drop duplicated overlap text when stitching.
+    """
+    bounds = [0] + find_split_points(audio, chunk_seconds) + [len(audio)]
+    overlap = int(overlap_seconds * SAMPLE_RATE)
+    chunks = []
+    for start, end in zip(bounds, bounds[1:]):
+        padded_start = max(0, start - overlap)
+        chunks.append((audio[padded_start:end], padded_start / SAMPLE_RATE, start / SAMPLE_RATE))
+    return chunks
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def stitch_segments(chunk_segments: list[list[tuple[float, float, str]]], owned_from: list[float]) -> list[tuple[float, float, str]]:
+    """
+    Merge per-chunk segments (already on the full-audio timeline) in order. Segments that
+    sit mostly in a chunk's leading overlap belong to the previous chunk and are dropped,
+    as is a segment that exactly repeats the previous one.
+    """
+    merged = []
+    for segments, boundary in zip(chunk_segments, owned_from):
+        for start, end, text in segments:
+            if (start + end) / 2 < boundary:
+                continue
+            if merged and _normalize(merged[-1][2]) == _normalize(text):
+                continue
+            merged.append((start, end, text))
+    return merged
+
+
+def _shutdown_pool(pool: ProcessPoolExecutor) -> None:
+    logger.info("Shutting down an idle Whisper process pool")
+    pool.shutdown(wait=False)
+
+
+@contextmanager
+def _use_pool(model_name: str, workers: int):
+    """
+    Yield the process pool for (model_name, workers), started on first use and kept between
+    requests so workers don't reload the model every time. Pools are entries in the model registry:
+    each worker's model counts against WHISPER_RAM_BUDGET_MB, and a pool is only shut down when it
+    is evicted while no transcription is using it.
+    """
+    def start(name: str) -> ProcessPoolExecutor:
+        logger.info(f"Starting Whisper process pool: {workers} workers, model '{model_name}'")
+        # 'spawn' avoids forking a process that may already hold torch/thread state
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name,),
+        )
+
+    size_bytes = workers * MODEL_SIZES_MB.get(model_name, MODEL_SIZES_MB["tiny"]) * 1024 * 1024
+    with get_model_registry().use(f"pool:{model_name}x{workers}", loader=start, size_bytes=size_bytes,
+                                  release=_shutdown_pool) as pool:
+        yield pool
+
+
+def transcribe_parallel(audio: np.ndarray, model_name: str, workers: int, chunk_seconds: float,
+                        overlap_seconds: float, task: str = "transcribe",
+                        threads: int | None = None) -> list[tuple[float, float, str]]:
+    """
+    Transcribe 16 kHz float32 audio by splitting it at quiet points and fanning the chunks out
+    across a process pool. task is Whisper's 'transcribe' or 'translate' (into English).
+    At most threads CPU threads are used in total (default: all CPUs): no more than that many
+    chunks are in flight, and their torch threads split the rest.
+    Returns (start, end, text) segments on the original timeline.
+    """
+    threads = threads or multiprocessing.cpu_count()
+    in_flight = max(1, min(workers, threads))
+    torch_threads = max(1, threads // in_flight)
+    chunks = split_audio(audio, chunk_seconds, overlap_seconds)
+    logger.info(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s of audio as {len(chunks)} chunks, "
+                f"{in_flight} at a time x {torch_threads} threads")
+    results = [None] * len(chunks)
+    pending = set()
+    with _use_pool(model_name, workers) as pool:
+        for i, (chunk, offset, _) in enumerate(chunks):
+            if len(pending) >= in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, segments = future.result()
+                    results[index] = segments
+            pending.add(pool.submit(_transcribe_chunk, i, chunk, offset, task, torch_threads))
+        for future in pending:
+            index, segments = future.result()
+            results[index] = segments
+    return stitch_segments(results, [owned for _, _, owned in chunks])
@@ -0,0 +1,243 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from concurrency import TRANSCRIBE_CONCURRENCY
+from metrics import incr, observe, span
+from model_registry import MODEL_SIZES_MB
+from settings import env_int
+
+logger = logging.getLogger(__name__)
+
+# Transcription backends the scheduler chooses between
+BACKEND_WHISPER_CPP = "whisper.cpp"
+BACKEND_PYTHON = "python-whisper"
+
+# CPU threads all concurrent transcriptions in this process may use together. Load from other
+# processes (the 1-minute load average beyond our own threads) is taken out of it.
+CPU_BUDGET = max(1, env_int("TRANSCRIBE_CPU_BUDGET", os.cpu_count() or 1))
+# Most threads one transcription gets: WHISPER_THREADS if set, else an equal split of the budget
+# between the TRANSCRIBE_CONCURRENCY transcriptions that may run at once
+MAX_THREADS = max(1, min(env_int("WHISPER_THREADS", CPU_BUDGET // TRANSCRIBE_CONCURRENCY), CPU_BUDGET))
+# Fewest threads a transcription is started with; below this it waits instead
+MIN_THREADS = max(1, min(env_int("WHISPER_MIN_THREADS", 2), MAX_THREADS))
+# Transcriptions allowed to wait for CPU; beyond this new ones that can't start at once are refused
+# (background jobs always wait). 0 refuses whenever the CPU budget is taken.
+MAX_QUEUE = max(0, env_int("TRANSCRIBE_MAX_QUEUE", 8))
+
+# Starting estimates of each backend's cost, in thread-seconds per second of audio with the tiny
+# model; larger models scale with their size. Replaced by measurements as transcriptions finish.
+_DEFAULT_COST = {BACKEND_WHISPER_CPP: 0.4, BACKEND_PYTHON: 1.2}
+# Weight of the newest measurement in the running cost estimate
+_COST_SMOOTHING = 0.3
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised when a transcription is refused because too many are already waiting for CPU."""
+
+
+class Plan:
+    """
+    An admitted transcription: the threads it may use and the backends to try, cheapest first.
+    estimates maps each backend to its predicted seconds (None when the duration is unknown).
+    """
+
+    __slots__ = ("model", "duration", "threads", "backends", "estimates")
+
+    def __init__(self, model: str, duration: float | None, threads: int, backends: list[str], estimates: dict):
+        self.model = model
+        self.duration = duration
+        self.threads = threads
+        self.backends = backends
+        self.estimates = estimates
+
+    def describe(self) -> dict:
+        return {"threads": self.threads, "backends": self.backends, "duration": self.duration,
+                "estimates": {b: round(s, 1) for b, s in self.estimates.items() if s is not None}}
+
+
+def _external_load(own_threads: int) -> float:
+    """Runnable threads on this machine that aren't ours, from the 1-minute load average (0 where unsupported)."""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 0.0
+    return max(load - own_threads, 0.0)
+
+
+class TranscribeScheduler:
+    """
+    Admits transcriptions against a CPU thread budget and picks their backend.
+
+    Each transcription gets a fair share of the budget: the budget (less load from other
+    processes) divided by the transcriptions that can run at once, between min_threads and
+    max_threads. Transcriptions start in arrival order once their share is free and fewer than
+    max_running are running; when max_queue are already waiting, new ones that can't start at
+    once are refused.
+
+    The backend is the one predicted to finish first: its startup cost (loading a model that isn't
+    resident) plus the audio duration times its measured cost per audio second, divided by the
+    threads. So short clips go to whichever backend already has the model loaded, and long files to
+    the one with the best throughput.
+    """
+
+    def __init__(self, budget: int, min_threads: int, max_threads: int, max_running: int, max_queue: int):
+        self.budget = budget
+        self.min_threads = min_threads
+        self.max_threads = max_threads
+        self.max_running = max_running
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._allocated = 0
+        self._running = 0
+        self._waiting = []  # tickets, in arrival order
+        self._costs = {}  # (backend, model) -> thread-seconds per audio second
+        self._local = threading.local()
+
+    def cost(self, backend: str, model: str) -> float:
+        with self._cond:
+            cost = self._costs.get((backend, model))
+        if cost is None:
+            cost = _DEFAULT_COST[backend] * MODEL_SIZES_MB.get(model, MODEL_SIZES_MB["tiny"]) / MODEL_SIZES_MB["tiny"]
+        return cost
+
+    def estimate(self, backend: str, model: str, duration: float | None, startup: float, threads: int):
+        """Predicted seconds for a transcription, or None if the duration is unknown."""
+        if duration is None:
+            return None
+        return startup + duration * self.cost(backend, model) / threads
+
+    def rank(self, model: str, duration: float | None, startup: dict, threads: int) -> tuple[list[str], dict]:
+        """
+        Order the available backends (startup maps each to its startup seconds) cheapest first.
+        Without a duration, throughput decides.
+        """
+        estimates = {b: self.estimate(b, model, duration, s, threads) for b, s in startup.items()}
+        if duration is None:
+            backends = sorted(startup, key=lambda b: self.cost(b, model))
+        else:
+            backends = sorted(startup, key=lambda b: estimates[b])
+        return backends, estimates
+
+    def record(self, backend: str, model: str, audio_seconds: float, threads: int, elapsed: float) -> None:
+        """Fold a finished transcription's measured cost into the backend's estimate."""
+        if audio_seconds <= 0:
+            return
+        measured = elapsed * threads / audio_seconds
+        with self._cond:
+            previous = self._costs.get((backend, model))
+            self._costs[(backend, model)] = measured if previous is None else (
+                previous + _COST_SMOOTHING * (measured - previous))
+        observe(f"rtf:{backend}", elapsed / audio_seconds)
+
+    def _share(self, arriving: int = 0) -> int:
+        """
+        Threads for the transcription at the head of the queue, counting arriving transcriptions not
+        queued yet. Caller holds the lock.
+        """
+        available = max(self.budget - _external_load(self._allocated), self.min_threads)
+        contenders = min(self._running + len(self._waiting) + arriving, self.max_running)
+        return max(self.min_threads, min(self.max_threads, int(available // max(contenders, 1))))
+
+    def _can_start(self, ticket: object, threads: int) -> bool:
+        if self._waiting[0] is not ticket or self._running >= self.max_running:
+            return False
+        # Always let one transcription run, even if other processes are keeping the CPU busy
+        return self._running == 0 or self._allocated + threads <= self.budget
+
+    def _would_wait(self) -> bool:
+        """Whether a transcription arriving now would have to wait for CPU. Caller holds the lock."""
+        if self._waiting or self._running >= self.max_running:
+            return True
+        return self._running > 0 and self._allocated + self._share(arriving=1) > self.budget
+
+    def refuse_if_busy(self) -> None:
+        """Raise SchedulerBusy now if admit would refuse, e.g. before downloading audio for a transcription."""
+        with self._cond:
+            self._refuse_if_busy()
+
+    def _refuse_if_busy(self) -> None:
+        if getattr(self._local, "patient", False) or len(self._waiting) < self.max_queue or not self._would_wait():
+            return
+        incr("transcribe_scheduler", result="refused")
+        raise SchedulerBusy(f"The server is busy: {self._running} transcriptions are running and "
+                            f"{len(self._waiting)} are waiting for CPU. Try again later, or use "
+                            f"submit_transcription to queue it.")
+
+    @contextmanager
+    def admit(self, model: str, duration: float | None, startup: dict):
+        """
+        Wait for CPU, then yield the Plan for one transcription; its threads are released when the
+        block exits. startup maps each available backend to its startup seconds. Raises
+        SchedulerBusy if it would have to wait while max_queue transcriptions are already waiting,
+        unless this thread is a background worker (see waits_for_cpu).
+        """
+        ticket = object()
+        with self._cond:
+            self._refuse_if_busy()
+            self._waiting.append(ticket)
+            wait_started = time.perf_counter()
+            try:
+                threads = self._share()
+                while not self._can_start(ticket, threads):
+                    # Re-check periodically too: the load from other processes changes without notifying us
+                    self._cond.wait(timeout=5)
+                    threads = self._share()
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+            waited = time.perf_counter() - wait_started
+            self._allocated += threads
+            self._running += 1
+        if waited > 0.01:
+            observe("transcribe:wait", waited)
+        incr("transcribe_scheduler", result="waited" if waited > 0.01 else "admitted")
+
+        backends, estimates = self.rank(model, duration, startup, threads)
+        plan = Plan(model, duration, threads, backends, estimates)
+        logger.info(f"Scheduled transcription: {plan.describe()}")
+        try:
+            with span("transcribe"):
+                yield plan
+        finally:
+            with self._cond:
+                self._allocated -= threads
+                self._running -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def waits_for_cpu(self):
+        """Within the block, transcriptions started by this thread wait for CPU instead of being refused."""
+        previous = getattr(self._local, "patient", False)
+        self._local.patient = True
+        try:
+            yield
+        finally:
+            self._local.patient = previous
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "budget": self.budget,
+                "allocated_threads": self._allocated,
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "costs": {f"{b}/{m}": round(c, 3) for (b, m), c in self._costs.items()},
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> TranscribeScheduler:
+    """Return the process-wide transcription scheduler, configured from the environment on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            logger.info(f"Creating transcription scheduler: budget={CPU_BUDGET} threads, "
+                        f"{MIN_THREADS}-{MAX_THREADS} per job, {TRANSCRIBE_CONCURRENCY} running, {MAX_QUEUE} queued")
+            _scheduler = TranscribeScheduler(CPU_BUDGET, MIN_THREADS, MAX_THREADS, TRANSCRIBE_CONCURRENCY, MAX_QUEUE)
+        return _scheduler
@@ -0,0 +1,166 @@
+import json
+from array import array
+
+# Output formats accepted by get_youtube_transcript
+FORMAT_PLAIN = "plain"
+FORMAT_SRT = "srt"
+FORMAT_VTT = "vtt"
+FORMAT_JSON = "json"
+OUTPUT_FORMATS = (FORMAT_PLAIN, FORMAT_SRT, FORMAT_VTT, FORMAT_JSON)
+
+
+class Segments:
+    """
+    Timestamped transcript segments, stored as parallel arrays rather than one object per
+    segment: start and end times (seconds) in two float arrays and the texts in a list.
+    A long lecture has thousands of segments, and this keeps them to a few machine words each.
+    """
+
+    __slots__ = ("starts", "ends", "texts")
+
+    def __init__(self, starts=(), ends=(), texts=()):
+        self.starts = array("d", starts)
+        self.ends = array("d", ends)
+        self.texts = list(texts)
+
+    @classmethod
+    def from_text(cls, text: str) -> "Segments":
+        """A single untimed segment, for transcripts that were stored without timings."""
+        return cls([0.0], [0.0], [text]) if text else cls()
+
+    @classmethod
+    def from_json(cls, data: str) -> "Segments":
+        parsed = json.loads(data)
+        return cls(parsed["start"], parsed["end"], parsed["text"])
+
+    def to_json(self) -> str:
+        """Compact serialisation used by the transcript cache (parallel arrays, millisecond precision)."""
+        return json.dumps(
+            {"start": [round(s, 3) for s in self.starts], "end": [round(e, 3) for e in self.ends], "text": self.texts},
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+
+    def append(self, start: float, end: float, text: str) -> None:
+        text = text.strip()
+        if text:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.texts.append(text)
+
+    def extend(self, other: "Segments", offset: float = 0.0) -> None:
+        """Append another run of segments, shifting its times by offset seconds."""
+        if offset:
+            self.starts.extend(s + offset for s in other.starts)
+            self.ends.extend(e + offset for e in other.ends)
+        else:
+            self.starts.extend(other.starts)
+            self.ends.extend(other.ends)
+        self.texts.extend(other.texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.texts)
+
+    def __getitem__(self, index: slice) -> "Segments":
+        return Segments(self.starts[index], self.ends[index], self.texts[index])
+
+    @property
+    def duration(self) -> float:
+        return max(self.ends, default=0.0)
+
+    def text(self) -> str:
+        return " ".join(self.texts)
+
+    def slice(self, start: float | None = None, end: float | None = None) -> "Segments":
+        """The segments overlapping [start, end); either bound may be None."""
+        if start is None and end is None:
+            return self
+        lo = start if start is not None else float("-inf")
+        hi = end if end is not None else float("inf")
+        result = Segments()
+        for s, e, t in self:
+            # Zero-length segments (including untimed ones at 0) match when they fall inside the range
+            if (e > lo and s < hi) or (s == e and lo <= s < hi):
+                result.starts.append(s)
+                result.ends.append(e)
+                result.texts.append(t)
+        return result
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _srt_cue(i: int, s: float, e: float, t: str) -> str:
+    return f"{i}\n{_timestamp(s, ',')} --> {_timestamp(e, ',')}\n{t}\n"
+
+
+def _vtt_cue(s: float, e: float, t: str) -> str:
+    return f"{_timestamp(s, '.')} --> {_timestamp(e, '.')}\n{t}\n"
+
+
+def _json_item(s: float, e: float, t: str) -> dict:
+    return {"start": round(s, 3), "end": round(e, 3), "text": t}
+
+
+def to_srt(segments: Segments, first_index: int = 1) -> str:
+    return "\n".join(_srt_cue(i, s, e, t) for i, (s, e, t) in enumerate(segments, start=first_index))
+
+
+def to_vtt(segments: Segments) -> str:
+    cues = "\n".join(_vtt_cue(s, e, t) for s, e, t in segments)
+    return f"WEBVTT\n\n{cues}"
+
+
+def to_json(segments: Segments) -> str:
+    return json.dumps([_json_item(s, e, t) for s, e, t in segments], ensure_ascii=False)
+
+
+def _rendered_size(output_format: str, i: int, s: float, e: float, t: str) -> int:
+    """Characters one segment adds to the rendered output, separators included."""
+    if output_format == FORMAT_SRT:
+        return len(_srt_cue(i, s, e, t)) + 1
+    if output_format == FORMAT_VTT:
+        return len(_vtt_cue(s, e, t)) + 1
+    if output_format == FORMAT_JSON:
+        return len(json.dumps(_json_item(s, e, t), ensure_ascii=False)) + 2
+    return len(t) + 1
+
+
+def render_page(segments: Segments, output_format: str, start: int, max_chars: int) -> tuple[str, int | None]:
+    """
+    Render the segments from index start onwards, stopping before the output would exceed
+    max_chars (at least one segment is always included). Pages break on segment boundaries, so
+    every page is a valid document in its format. Returns (text, index of the next page's first
+    segment, or None on the last page).
+    """
+    end = start
+    size = 0
+    for i in range(start, len(segments)):
+        size += _rendered_size(output_format, i + 1, segments.starts[i], segments.ends[i], segments.texts[i])
+        if size > max_chars and end > start:
+            break
+        end = i + 1
+    page = segments[start:end]
+    text = to_srt(page, first_index=start + 1) if output_format == FORMAT_SRT else render(page, output_format)
+    return text, (end if end < len(segments) else None)
+
+
+def render(segments: Segments, output_format: str = FORMAT_PLAIN) -> str:
+    """Render segments in one of OUTPUT_FORMATS."""
+    if output_format == FORMAT_SRT:
+        return to_srt(segments)
+    if output_format == FORMAT_VTT:
+        return to_vtt(segments)
+    if output_format == FORMAT_JSON:
+        return to_json(segments)
+    if output_format == FORMAT_PLAIN:
+        return segments.text()
+    raise ValueError(f"Unknown output format '{output_format}'. Choose one of: {', '.join(OUTPUT_FORMATS)}")
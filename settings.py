@@ -0,0 +1,42 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# The project root, used as the base for every default on-disk location
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Where persistent caches (transcripts, lookups, ...) live unless overridden
+CACHE_DIR = os.getenv("YT_CACHE_DIR", os.path.join(PROJECT_DIR, "cache"))
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer from the environment, falling back to default if unset or invalid."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid integer for {name}: {value!r}")
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float from the environment, falling back to default if unset or invalid."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid number for {name}: {value!r}")
+        return default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment ('1', 'true', 'yes', 'on' are true)."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
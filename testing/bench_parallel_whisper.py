@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark chunked parallel Python Whisper against the single-process path.
+
+Usage:
+    python testing/bench_parallel_whisper.py path/to/long_audio.mp3 --workers 1 2 4 8
+
+Prints one JSON document with the wall time and speedup for every worker count.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+
+def main():
+    # Add project root to sys.path to allow importing the project modules
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(script_dir))
+
+    import whisper
+    from parallel_whisper import transcribe_parallel, _use_pool
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("audio", help="Audio file to transcribe")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-seconds", type=float, default=300)
+    parser.add_argument("--overlap-seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    audio = whisper.load_audio(args.audio)
+    report = {
+        "audio": args.audio,
+        "audio_seconds": round(len(audio) / whisper.audio.SAMPLE_RATE, 1),
+        "model": args.model,
+        "cpu_count": multiprocessing.cpu_count(),
+        "chunk_seconds": args.chunk_seconds,
+        "runs": [],
+    }
+
+    baseline = None
+    for workers in args.workers:
+        if workers <= 1:
+            model = whisper.load_model(args.model)
+            start = time.perf_counter()
+            text = model.transcribe(audio, fp16=False)["text"]
+        else:
+            # Warm the pool first so model loading isn't counted against the transcription
+            warm_start = time.perf_counter()
+            with _use_pool(args.model, workers) as pool:
+                list(pool.map(time.sleep, [0.5] * workers))
+            print(f"Pool with {workers} workers ready in {time.perf_counter() - warm_start:.1f}s", file=sys.stderr)
+            start = time.perf_counter()
+            segments = transcribe_parallel(audio, args.model, workers, args.chunk_seconds, args.overlap_seconds)
+            text = " ".join(t for _, _, t in segments)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        report["runs"].append({
+            "workers": workers,
+            "seconds": round(elapsed, 2),
+            "speedup": round(baseline / elapsed, 2),
+            "realtime_factor": round(report["audio_seconds"] / elapsed, 2),
+            "chars": len(text),
+        })
+        print(f"workers={workers}: {elapsed:.1f}s", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+
+"""
+Offline benchmark of the transcript pipeline, with YouTube replaced by local fixtures.
+
+Usage:
+    python testing/bench_pipeline.py --output bench.json
+    python testing/bench_pipeline.py --scenarios captions concurrent --iterations 5 --latency 0.05
+
+Search and audio download go through a fake yt-dlp that serves generated audio clips, and
+caption fetches hit the local YouTube stub (testing/stub_youtube.py), so runs are repeatable and
+need no network. Every scenario runs in its own subprocess with fresh caches, so cold and warm
+timings, peak RSS and disk I/O are measured per scenario.
+
+Scenarios:
+    captions        search + official captions for several caption lengths, cold then warm
+    whisper-cpp     download + whisper.cpp for several clip lengths, cold then warm
+    whisper-python  download + Python Whisper for several clip lengths, cold then warm
+    concurrent      N concurrent get_youtube_transcript calls through an in-memory MCP session
+    startup         time from spawning mcp_server.py to its initialize and tools/list responses,
+                    checked against --startup-target
+
+Prints (or writes) one JSON document; compare two of them to spot regressions between versions.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = ("captions", "whisper-cpp", "whisper-python", "concurrent", "startup")
+
+# Modules that must not be imported just to start the server; they load on first use or in the warm-up
+HEAVY_MODULES = ("whisper", "torch", "numpy", "yt_dlp", "pytube", "youtube_transcript_api", "requests")
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(script_dir)
+
+
+def _latency_summary(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "min": round(ordered[0], 4),
+        "median": round(statistics.median(ordered), 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(statistics.fmean(ordered), 4),
+    }
+
+
+def _stage_medians(records: list[dict]) -> dict:
+    """Median seconds per pipeline stage (search, captions, download, ...) across requests."""
+    stages = {}
+    for record in records:
+        for stage, seconds in (record.get("timings") or {}).items():
+            stages.setdefault(stage, []).append(seconds)
+    return {stage: round(statistics.median(samples), 4) for stage, samples in sorted(stages.items())}
+
+
+def _resource_usage() -> dict:
+    """Peak RSS and disk I/O of this process and the subprocesses it waited for (ffmpeg, whisper-cli)."""
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    usage = {
+        "peak_rss_mb": round(own.ru_maxrss * scale / 1e6, 1),
+        "children_peak_rss_mb": round(children.ru_maxrss * scale / 1e6, 1),
+        "block_reads": own.ru_inblock + children.ru_inblock,
+        "block_writes": own.ru_oublock + children.ru_oublock,
+    }
+    try:
+        with open("/proc/self/io") as f:
+            io = dict(line.split(": ") for line in f.read().splitlines())
+        usage["read_bytes"] = int(io["read_bytes"])
+        usage["write_bytes"] = int(io["write_bytes"])
+    except OSError:
+        pass  # not Linux
+    return usage
+
+
+def _run_requests(calls: list[dict]) -> tuple[list[dict], list[float]]:
+    """Run get_youtube_transcript for each kwargs dict in turn. Returns (per-request records, latencies)."""
+    from youtube_tool import get_youtube_transcript
+
+    records, latencies = [], []
+    for kwargs in calls:
+        start = time.perf_counter()
+        result = get_youtube_transcript(**kwargs)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        records.append({
+            "query": kwargs["query"],
+            "status": result.get("status"),
+            "cache": result.get("cache"),
+            "source": result.get("source"),
+            "seconds": round(elapsed, 4),
+            "timings": result.get("timings"),
+            "bytes_fetched": result.get("bytes_fetched"),
+            "vad": result.get("vad"),
+            "chars": len(result.get("transcript") or ""),
+            "error": result.get("message"),
+        })
+    return records, latencies
+
+
+def _captions_fixture(lengths: list[int], iterations: int) -> tuple[dict, dict, list[tuple[int, str]]]:
+    """Caption tracks, search table and (length, query) pairs for distinct videos."""
+    from stub_youtube import make_caption_track
+
+    captions, videos, searches, queries = {}, {}, {}, []
+    for length in lengths:
+        for i in range(iterations):
+            video_id = f"cap{length:05d}_{i:02d}"[:11].ljust(11, "x")
+            query = f"benchmark captions {length} lines run {i}"
+            captions[video_id] = [make_caption_track(length, generated=True), make_caption_track(length)]
+            videos[video_id] = {"title": f"Captions fixture {length}/{i}"}
+            searches[query] = video_id
+            queries.append((length, query))
+    return captions, videos, searches, queries
+
+
+def scenario_captions(args) -> dict:
+    from stub_youtube import stub_youtube, stub_yt_dlp
+
+    captions, videos, searches, queries = _captions_fixture(args.caption_lengths, args.iterations)
+    report = {"runs": []}
+    with stub_youtube(captions, args.latency), stub_yt_dlp(videos, searches, args.latency):
+        for length in args.caption_lengths:
+            calls = [{"query": q} for n, q in queries if n == length]
+            cold, cold_latency = _run_requests(calls)
+            warm, warm_latency = _run_requests(calls)
+            report["runs"].append({
+                "caption_lines": length,
+                "cold": _latency_summary(cold_latency),
+                "cold_stages": _stage_medians(cold),
+                "warm": _latency_summary(warm_latency),
+                "requests": cold + warm,
+            })
+    return report
+
+
+def scenario_whisper(args, backend: str) -> dict:
+    import youtube_tool
+    from stub_youtube import make_audio_clip, stub_youtube, stub_yt_dlp
+
+    if shutil.which("ffmpeg") is None:
+        return {"skipped": "ffmpeg is not on PATH"}
+    if backend == "whisper-cpp":
+        if not youtube_tool._check_whisper_cpp() or youtube_tool._whisper_cpp_model_path(args.model) is None:
+            return {"skipped": f"whisper-cli or the '{args.model}' ggml model is not available"}
+    else:
+        if importlib.util.find_spec("whisper") is None:
+            return {"skipped": "openai-whisper is not installed"}
+        youtube_tool._whisper_cpp_available = False  # force the Python backend
+
+    fixtures = tempfile.mkdtemp(prefix="bench-audio-")
+    videos, report = {}, {"model": args.model, "runs": []}
+    for seconds in args.clip_seconds:
+        clip = make_audio_clip(os.path.join(fixtures, f"clip_{seconds}.wav"), seconds)
+        for i in range(args.iterations):
+            videos[f"wav{seconds:04d}_{i:02d}"[:11].ljust(11, "x")] = {"title": f"Audio fixture {seconds}s/{i}",
+                                                                      "audio": clip, "duration": seconds}
+
+    # No caption tracks at all, so force_whisper is only a shortcut past the caption fetch
+    with stub_youtube({}, args.latency), stub_yt_dlp(videos, {}, args.latency):
+        for seconds in args.clip_seconds:
+            calls = [{"query": video_id, "force_whisper": True, "model": args.model}
+                     for video_id in videos if video_id.startswith(f"wav{seconds:04d}"[:8])]
+            cold, cold_latency = _run_requests(calls)
+            warm, warm_latency = _run_requests(calls)
+            report["runs"].append({
+                "audio_seconds": seconds,
+                "cold": _latency_summary(cold_latency),
+                "realtime_factor": round(seconds / statistics.median(cold_latency), 2) if cold_latency else None,
+                "cold_stages": _stage_medians(cold),
+                "warm": _latency_summary(warm_latency),
+                "requests": cold + warm,
+            })
+    shutil.rmtree(fixtures, ignore_errors=True)
+    return report
+
+
+def scenario_concurrent(args) -> dict:
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from stub_youtube import stub_youtube, stub_yt_dlp
+
+    import mcp_server
+
+    total = args.concurrency * args.iterations
+    captions, videos, searches, queries = _captions_fixture([args.caption_lengths[0]], total)
+
+    async def run() -> dict:
+        async with create_connected_server_and_client_session(mcp_server.server) as client:
+            latencies = []
+
+            async def one(query: str):
+                start = time.perf_counter()
+                result = await client.call_tool("get_youtube_transcript", {"query": query})
+                latencies.append(time.perf_counter() - start)
+                return not result.isError and result.content[0].text.startswith("**Title:**")
+
+            start = time.perf_counter()
+            ok = 0
+            for round_start in range(0, total, args.concurrency):
+                batch = queries[round_start:round_start + args.concurrency]
+                ok += sum(await asyncio.gather(*(one(q) for _, q in batch)))
+            elapsed = time.perf_counter() - start
+            return {
+                "concurrency": args.concurrency,
+                "requests": total,
+                "succeeded": ok,
+                "seconds": round(elapsed, 4),
+                "throughput_rps": round(total / elapsed, 2),
+                "latency": _latency_summary(latencies),
+            }
+
+    with stub_youtube(captions, args.latency), stub_yt_dlp(videos, searches, args.latency):
+        return asyncio.run(run())
+
+
+def scenario_startup(args) -> dict:
+    """Spawn the real stdio server and time the MCP handshake, as a client launching it would see it."""
+    init_request = {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+                    "params": {"protocolVersion": "2024-11-05", "capabilities": {},
+                               "clientInfo": {"name": "bench", "version": "1.0.0"}}}
+    messages = [json.dumps(m) + "\n" for m in (
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+    )]
+
+    initialize, list_tools = [], []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, os.path.join(project_dir, "mcp_server.py")], cwd=project_dir,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            proc.stdin.write(json.dumps(init_request) + "\n")
+            proc.stdin.flush()
+            if not proc.stdout.readline():
+                return {"error": "server exited before answering initialize"}
+            initialize.append(time.perf_counter() - start)
+            proc.stdin.writelines(messages)
+            proc.stdin.flush()
+            response = json.loads(proc.stdout.readline() or "{}")
+            if "result" not in response:
+                return {"error": f"tools/list failed: {response}"}
+            list_tools.append(time.perf_counter() - start)
+        finally:
+            proc.kill()
+            proc.wait()
+
+    median = statistics.median(list_tools)
+    return {
+        "initialize": _latency_summary(initialize),
+        "list_tools": _latency_summary(list_tools),
+        "target_seconds": args.startup_target,
+        "target_met": median <= args.startup_target,
+    }
+
+
+def run_child(scenario: str, args) -> dict:
+    """Run one scenario in this (fresh) process and return its report."""
+    cache_dir = tempfile.mkdtemp(prefix="bench-cache-")
+    os.environ["YT_CACHE_DIR"] = cache_dir
+    sys.path.insert(0, project_dir)
+    sys.path.insert(0, script_dir)
+    # Keep the pipeline's logging out of mcp_server.log (basicConfig there is then a no-op)
+    logging.basicConfig(filename=os.path.join(cache_dir, "bench.log"), level=logging.INFO)
+
+    import_start = time.perf_counter()
+    import youtube_tool  # noqa: F401
+    import_seconds = time.perf_counter() - import_start
+    heavy_modules = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    if scenario == "captions":
+        report = scenario_captions(args)
+    elif scenario == "concurrent":
+        report = scenario_concurrent(args)
+    elif scenario == "startup":
+        report = scenario_startup(args)
+    else:
+        report = scenario_whisper(args, scenario)
+
+    from metrics import snapshot
+    stats = snapshot()
+    report.update({
+        "scenario": scenario,
+        "import_seconds": round(import_seconds, 3),
+        "heavy_modules_at_import": heavy_modules,
+        "stages": stats["stages"],
+        "counters": stats["counters"],
+        "resources": _resource_usage(),
+    })
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return report
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=project_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, default=3, help="Distinct videos per configuration")
+    parser.add_argument("--caption-lengths", type=int, nargs="+", default=[50, 2000],
+                        help="Caption lines per fixture video")
+    parser.add_argument("--clip-seconds", type=int, nargs="+", default=[10, 60, 300],
+                        help="Lengths of the generated audio clips")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent MCP calls in the concurrent scenario")
+    parser.add_argument("--startup-target", type=float, default=1.0,
+                        help="Seconds from spawning the server to its tools/list response (median) to count as met")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds of simulated network latency per stub request")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args)))
+        return
+
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("child", "output")},
+        "scenarios": [],
+    }
+    child_args = [a for a in sys.argv[1:]]
+    if "--output" in child_args:
+        index = child_args.index("--output")
+        del child_args[index:index + 2]
+    for scenario in args.scenarios:
+        print(f"Running scenario '{scenario}'...", file=sys.stderr)
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), *child_args, "--child", scenario],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            result = {"scenario": scenario, "error": proc.stderr.strip().splitlines()[-1:] or ["unknown error"]}
+        else:
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["wall_seconds"] = round(time.perf_counter() - start, 2)
+        report["scenarios"].append(result)
+        print(f"  done in {result['wall_seconds']}s", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+"""
+A local stand-in for the parts of YouTube the caption path talks to: the watch page,
+the innertube player endpoint and the timedtext caption endpoint. Used by the offline
+tests and benchmarks so they never touch the network.
+
+stub_yt_dlp() does the same for search and audio download by replacing yt_dlp.YoutubeDL,
+and make_audio_clip() writes synthetic audio fixtures of any length.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+# video_id -> list of caption tracks: {"language_code", "name", "generated", "snippets": [(start, dur, text), ...]}
+# and optionally "translations": language codes YouTube can translate the track into. Translated
+# snippets come back as "[<code>] <original text>".
+DEFAULT_CAPTIONS = {
+    "stubVideo01": [
+        {"language_code": "en", "name": "English (auto-generated)", "generated": True,
+         "snippets": [(0.0, 1.5, "auto hello"), (1.5, 2.0, "auto world")]},
+        {"language_code": "en", "name": "English", "generated": False,
+         "snippets": [(0.0, 1.5, "Hello"), (1.5, 2.0, "world")]},
+    ],
+    "stubVideo02": [
+        {"language_code": "fr", "name": "French (auto-generated)", "generated": True,
+         "snippets": [(0.0, 2.0, "bonjour")]},
+        {"language_code": "de-DE", "name": "German", "generated": False, "translations": ["en", "fr"],
+         "snippets": [(0.0, 2.0, "Hallo Welt")]},
+    ],
+}
+
+
+class StubYouTube:
+    """Serves canned caption fixtures and records which client connections were used."""
+
+    def __init__(self, captions: dict | None = None, latency: float = 0.0):
+        self.captions = captions if captions is not None else DEFAULT_CAPTIONS
+        self.latency = latency  # seconds added to every response, to mimic a real network round trip
+        self.requests = []
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _record(self, handler):
+        with self._lock:
+            self.requests.append(handler.path)
+            self.connections.add(handler.client_address)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _player_json(self, video_id: str) -> dict:
+        tracks = self.captions.get(video_id)
+        if tracks is None:
+            return {"playabilityStatus": {"status": "OK"}}
+        translations = sorted({code for track in tracks for code in track.get("translations", [])})
+        return {
+            "playabilityStatus": {"status": "OK"},
+            "captions": {"playerCaptionsTracklistRenderer": {
+                "captionTracks": [
+                    {
+                        "baseUrl": f"{self.base_url}/api/timedtext?v={video_id}&track={i}",
+                        "name": {"runs": [{"text": track["name"]}]},
+                        "languageCode": track["language_code"],
+                        "kind": "asr" if track["generated"] else "",
+                        "isTranslatable": bool(track.get("translations")),
+                    }
+                    for i, track in enumerate(tracks)
+                ],
+                "translationLanguages": [{"languageCode": code, "languageName": {"runs": [{"text": code}]}}
+                                         for code in translations],
+            }},
+        }
+
+    def _timedtext_xml(self, video_id: str, track: int, translate_to: str | None = None) -> str:
+        snippets = self.captions[video_id][track]["snippets"]
+        prefix = f"[{translate_to}] " if translate_to else ""
+        body = "".join(f'<text start="{s}" dur="{d}">{escape(prefix + t)}</text>' for s, d, t in snippets)
+        return f'<?xml version="1.0" encoding="utf-8" ?><transcript>{body}</transcript>'
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+            def _send(self, body: str, content_type: str):
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                stub._record(self)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/watch":
+                    self._send('<html><script>var cfg = {"INNERTUBE_API_KEY": "stubkey"};</script></html>',
+                               "text/html")
+                elif url.path == "/api/timedtext":
+                    self._send(stub._timedtext_xml(query["v"][0], int(query["track"][0]), query.get("tlang", [None])[0]),
+                               "text/xml")
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                stub._record(self)
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                self._send(json.dumps(stub._player_json(payload.get("videoId"))), "application/json")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@contextmanager
+def stub_youtube(captions: dict | None = None, latency: float = 0.0):
+    """Run a StubYouTube and point youtube-transcript-api at it for the duration of the block."""
+    from youtube_transcript_api import _transcripts
+
+    stub = StubYouTube(captions, latency).start()
+    original = (_transcripts.WATCH_URL, _transcripts.INNERTUBE_API_URL)
+    _transcripts.WATCH_URL = stub.base_url + "/watch?v={video_id}"
+    _transcripts.INNERTUBE_API_URL = stub.base_url + "/youtubei/v1/player?key={api_key}"
+    try:
+        yield stub
+    finally:
+        _transcripts.WATCH_URL, _transcripts.INNERTUBE_API_URL = original
+        stub.stop()
+
+
+def make_caption_track(snippet_count: int, generated: bool = False, seconds_per_snippet: float = 2.5) -> dict:
+    """A caption track fixture with snippet_count short lines, for StubYouTube."""
+    return {
+        "language_code": "en",
+        "name": "English (auto-generated)" if generated else "English",
+        "generated": generated,
+        "snippets": [(i * seconds_per_snippet, seconds_per_snippet, f"caption line number {i} of the benchmark")
+                     for i in range(snippet_count)],
+    }
+
+
+def make_audio_clip(path: str, seconds: float, sample_rate: int = 16000) -> str:
+    """
+    Write a 16-bit mono WAV of the given length: syllable-rate bursts of a few harmonics with
+    a pause every fifth second, so Whisper has something speech-like to chew on and silence
+    detection has gaps. Generated on demand so no binary fixtures live in the repository.
+    """
+    import numpy as np
+
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        block = 60 * sample_rate  # write a minute at a time to bound memory
+        total = int(seconds * sample_rate)
+        for block_start in range(0, total, block):
+            t = np.arange(block_start, min(block_start + block, total)) / sample_rate
+            envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (t.astype(int) % 5 != 4)
+            phase = 2 * np.pi * (140 * t - 40 / (2 * np.pi * 0.3) * np.cos(2 * np.pi * 0.3 * t))
+            signal = envelope * sum(np.sin(k * phase) / k for k in (1, 2, 3))
+            wav.writeframes((np.clip(0.3 * signal, -1, 1) * 32767).astype("<i2").tobytes())
+    return path
+
+
+class FakeYoutubeDL:
+    """
+    Stands in for yt_dlp.YoutubeDL: searches resolve through a query -> video ID table and
+    downloads copy a local audio fixture to the requested output path. Every extraction costs
+    latency; a search without extract_flat also fully extracts its result, costing it again,
+    as resolving formats on YouTube takes extra round trips.
+    """
+
+    videos: dict = {}    # video_id -> {"title": ..., "audio": path to a fixture file, "duration": seconds}
+    searches: dict = {}  # query -> video_id
+    latency: float = 0.0
+
+    def __init__(self, params: dict | None = None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _info(self, video_id: str) -> dict:
+        from yt_dlp.utils import DownloadError
+
+        video = self.videos.get(video_id)
+        if video is None:
+            raise DownloadError(f"ERROR: [stub] {video_id}: Video unavailable")
+        size = os.path.getsize(video["audio"]) if video.get("audio") else 0
+        return {
+            "id": video_id,
+            "title": video["title"],
+            "duration": video.get("duration"),
+            "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+            "url": f"file://{video.get('audio', '')}",
+            "format_id": "fixture",
+            "acodec": "pcm_s16le",
+            "abr": 256,
+            "filesize": size,
+            "http_headers": {},
+        }
+
+    def extract_info(self, url: str, download: bool = True) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urlparse(url)
+        if not parsed.scheme:
+            query = url.split(":", 1)[1] if url.startswith("ytsearch") else url
+            video_id = self.searches.get(query)
+            if not video_id:
+                return {"entries": []}
+            info = self._info(video_id)
+            if self.params.get("extract_flat"):
+                return {"entries": [{"id": video_id, "title": info["title"], "url": info["webpage_url"],
+                                     "duration": info["duration"]}]}
+            if self.latency:
+                time.sleep(self.latency)
+            return {"entries": [info]}
+        video_id = parse_qs(parsed.query).get("v", [parsed.path.rsplit("/", 1)[-1]])[0]
+        info = self._info(video_id)
+        if download:
+            audio = self.videos[video_id].get("audio")
+            if not audio:
+                from yt_dlp.utils import DownloadError
+                raise DownloadError(f"ERROR: [stub] {video_id}: no audio fixture")
+            shutil.copyfile(audio, self.params["outtmpl"])
+        return info
+
+    def download(self, urls: list) -> int:
+        for url in urls:
+            self.extract_info(url, download=True)
+        return 0
+
+
+@contextmanager
+def stub_yt_dlp(videos: dict, searches: dict | None = None, latency: float = 0.0):
+    """Replace yt_dlp.YoutubeDL with FakeYoutubeDL serving the given fixtures for the block."""
+    import yt_dlp
+
+    fake = type("FakeYoutubeDL", (FakeYoutubeDL,), {"videos": videos, "searches": searches or {}, "latency": latency})
+    with mock.patch.object(yt_dlp, "YoutubeDL", fake):
+        yield fake
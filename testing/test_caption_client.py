@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for the pooled caption client, run against the local YouTube stub.
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+sys.path.insert(0, script_dir)
+
+from stub_youtube import stub_youtube  # noqa: E402
+import caption_client  # noqa: E402
+
+
+def test_prefers_manual_captions():
+    """The manual track wins over the auto-generated one."""
+    with stub_youtube():
+        segments, source = caption_client.fetch_best_captions("stubVideo01")
+    assert segments.text() == "Hello world"
+    assert list(segments) == [(0.0, 1.5, "Hello"), (1.5, 3.5, "world")]
+    assert source == "Official YouTube Captions (Manual)"
+
+
+def test_language_preference_ranks_tracks():
+    """The first preferred language that has a track wins, even over a manual track in another language."""
+    with stub_youtube():
+        segments, source = caption_client.fetch_best_captions("stubVideo02", languages=["fr", "de"])
+        assert segments.text() == "bonjour"
+        assert source == "Official YouTube Captions (Generated)"
+        # 'de' matches the regional 'de-DE' track
+        segments, _ = caption_client.fetch_best_captions("stubVideo02", languages=["es", "de"])
+        assert segments.text() == "Hallo Welt"
+
+
+def test_translates_server_side():
+    """Without a track in the wanted language, YouTube's translation of the best-ranked track is used."""
+    with stub_youtube() as stub:
+        segments, source = caption_client.fetch_best_captions("stubVideo02", languages=["de"], translate_to="en")
+    assert segments.text() == "[en] Hallo Welt"
+    assert source == "Official YouTube Captions (Translated from de-DE to en)"
+    assert any("tlang=en" in path for path in stub.requests)
+
+
+def test_untranslatable_target_returns_none():
+    """A translate_to that YouTube can't deliver returns None so the caller can fall back to Whisper."""
+    with stub_youtube():
+        assert caption_client.fetch_best_captions("stubVideo02", translate_to="ja") is None
+        assert caption_client.fetch_best_captions("stubVideo01", translate_to="de") is None
+
+
+def test_missing_captions_raise():
+    """Videos without caption tracks surface the library's TranscriptsDisabled error."""
+    from youtube_transcript_api import TranscriptsDisabled
+    with stub_youtube():
+        try:
+            caption_client.fetch_best_captions("noCaptions1")
+        except TranscriptsDisabled:
+            return
+    raise AssertionError("expected TranscriptsDisabled")
+
+
+def test_connections_are_reused():
+    """Sequential fetches from one thread share a single keep-alive connection."""
+    with stub_youtube() as stub:
+        for _ in range(3):
+            caption_client.fetch_best_captions("stubVideo01")
+    assert len(stub.requests) == 9
+    assert len(stub.connections) == 1, stub.connections
+
+
+def test_concurrent_fetches_share_the_pool():
+    """Fetches from many worker threads run concurrently on the shared connection pool."""
+    with stub_youtube() as stub, ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: caption_client.fetch_best_captions("stubVideo01"), range(8)))
+    assert all(segments.text() == "Hello world" for segments, _ in results)
+    # Far fewer connections than the 24 requests made
+    assert len(stub.connections) <= caption_client.NETWORK_CONCURRENCY
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
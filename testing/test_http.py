@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+"""
+Starts mcp_server.py in HTTP mode on a free localhost port and talks to it with the MCP SDK's
+streamable HTTP and SSE clients, checking that several clients are served by one shared process,
+that each client's concurrent calls are limited, that results report their timings, and that
+MCP_HTTP_TOKEN is enforced.
+Runs offline: the tools it calls only touch the (temporary) local stores.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(port: int, cache_dir: str, **extra_env: str) -> subprocess.Popen:
+    env = dict(os.environ, MCP_TRANSPORT="http", MCP_HTTP_PORT=str(port), MCP_WARMUP="0", YT_CACHE_DIR=cache_dir,
+               **extra_env)
+    process = subprocess.Popen([sys.executable, "mcp_server.py"], cwd=project_root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited early: {process.stderr.read().decode(errors='replace')}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not start listening in time")
+
+
+async def _search(session: ClientSession, query: str) -> str:
+    result = await session.call_tool("search_transcripts", {"query": query})
+    return result.content[0].text
+
+
+async def _stats(session: ClientSession) -> dict:
+    result = await session.call_tool("get_server_stats", {})
+    return json.loads(result.content[0].text)
+
+
+async def _exercise(port: int) -> dict:
+    base = f"http://127.0.0.1:{port}"
+    async with streamablehttp_client(f"{base}/mcp") as (read_a, write_a, _), \
+            sse_client(f"{base}/sse") as (read_b, write_b):
+        async with ClientSession(read_a, write_a) as a, ClientSession(read_b, write_b) as b:
+            await asyncio.gather(a.initialize(), b.initialize())
+            tools = await a.list_tools()
+            assert "search_transcripts" in {tool.name for tool in tools.tools}
+            texts = await asyncio.gather(*(_search(client, "anything") for client in (a, b, a, b)))
+            assert all(text.startswith("No stored transcript matches") for text in texts)
+            return await _stats(b)
+
+
+def test_clients_share_one_server():
+    """A streamable HTTP client and an SSE client are served concurrently by one process."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        process = _start_server(port, cache_dir)
+        try:
+            stats = asyncio.run(_exercise(port))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    # Both clients' searches were counted by the same process
+    searches = sum(c["value"] for c in stats["counters"] if c["name"] == "transcript_searches")
+    assert searches == 4
+
+
+async def _transcript(port: int, video_url: str) -> str:
+    async with streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            result = await session.call_tool("get_youtube_transcript", {"query": video_url})
+            return result.content[0].text
+
+
+def test_transcript_reports_timings():
+    """A transcript served from the store reports its per-stage timings to the client."""
+    from segments import Segments
+    from transcript_cache import SOURCE_CAPTIONS, TranscriptCache, caption_key
+
+    port, video_url = _free_port(), "https://www.youtube.com/watch?v=httpVid0001"
+    with tempfile.TemporaryDirectory() as cache_dir:
+        TranscriptCache(os.path.join(cache_dir, "transcripts.sqlite3"), 0, 0).put(
+            "httpVid0001", SOURCE_CAPTIONS, caption_key(), "Timed", video_url, "Official YouTube Captions (Manual)",
+            Segments([0.0], [1.0], ["hello there"]))
+        process = _start_server(port, cache_dir)
+        try:
+            text = asyncio.run(_transcript(port, video_url))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    assert "**Cache:** hit" in text, text
+    assert "**Timings:** " in text and "total " in text, text
+    assert text.endswith("hello there")
+
+
+async def _status(session: ClientSession, job_id: str, wait: float) -> float:
+    """Long-poll a job that stays running; returns when the call finished, on the monotonic clock."""
+    await session.call_tool("get_job_status", {"job_id": job_id, "wait_seconds": wait})
+    return time.monotonic()
+
+
+async def _exercise_limit(port: int, job_id: str, wait: float) -> tuple[list[float], float, dict]:
+    base = f"http://127.0.0.1:{port}"
+    async with streamablehttp_client(f"{base}/mcp") as (read_a, write_a, _), \
+            streamablehttp_client(f"{base}/mcp") as (read_b, write_b, _):
+        async with ClientSession(read_a, write_a) as a, ClientSession(read_b, write_b) as b:
+            await asyncio.gather(a.initialize(), b.initialize())
+            start = time.monotonic()
+            a_first, a_second, b_only = await asyncio.gather(_status(a, job_id, wait), _status(a, job_id, wait),
+                                                             _status(b, job_id, wait))
+            return sorted([a_first - start, a_second - start]), b_only - start, await _stats(a)
+
+
+def test_per_client_call_limit():
+    """With MCP_CLIENT_MAX_CONCURRENCY=1 a client's calls run one at a time, without holding up other clients."""
+    from jobs import JobQueue
+    from singleflight import file_lock
+
+    port, wait = _free_port(), 1.5
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # A job this test process owns and never finishes, so get_job_status waits the full wait_seconds
+        queue = JobQueue(os.path.join(cache_dir, "jobs.sqlite3"), 0, 3)
+        job, _ = queue.submit({"query": "never finishes"})
+        queue.claim()
+        with file_lock(queue.owner_lock_path(queue.owner)):
+            process = _start_server(port, cache_dir, MCP_CLIENT_MAX_CONCURRENCY="1")
+            try:
+                a_done, b_done, stats = asyncio.run(_exercise_limit(port, job["id"], wait))
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+    # Client A's second call waited for its first; client B's ran alongside A's first
+    assert a_done[1] >= 2 * wait
+    assert b_done < 2 * wait
+    queued = sum(c["value"] for c in stats["counters"] if c["name"] == "client_calls_queued")
+    assert queued == 1
+
+
+def _post_status(url: str, headers: dict) -> int:
+    request = urllib.request.Request(url, data=b"{}", method="POST",
+                                     headers={"Content-Type": "application/json", **headers})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+async def _list_tools(url: str, headers: dict) -> set[str]:
+    async with streamablehttp_client(url, headers=headers) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            return {tool.name for tool in (await session.list_tools()).tools}
+
+
+def test_token_required():
+    """With MCP_HTTP_TOKEN set, requests without the right bearer token are rejected before reaching MCP."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/mcp"
+    with tempfile.TemporaryDirectory() as cache_dir:
+        process = _start_server(port, cache_dir, MCP_HTTP_TOKEN="s3cret")
+        try:
+            assert _post_status(url, {}) == 401
+            assert _post_status(url, {"Authorization": "Bearer wrong"}) == 401
+            assert _post_status(f"http://127.0.0.1:{port}/sse", {"Authorization": "Bearer s3cre"}) == 401
+            tools = asyncio.run(_list_tools(url, {"Authorization": "Bearer s3cret"}))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    assert "search_transcripts" in tools
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
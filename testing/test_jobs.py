@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for the persistent job queue: submit de-duplication, claiming, recovery of jobs left
+running by a process that died, and the worker pool. Two JobQueue objects on one database stand in
+for two server processes.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+from jobs import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobQueue, JobRunner  # noqa: E402
+from singleflight import file_lock  # noqa: E402
+
+
+def _queue(directory: str, max_attempts: int = 2) -> JobQueue:
+    return JobQueue(os.path.join(directory, "jobs.sqlite3"), 3600, max_attempts)
+
+
+def _wait_for_state(queue: JobQueue, job_id: str, state: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job["state"] == state:
+            return job
+        assert time.monotonic() < deadline, f"job stayed {job['state']}"
+        time.sleep(0.05)
+
+
+def test_submit_deduplicates_and_claims_in_order():
+    """An identical pending job is reused; claims take the oldest queued job first."""
+    with tempfile.TemporaryDirectory() as directory:
+        queue = _queue(directory)
+        first, created = queue.submit({"query": "abc", "model": "tiny", "ignored": 1})
+        assert created and first["params"] == {"query": "abc", "model": "tiny"}
+        again, created = queue.submit({"query": "abc", "model": "tiny"})
+        assert not created and again["id"] == first["id"]
+        second, _ = queue.submit({"query": "def"})
+        assert queue.queue_position(second) == 2
+
+        claimed = queue.claim()
+        assert claimed["id"] == first["id"] and claimed["state"] == JOB_RUNNING and claimed["attempts"] == 1
+        assert queue.queue_position(queue.get(second["id"])) == 1
+        queue.finish(first["id"], result={"status": "success"})
+        assert queue.get(first["id"])["state"] == JOB_SUCCEEDED
+        # Once finished, the same parameters make a new job
+        assert queue.submit({"query": "abc", "model": "tiny"})[1]
+
+
+def test_recover_orphans_only_takes_dead_owners():
+    """A running job is requeued only once its owner's lock is free, and failed after max_attempts."""
+    with tempfile.TemporaryDirectory() as directory:
+        crashed, survivor = _queue(directory), _queue(directory)
+        job, _ = crashed.submit({"query": "abc"})
+
+        with file_lock(crashed.owner_lock_path(crashed.owner)):
+            crashed.claim()
+            assert survivor.recover_orphans() == 0
+            assert survivor.get(job["id"])["state"] == JOB_RUNNING
+        # The owner lock was released: the owning process has exited
+        assert survivor.recover_orphans() == 1
+        requeued = survivor.get(job["id"])
+        assert requeued["state"] == JOB_QUEUED and requeued["owner"] is None
+
+        # Its second attempt dies too, which uses up max_attempts
+        assert crashed.claim()["attempts"] == 2
+        assert survivor.recover_orphans() == 1
+        abandoned = survivor.get(job["id"])
+        assert abandoned["state"] == JOB_FAILED and "2 attempts" in abandoned["error"]
+
+
+def test_runner_records_outcomes():
+    """Workers store successful results, and fail jobs that return an error or raise."""
+    def run_job(params):
+        if params["query"] == "raise":
+            raise RuntimeError("boom")
+        if params["query"] == "error":
+            return {"status": "error", "message": "no captions"}
+        return {"status": "success", "title": params["query"]}
+
+    with tempfile.TemporaryDirectory() as directory:
+        queue = _queue(directory)
+        runner = JobRunner(queue, run_job, workers=2)
+        runner.start()
+        ok, _ = queue.submit({"query": "fine"})
+        error, _ = queue.submit({"query": "error"})
+        raised, _ = queue.submit({"query": "raise"})
+        runner.notify()
+        assert _wait_for_state(queue, ok["id"], JOB_SUCCEEDED)["result"]["title"] == "fine"
+        assert _wait_for_state(queue, error["id"], JOB_FAILED)["error"] == "no captions"
+        assert "boom" in _wait_for_state(queue, raised["id"], JOB_FAILED)["error"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
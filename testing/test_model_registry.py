@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for the Whisper model registry's RAM budget, with fake models so nothing is loaded.
+"""
+
+import os
+import sys
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+from model_registry import ModelRegistry  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def _registry(budget_mb: int) -> tuple[ModelRegistry, list[str]]:
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        return f"model:{name}"
+
+    return ModelRegistry(loader, budget_mb * MB), loads
+
+
+def test_evicts_least_recently_used_idle_model():
+    """A model that doesn't fit evicts the least recently used idle one; used models are reused."""
+    registry, loads = _registry(500)
+    with registry.use("tiny") as model:
+        assert model == "model:tiny"
+    with registry.use("base"):
+        pass
+    with registry.use("tiny"):
+        pass
+    assert registry.loaded() == ["base", "tiny"]
+    with registry.use("base"):
+        pass
+    assert loads == ["tiny", "base"]
+    with registry.use("small"):
+        assert registry.loaded() == ["small"]
+
+
+def test_external_entries_are_released_only_when_idle():
+    """An entry with its own loader and size counts against the budget and is released when evicted idle."""
+    registry, _ = _registry(1000)
+    released = []
+
+    def start(name):
+        return f"pool:{name}"
+
+    with registry.use("pool", loader=start, size_bytes=600 * MB, release=released.append) as pool:
+        assert pool == "pool:pool"
+        # Pinned while in use: loading another model goes over budget instead of releasing it
+        with registry.use("base"):
+            with registry.use("small"):
+                pass
+        assert released == []
+        assert "pool" in registry.loaded()
+    with registry.use("turbo"):
+        pass
+    assert released == ["pool:pool"]
+    assert "pool" not in registry.loaded()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
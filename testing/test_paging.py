@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for transcript paging: render_page, and the cursor round trip through
+get_youtube_transcript (served from a temporary transcript cache, so nothing is fetched).
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+import youtube_tool  # noqa: E402
+from segments import FORMAT_JSON, FORMAT_PLAIN, FORMAT_SRT, OUTPUT_FORMATS, Segments, render_page  # noqa: E402
+from transcript_cache import SOURCE_CAPTIONS, TranscriptCache, caption_key  # noqa: E402
+
+VIDEO_ID = "pageVid0001"
+OTHER_ID = "pageVid0002"
+SEGMENTS = Segments([i * 2.0 for i in range(40)], [i * 2.0 + 2 for i in range(40)],
+                    [f"segment number {i} says something" for i in range(40)])
+
+
+def test_render_page_splits_on_segment_boundaries():
+    """Pages stay within max_chars, cover every segment exactly once, and SRT numbering continues."""
+    for output_format in OUTPUT_FORMATS:
+        start, pages = 0, []
+        while start is not None:
+            text, next_index = render_page(SEGMENTS, output_format, start, 300)
+            assert len(text) <= 300, output_format
+            pages.append((start, next_index if next_index is not None else len(SEGMENTS), text))
+            start = next_index
+        assert len(pages) > 1
+        assert [p[0] for p in pages[1:]] == [p[1] for p in pages[:-1]]
+        assert pages[-1][1] == len(SEGMENTS)
+        if output_format == FORMAT_SRT:
+            assert pages[1][2].startswith(f"{pages[1][0] + 1}\n")
+        if output_format == FORMAT_JSON:
+            items = [item for _, _, text in pages for item in json.loads(text)]
+            assert [item["text"] for item in items] == SEGMENTS.texts
+
+
+def test_render_page_always_makes_progress():
+    """A segment longer than max_chars still gets a page of its own."""
+    long = Segments([0.0, 1.0], [1.0, 2.0], ["x" * 500, "short"])
+    text, next_index = render_page(long, FORMAT_PLAIN, 0, 100)
+    assert text == "x" * 500 and next_index == 1
+    assert render_page(long, FORMAT_PLAIN, 1, 100) == ("short", None)
+
+
+def _stored_cache(directory: str) -> TranscriptCache:
+    cache = TranscriptCache(os.path.join(directory, "t.sqlite3"), 0, 0)
+    for video_id in (VIDEO_ID, OTHER_ID):
+        cache.put(video_id, SOURCE_CAPTIONS, caption_key(), "Paging", f"https://www.youtube.com/watch?v={video_id}",
+                  "Official YouTube Captions (Manual)", SEGMENTS)
+    return cache
+
+
+def _get(query: str = VIDEO_ID, **kwargs) -> dict:
+    return youtube_tool.get_youtube_transcript(query, cache_only=True, **kwargs)
+
+
+def test_cursor_round_trip():
+    """Following next_cursor returns every segment once, in order, and ends with no cursor."""
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(youtube_tool, "get_transcript_cache", return_value=_stored_cache(directory)):
+        texts, cursor, pages = [], None, 0
+        while True:
+            result = _get(output_format=FORMAT_SRT, max_chars=400, cursor=cursor)
+            assert result["status"] == "success", result
+            texts += result["segments"].texts
+            pages += 1
+            cursor = result["next_cursor"]
+            if cursor is None:
+                break
+        assert pages > 1
+        assert texts == SEGMENTS.texts
+        assert result["page"]["end_segment"] == result["page"]["total_segments"] == len(SEGMENTS)
+
+        # A time range pages over the segments inside it only
+        ranged = _get(start_time=10, end_time=20, max_chars=0)
+        assert ranged["segments"].starts.tolist() == [10.0, 12.0, 14.0, 16.0, 18.0]
+        assert ranged["next_cursor"] is None
+
+
+def test_cursor_rejections():
+    """Malformed cursors, another video's cursor and cursors past the end are errors, not wrong pages."""
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(youtube_tool, "get_transcript_cache", return_value=_stored_cache(directory)):
+        first = _get(max_chars=200)
+        cursor = first["next_cursor"]
+        assert cursor
+
+        assert "Invalid cursor" in _get(cursor="not-a-cursor")["message"]
+        assert "different video" in _get(OTHER_ID, cursor=cursor)["message"]
+        narrow = _get(cursor=cursor, start_time=0, end_time=1)
+        assert narrow["status"] == "error" and "past the end" in narrow["message"]
+        assert _get(start_time=5, end_time=5)["status"] == "error"
+        assert "Unknown output format" in _get(output_format="docx")["message"]
+
+
+def test_cursor_checked_before_any_work():
+    """A foreign or stale cursor is rejected without running the pipeline."""
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(youtube_tool, "get_transcript_cache", return_value=_stored_cache(directory)):
+        cursor = _get(max_chars=200)["next_cursor"]
+
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(youtube_tool, "get_transcript_cache",
+                              return_value=TranscriptCache(os.path.join(directory, "t.sqlite3"), 0, 0)), \
+            mock.patch.object(youtube_tool, "_produce_transcript", side_effect=AssertionError("pipeline ran")):
+        foreign = youtube_tool.get_youtube_transcript(OTHER_ID, cursor=cursor)
+        assert "different video" in foreign["message"]
+        stale = youtube_tool.get_youtube_transcript(VIDEO_ID, cursor=cursor)
+        assert stale["status"] == "error" and stale["cache"] == "miss"
+        assert "without the cursor" in stale["message"]
+
+
+def test_coalesced_callers_get_their_own_range():
+    """Concurrent calls sharing one transcription each get the range and page they asked for."""
+    joined, produced = [], []
+    real_do = youtube_tool._in_flight.do
+
+    def counting_do(key, fn):
+        joined.append(key)
+        result, shared = real_do(key, fn)
+        if shared:
+            time.sleep(0.1)  # let the first caller finish with the shared result before this one reads it
+        return result, shared
+
+    def produce(video_id, title, url, *args):
+        produced.append(video_id)
+        while len(joined) < 2:
+            time.sleep(0.01)
+        time.sleep(0.1)  # let the second caller join the in-flight computation
+        return youtube_tool._success_result(title, url, "Official YouTube Captions (Manual)", SEGMENTS, "miss")
+
+    video = {"video_id": VIDEO_ID, "title": "Paging", "url": f"https://www.youtube.com/watch?v={VIDEO_ID}",
+             "duration": None}
+    results = {}
+
+    def call(name, **kwargs):
+        results[name] = youtube_tool.get_youtube_transcript(VIDEO_ID, **kwargs)
+
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(youtube_tool, "get_transcript_cache",
+                              return_value=TranscriptCache(os.path.join(directory, "t.sqlite3"), 0, 0)), \
+            mock.patch.object(youtube_tool, "_resolve_video", return_value=video), \
+            mock.patch.object(youtube_tool, "_produce_transcript", side_effect=produce), \
+            mock.patch.object(youtube_tool._in_flight, "do", side_effect=counting_do):
+        threads = [threading.Thread(target=call, args=("ranged",), kwargs={"start_time": 20, "end_time": 25}),
+                   threading.Thread(target=call, args=("paged",), kwargs={"max_chars": 200})]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+    assert produced == [VIDEO_ID]
+    assert results["ranged"]["segments"].texts == SEGMENTS.texts[10:13]
+    assert results["ranged"]["next_cursor"] is None
+    paged = results["paged"]
+    assert paged["page"]["total_segments"] == len(SEGMENTS) and paged["next_cursor"]
+    assert paged["segments"].texts == SEGMENTS.texts[:paged["page"]["end_segment"]]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for the transcription scheduler: thread shares, admission order, refusal when the
+queue is full, backend ranking, and the fallback between backends in youtube_tool._run_backends.
+"""
+
+import os
+import sys
+import threading
+import time
+from unittest import mock
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+import scheduler  # noqa: E402
+import youtube_tool  # noqa: E402
+from scheduler import BACKEND_PYTHON, BACKEND_WHISPER_CPP, Plan, SchedulerBusy, TranscribeScheduler  # noqa: E402
+from segments import Segments  # noqa: E402
+
+STARTUP = {BACKEND_WHISPER_CPP: 0.0, BACKEND_PYTHON: 0.0}
+
+
+def _no_external_load(test):
+    """Run the test as if nothing else were using the CPU."""
+    def wrapper():
+        with mock.patch.object(scheduler, "_external_load", return_value=0.0):
+            test()
+    wrapper.__name__ = test.__name__
+    wrapper.__doc__ = test.__doc__
+    return wrapper
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@_no_external_load
+def test_share_splits_the_budget():
+    """A lone transcription gets max_threads; concurrent ones split the budget, never below min_threads."""
+    sched = TranscribeScheduler(budget=12, min_threads=2, max_threads=6, max_running=8, max_queue=4)
+    with sched.admit("tiny", None, STARTUP) as first:
+        assert first.threads == 6
+        with sched.admit("tiny", None, STARTUP) as second:
+            assert second.threads == 6
+            assert sched.snapshot()["allocated_threads"] == 12
+    assert sched.snapshot()["allocated_threads"] == 0
+    with sched._cond:
+        sched._waiting = [object()] * 7
+        assert sched._share() == 2
+        sched._waiting = []
+
+
+@_no_external_load
+def test_waiting_transcriptions_start_in_order():
+    """Transcriptions that can't start wait for threads and start in arrival order."""
+    sched = TranscribeScheduler(budget=4, min_threads=4, max_threads=4, max_running=4, max_queue=4)
+    started = []
+
+    def run(name):
+        with sched.admit("tiny", None, STARTUP) as plan:
+            started.append((name, plan.threads))
+
+    with sched.admit("tiny", None, STARTUP):
+        workers = []
+        for name in ("a", "b", "c"):
+            workers.append(threading.Thread(target=run, args=(name,)))
+            workers[-1].start()
+            _wait_until(lambda: sched.snapshot()["waiting"] == len(workers))
+        assert started == []
+    for worker in workers:
+        worker.join(5)
+    assert started == [("a", 4), ("b", 4), ("c", 4)]
+
+
+@_no_external_load
+def test_refused_only_when_queue_full_and_busy():
+    """max_queue=0 admits on an idle scheduler, refuses while busy, and patient threads wait instead."""
+    sched = TranscribeScheduler(budget=4, min_threads=4, max_threads=4, max_running=4, max_queue=0)
+    sched.refuse_if_busy()
+    with sched.admit("tiny", None, STARTUP):
+        try:
+            sched.refuse_if_busy()
+        except SchedulerBusy as e:
+            assert "busy" in str(e)
+        else:
+            raise AssertionError("expected SchedulerBusy")
+
+        admitted = threading.Event()
+
+        def background():
+            with sched.waits_for_cpu(), sched.admit("tiny", None, STARTUP):
+                admitted.set()
+
+        worker = threading.Thread(target=background)
+        worker.start()
+        _wait_until(lambda: sched.snapshot()["waiting"] == 1)
+        assert not admitted.is_set()
+    worker.join(5)
+    assert admitted.is_set()
+    with sched.admit("tiny", None, STARTUP):
+        pass
+
+
+def test_rank_prefers_predicted_finish():
+    """With a duration, startup plus work decides; without one, cost per audio second does."""
+    sched = TranscribeScheduler(budget=4, min_threads=1, max_threads=4, max_running=1, max_queue=1)
+    cold_cpp = {BACKEND_WHISPER_CPP: 30.0, BACKEND_PYTHON: 0.0}
+    short, estimates = sched.rank("tiny", 10.0, cold_cpp, 4)
+    assert short == [BACKEND_PYTHON, BACKEND_WHISPER_CPP]
+    assert estimates[BACKEND_PYTHON] < estimates[BACKEND_WHISPER_CPP]
+    long, _ = sched.rank("tiny", 3600.0, cold_cpp, 4)
+    assert long == [BACKEND_WHISPER_CPP, BACKEND_PYTHON]
+    unknown, estimates = sched.rank("tiny", None, cold_cpp, 4)
+    assert unknown == [BACKEND_WHISPER_CPP, BACKEND_PYTHON]
+    assert set(estimates.values()) == {None}
+
+
+def test_record_updates_cost():
+    """Measured runs replace the default cost and are smoothed afterwards."""
+    sched = TranscribeScheduler(budget=4, min_threads=1, max_threads=4, max_running=1, max_queue=1)
+    sched.record(BACKEND_PYTHON, "tiny", 100.0, 4, 10.0)
+    assert sched.cost(BACKEND_PYTHON, "tiny") == 0.4
+    sched.record(BACKEND_PYTHON, "tiny", 100.0, 4, 20.0)
+    assert abs(sched.cost(BACKEND_PYTHON, "tiny") - 0.52) < 1e-9
+    sched.record(BACKEND_PYTHON, "tiny", 0.0, 4, 20.0)
+    assert abs(sched.cost(BACKEND_PYTHON, "tiny") - 0.52) < 1e-9
+
+
+def test_run_backends_falls_back_and_raises():
+    """A failing backend falls back to the next; when all fail, TranscriptionFailed is raised."""
+    sched = TranscribeScheduler(budget=4, min_threads=1, max_threads=4, max_running=1, max_queue=1)
+    plan = Plan("tiny", 10.0, 2, [BACKEND_WHISPER_CPP, BACKEND_PYTHON], {})
+    segments = Segments([0.0], [1.0], ["hello"])
+
+    def broken(threads):
+        raise RuntimeError("boom")
+
+    with mock.patch.object(youtube_tool, "get_scheduler", return_value=sched):
+        result, label = youtube_tool._run_backends(plan, lambda threads: None, lambda threads: segments)
+        assert result is segments and label.startswith("Python Whisper")
+        assert (BACKEND_PYTHON, "tiny") in sched._costs
+        for cpp, python in ((lambda threads: None, broken), (broken, lambda threads: None)):
+            try:
+                youtube_tool._run_backends(plan, cpp, python)
+            except youtube_tool.TranscriptionFailed:
+                pass
+            else:
+                raise AssertionError("expected TranscriptionFailed")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for request coalescing (SingleFlight) and the cross-process file lock.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(script_dir)
+sys.path.insert(0, project_root)
+
+from singleflight import SingleFlight, file_lock, try_file_lock  # noqa: E402
+
+
+def _run_concurrently(flight: SingleFlight, key, fn, callers: int) -> list:
+    """Call flight.do(key, fn) from several threads at once; returns each (result, shared) or exception."""
+    outcomes = [None] * callers
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do(key, fn)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+
+def test_concurrent_calls_share_one_run():
+    """Callers arriving while the leader runs get its result, marked shared; fn runs once."""
+    flight = SingleFlight()
+    runs = []
+    release = threading.Event()
+
+    def slow():
+        runs.append(1)
+        release.wait(5)
+        return "transcript"
+
+    timer = threading.Timer(0.3, release.set)
+    timer.start()
+    outcomes = _run_concurrently(flight, ("vid", "tiny"), slow, 5)
+    assert len(runs) == 1
+    assert all(result == "transcript" for result, _ in outcomes)
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True, True]
+
+
+def test_errors_reach_followers_and_key_is_freed():
+    """A failing leader's exception is raised in every caller, and the next call runs afresh."""
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("download failed")
+
+    timer = threading.Timer(0.3, release.set)
+    timer.start()
+    outcomes = _run_concurrently(flight, "vid", failing, 3)
+    assert all(isinstance(o, ValueError) for o in outcomes)
+    assert flight.do("vid", lambda: "retried") == ("retried", False)
+
+
+def test_distinct_keys_run_independently():
+    """Different keys never wait on each other."""
+    flight = SingleFlight()
+    started = threading.Barrier(2, timeout=5)
+
+    def both_running():
+        started.wait()  # only passes if both keys' functions run at the same time
+        return "ok"
+
+    outcomes = []
+    threads = [threading.Thread(target=lambda k=k: outcomes.append(flight.do(k, both_running))) for k in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert outcomes == [("ok", False), ("ok", False)]
+
+
+def test_file_lock_serialises_threads():
+    """Two threads holding the same lock file never overlap."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "locks", "vid.lock")
+        inside, overlaps = [], []
+
+        def work():
+            with file_lock(path):
+                inside.append(1)
+                if len(inside) > 1:
+                    overlaps.append(1)
+                time.sleep(0.1)
+                inside.pop()
+
+        threads = [threading.Thread(target=work) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        assert overlaps == []
+
+
+def test_file_lock_excludes_other_processes():
+    """While another process holds the lock, try_file_lock fails and file_lock waits for its release."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "vid.lock")
+        holder = subprocess.Popen(
+            [sys.executable, "-c",
+             "import sys, time; from singleflight import file_lock\n"
+             f"with file_lock({path!r}):\n    print('locked', flush=True); time.sleep(1)"],
+            cwd=project_root, stdout=subprocess.PIPE, text=True)
+        try:
+            assert holder.stdout.readline().strip() == "locked"
+            with try_file_lock(path) as acquired:
+                assert not acquired
+            start = time.monotonic()
+            with file_lock(path):
+                waited = time.monotonic() - start
+        finally:
+            holder.wait(timeout=10)
+        assert waited > 0.3
+        with try_file_lock(path) as acquired:
+            assert acquired
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
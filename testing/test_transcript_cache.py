@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for the SQLite transcript cache: round trips, expiry and LRU eviction.
+"""
+
+import os
+import sys
+import tempfile
+from unittest import mock
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+from segments import Segments  # noqa: E402
+from transcript_cache import SOURCE_CAPTIONS, SOURCE_WHISPER, TranscriptCache  # noqa: E402
+
+SEGMENTS = Segments([0.0, 2.5], [2.5, 6.0], ["hello there", "general kenobi"])
+
+
+def _put(cache: TranscriptCache, video_id: str, source: str = SOURCE_CAPTIONS, model: str = "") -> None:
+    cache.put(video_id, source, model, f"Title {video_id}", f"https://www.youtube.com/watch?v={video_id}",
+              f"label {source}", SEGMENTS)
+
+
+def _at(seconds: float):
+    """Freeze the cache's clock at seconds."""
+    return mock.patch("transcript_cache.time.time", return_value=seconds)
+
+
+def test_round_trip_and_keys():
+    """An entry reads back with its timestamps, and only under its own (video, source, model) key."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = TranscriptCache(os.path.join(directory, "t.sqlite3"), 0, 0)
+        _put(cache, "video000001", SOURCE_WHISPER, "tiny")
+        entry = cache.get("video000001", SOURCE_WHISPER, "tiny")
+        assert entry["title"] == "Title video000001"
+        assert entry["source_label"] == f"label {SOURCE_WHISPER}"
+        assert entry["segments"].text() == SEGMENTS.text()
+        assert entry["segments"].starts == SEGMENTS.starts
+        assert cache.get("video000001", SOURCE_WHISPER, "base") is None
+        assert cache.get("video000001", SOURCE_CAPTIONS) is None
+        assert cache.get("video000002", SOURCE_WHISPER, "tiny") is None
+
+
+def test_get_best_prefers_captions():
+    """Without a model, captions win over Whisper; with one, only that model's transcript is returned."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = TranscriptCache(os.path.join(directory, "t.sqlite3"), 0, 0)
+        _put(cache, "video000001", SOURCE_WHISPER, "tiny")
+        assert cache.get_best("video000001")["source"] == SOURCE_WHISPER
+        _put(cache, "video000001", SOURCE_CAPTIONS)
+        assert cache.get_best("video000001")["source"] == SOURCE_CAPTIONS
+        assert cache.get_best("video000001", "tiny")["model"] == "tiny"
+        assert cache.get_best("video000001", "base") is None
+
+
+def test_entries_expire_after_ttl():
+    """Entries older than the TTL read as misses and are deleted; younger ones still hit."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = TranscriptCache(os.path.join(directory, "t.sqlite3"), 100, 0)
+        with _at(1000):
+            _put(cache, "video000001")
+        with _at(1099):
+            assert cache.get("video000001", SOURCE_CAPTIONS) is not None
+            assert len(cache.list_entries()) == 1
+        with _at(1101):
+            assert cache.list_entries() == []
+            assert cache.get("video000001", SOURCE_CAPTIONS) is None
+        # The expired row was deleted, not just hidden
+        with _at(1000):
+            assert cache.get("video000001", SOURCE_CAPTIONS) is None
+
+
+def test_lru_eviction_keeps_recently_read_entries():
+    """Over the size cap, the least recently read entries go first."""
+    with tempfile.TemporaryDirectory() as directory:
+        probe = TranscriptCache(os.path.join(directory, "probe.sqlite3"), 0, 0)
+        _put(probe, "video000000")
+        entry_bytes = probe.get("video000000", SOURCE_CAPTIONS)["size_bytes"]
+
+        # Room for two entries, not three
+        cache = TranscriptCache(os.path.join(directory, "t.sqlite3"), 0, 2 * entry_bytes + entry_bytes // 2)
+        with _at(1000):
+            _put(cache, "video000001")
+        with _at(1001):
+            _put(cache, "video000002")
+        with _at(1002):
+            assert cache.get("video000001", SOURCE_CAPTIONS) is not None
+        with _at(1003):
+            _put(cache, "video000003")
+        assert cache.get("video000002", SOURCE_CAPTIONS) is None
+        assert cache.get("video000001", SOURCE_CAPTIONS) is not None
+        assert cache.get("video000003", SOURCE_CAPTIONS) is not None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for the full-text index over the transcript cache.
+"""
+
+import os
+import sys
+import tempfile
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+from segments import Segments  # noqa: E402
+from transcript_cache import SOURCE_CAPTIONS, SOURCE_WHISPER, TranscriptCache  # noqa: E402
+
+LECTURE = Segments(
+    [0.0, 5.0, 10.0, 15.0],
+    [5.0, 10.0, 15.0, 20.0],
+    ["Welcome to the lecture", "today we discuss neural networks", "and how backpropagation works", "thanks for watching"],
+)
+COOKING = Segments([0.0, 30.0], [30.0, 60.0], ["boil the pasta", "then add the sauce"])
+
+
+def _cache(directory: str, max_bytes: int = 0) -> TranscriptCache:
+    cache = TranscriptCache(os.path.join(directory, "transcripts.sqlite3"), 0, max_bytes)
+    cache.put("lectureVid01", SOURCE_CAPTIONS, "", "Lecture", "https://www.youtube.com/watch?v=lectureVid01",
+              "Official YouTube Captions (Manual)", LECTURE)
+    cache.put("cookingVid01", SOURCE_WHISPER, "tiny", "Cooking", "https://www.youtube.com/watch?v=cookingVid01",
+              "Generated by Whisper (tiny)", COOKING)
+    return cache
+
+
+def test_search_finds_segment_timestamp():
+    """A hit names the video, highlights the match and points at the segment it is in."""
+    with tempfile.TemporaryDirectory() as directory:
+        results = _cache(directory).search("backpropagation")
+    assert [r["video_id"] for r in results] == ["lectureVid01"]
+    match = results[0]["matches"][0]
+    assert match["start"] == 10.0
+    assert "**backpropagation**" in match["snippet"]
+
+
+def test_search_syntax_is_plain_text():
+    """Stemming applies, FTS5 operators are plain words, and nothing matching every word falls back to any word."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = _cache(directory)
+        assert [r["video_id"] for r in cache.search("watch")] == ["lectureVid01"]
+        assert [r["video_id"] for r in cache.search('"neural networks" AND (')] == ["lectureVid01"]
+        assert {r["video_id"] for r in cache.search("pasta networks")} == {"lectureVid01", "cookingVid01"}
+        assert cache.search("pasta NEAR sauce")[0]["matches"][0]["start"] == 0.0
+
+
+def test_index_follows_replacement_and_eviction():
+    """Replacing or evicting a transcript removes its old passages from the index."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = _cache(directory)
+        cache.put("cookingVid01", SOURCE_WHISPER, "tiny", "Cooking", "u", "s", Segments([0.0], [1.0], ["grill fish"]))
+        assert cache.search("pasta") == []
+        assert cache.search("grill")[0]["video_id"] == "cookingVid01"
+
+        # A 1-byte cap evicts everything on the next write
+        small = TranscriptCache(cache.db_path, 0, 1)
+        small.put("otherVid0001", SOURCE_CAPTIONS, "", "Other", "u", "s", Segments([0.0], [1.0], ["grill"]))
+        assert small.search("grill") == []
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
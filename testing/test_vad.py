@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for voice activity detection: speech regions in synthetic audio, silence trimming,
+and mapping compacted times back onto the original timeline.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+from audio_stream import SAMPLE_RATE  # noqa: E402
+from segments import Segments  # noqa: E402
+from vad import VAD_PAD, SpeechMap, find_speech, trim_silence  # noqa: E402
+
+FRAME = int(SAMPLE_RATE * 0.03)
+PAD = int(VAD_PAD * SAMPLE_RATE)
+
+
+def _audio(*parts: tuple[str, float]) -> np.ndarray:
+    """Concatenate ('tone' | 'silence', seconds) parts into 16 kHz float audio."""
+    chunks = []
+    for kind, seconds in parts:
+        n = int(seconds * SAMPLE_RATE)
+        if kind == "tone":
+            chunks.append(0.5 * np.sin(2 * np.pi * 220 * np.arange(n) / SAMPLE_RATE))
+        else:
+            chunks.append(np.zeros(n))
+    return np.concatenate(chunks).astype(np.float32)
+
+
+def _near(actual: int, expected: int) -> bool:
+    return abs(actual - expected) <= FRAME
+
+
+def test_find_speech_pads_and_separates_regions():
+    """Tones separated by a long silence are two padded regions; a short pause is bridged."""
+    regions = find_speech(_audio(("silence", 1), ("tone", 1), ("silence", 2), ("tone", 1), ("silence", 1)))
+    assert len(regions) == 2, regions
+    (s1, e1), (s2, e2) = regions
+    assert _near(s1, SAMPLE_RATE - PAD) and _near(e1, 2 * SAMPLE_RATE + PAD), regions
+    assert _near(s2, 4 * SAMPLE_RATE - PAD) and _near(e2, 5 * SAMPLE_RATE + PAD), regions
+
+    bridged = find_speech(_audio(("silence", 1), ("tone", 1), ("silence", 0.5), ("tone", 1), ("silence", 1)))
+    assert len(bridged) == 1, bridged
+    assert find_speech(_audio(("silence", 3))) == []
+    assert find_speech(np.zeros(10, dtype=np.float32)) == []
+
+
+def test_trim_silence_keeps_speech_only():
+    """Trimmed PCM is the kept regions back to back; silent audio is returned whole."""
+    audio = _audio(("silence", 1), ("tone", 1), ("silence", 2), ("tone", 1), ("silence", 1))
+    pcm = (audio * 32767).astype(np.int16).tobytes()
+    trimmed, speech_map = trim_silence(pcm)
+    kept = sum(end - start for start, end in speech_map.regions)
+    assert len(trimmed) == kept * 2 == speech_map.speech_samples * 2
+    assert speech_map.stats()["skipped_fraction"] > 0.4
+
+    silent = np.zeros(SAMPLE_RATE * 2, dtype=np.int16).tobytes()
+    untouched, silent_map = trim_silence(silent)
+    assert untouched == silent
+    assert silent_map.regions == [(0, SAMPLE_RATE * 2)]
+    assert silent_map.to_original(1.5) == 1.5
+
+
+def test_to_original_boundaries():
+    """A time on the join between regions starts the later region, but ends the earlier one."""
+    # Kept 1-3 s and 5-6 s of a 7 s recording: compacted 0-2 s and 2-3 s
+    speech_map = SpeechMap([(SAMPLE_RATE, 3 * SAMPLE_RATE), (5 * SAMPLE_RATE, 6 * SAMPLE_RATE)], 7 * SAMPLE_RATE)
+    assert speech_map.to_original(0.0) == 1.0
+    assert speech_map.to_original(0.0, end=True) == 1.0
+    assert speech_map.to_original(1.0) == 2.0
+    assert speech_map.to_original(2.0) == 5.0
+    assert speech_map.to_original(2.0, end=True) == 3.0
+    assert speech_map.to_original(2.5, end=True) == 5.5
+    # Past the end of the speech stays at the end of the last region
+    assert speech_map.to_original(10.0) == 6.0
+
+    mapped = speech_map.map_segments(Segments([1.5, 2.0, 2.0], [2.0, 2.5, 2.0], ["first", "second", "instant"]))
+    assert list(zip(mapped.starts, mapped.ends)) == [(2.5, 3.0), (5.0, 5.5), (5.0, 5.0)]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Offline tests for parsing video references and normalising search queries.
+"""
+
+import os
+import sys
+import tempfile
+import types
+from unittest import mock
+
+# Add project root to sys.path to allow importing the project modules
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(script_dir))
+
+import youtube_tool  # noqa: E402
+from video_lookup import VideoLookupCache, normalize_query, parse_video_id  # noqa: E402
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+
+def test_parse_video_id_accepts_url_forms():
+    """Every YouTube URL form, with or without scheme and extra parameters, yields the ID."""
+    for url in (
+        VIDEO_ID,
+        f"  {VIDEO_ID}  ",
+        f"https://www.youtube.com/watch?v={VIDEO_ID}&t=42s",
+        f"https://m.youtube.com/watch?feature=share&v={VIDEO_ID}",
+        f"youtube.com/watch?v={VIDEO_ID}",
+        f"https://youtu.be/{VIDEO_ID}?si=abc",
+        f"youtu.be/{VIDEO_ID}",
+        f"https://www.youtube.com/shorts/{VIDEO_ID}",
+        f"https://www.youtube.com/embed/{VIDEO_ID}",
+        f"https://www.youtube.com/live/{VIDEO_ID}?feature=share",
+        f"https://music.youtube.com/watch?v={VIDEO_ID}",
+        f"https://www.youtube-nocookie.com/embed/{VIDEO_ID}",
+    ):
+        assert parse_video_id(url) == VIDEO_ID, url
+
+
+def test_parse_video_id_leaves_searches_alone():
+    """Words that fit the ID alphabet, other sites and malformed IDs are search queries."""
+    for query in (
+        "Programming",
+        "PythonBasic",
+        "JavaScripts",
+        "how to cook pasta",
+        "https://vimeo.com/123456789",
+        "https://www.youtube.com/watch?v=tooShort1",
+        "https://www.youtube.com/playlist?list=PL1234567890",
+        "dQw4w9WgXcQ!",
+        "",
+    ):
+        assert parse_video_id(query) is None, query
+
+
+def test_normalize_query():
+    """Searches ignore case and spacing; every reference to a video shares one key, case preserved."""
+    assert normalize_query("  Never  Gonna\tGive You Up ") == normalize_query("never gonna give you up")
+    assert normalize_query("PythonBasic") == "pythonbasic"
+    assert normalize_query(f"https://youtu.be/{VIDEO_ID}") == f"id:{VIDEO_ID}"
+    assert normalize_query(f"https://www.youtube.com/watch?v={VIDEO_ID}") == normalize_query(VIDEO_ID)
+    assert normalize_query(VIDEO_ID.lower()) != normalize_query(VIDEO_ID)
+
+
+def test_playlist_keeps_letters_only_ids():
+    """Playlist entries are real IDs, so letters-only ones are kept; nested tabs are skipped."""
+    entries = [
+        {"id": VIDEO_ID, "title": "First"},
+        {"id": "AbCdEfGhIjK", "title": "Letters only"},
+        {"id": "UCabcdefghijklmnopqrstuv", "title": "Channel - Videos"},
+        None,
+    ]
+
+    class FakeYoutubeDL:
+        def __init__(self, opts):
+            self.opts = opts
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download=False):
+            return {"entries": entries}
+
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.dict(sys.modules, {"yt_dlp": types.SimpleNamespace(YoutubeDL=FakeYoutubeDL)}), \
+            mock.patch.object(youtube_tool, "get_lookup_cache",
+                              return_value=VideoLookupCache(os.path.join(directory, "l.sqlite3"), 0, 0)):
+        urls = youtube_tool.list_playlist_videos("https://www.youtube.com/playlist?list=PLx", 10)
+    assert urls == [f"https://www.youtube.com/watch?v={VIDEO_ID}", "https://www.youtube.com/watch?v=AbCdEfGhIjK"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"{name}: ok")
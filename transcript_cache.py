@@ -0,0 +1,409 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from segments import Segments
+from settings import CACHE_DIR, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+# Transcript sources we store. Captions have no model, so their model column holds the language
+# selection that picked them instead (see caption_key); Whisper rows hold the model and task.
+SOURCE_CAPTIONS = "captions"
+SOURCE_WHISPER = "whisper"
+
+# Whisper tasks: transcribe in the spoken language, or translate the speech into English
+TASK_TRANSCRIBE = "transcribe"
+TASK_TRANSLATE = "translate"
+
+
+def caption_key(languages: list[str] | None = None, translate_to: str | None = None) -> str:
+    """The model column for captions: '' for the default pick, else e.g. 'de,en' or 'de,en>en' when translated."""
+    key = ",".join(languages or [])
+    return f"{key}>{translate_to}" if translate_to else key
+
+
+def whisper_key(model: str, task: str = TASK_TRANSCRIBE) -> str:
+    """The model column for a Whisper transcript: the model name, suffixed with ':translate' for translations."""
+    return model if task == TASK_TRANSCRIBE else f"{model}:{task}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id     TEXT NOT NULL,
+    source       TEXT NOT NULL,
+    model        TEXT NOT NULL DEFAULT '',
+    title        TEXT,
+    url          TEXT,
+    source_label TEXT,
+    transcript   TEXT NOT NULL,
+    segments     TEXT,
+    size_bytes   INTEGER NOT NULL,
+    created_at   REAL NOT NULL,
+    last_access  REAL NOT NULL,
+    PRIMARY KEY (video_id, source, model)
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_last_access ON transcripts (last_access);
+"""
+
+# The full-text index: each transcript is split into passages of consecutive segments, and
+# passages_fts (rowid = passages.id) indexes their text. segment_offsets maps character offsets
+# in the passage text back to segment start times, so a hit can point at the segment it's in.
+_SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS passages (
+    id              INTEGER PRIMARY KEY,
+    video_id        TEXT NOT NULL,
+    source          TEXT NOT NULL,
+    model           TEXT NOT NULL,
+    start           REAL NOT NULL,
+    segment_offsets TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_passages_key ON passages (video_id, source, model);
+CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5(text, tokenize='porter unicode61');
+"""
+
+# Passage size for the search index: long enough for phrases to match across segment
+# boundaries and for BM25 to have some context, short enough for a useful timestamp.
+_PASSAGE_CHARS = 400
+# Words either side of a match in a search snippet
+_SNIPPET_TOKENS = 12
+# Highlight markers in search snippets
+MATCH_START, MATCH_END = "**", "**"
+# Control characters marking the match in highlight() output, used to find the matching segment
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+
+def _passages(segments: Segments):
+    """Yield (text, start, [[char offset, segment start], ...]) for runs of about _PASSAGE_CHARS characters."""
+    texts, offsets, size = [], [], 0
+    for start, _end, text in segments:
+        offsets.append([size, round(start, 3)])
+        texts.append(text)
+        size += len(text) + 1
+        if size >= _PASSAGE_CHARS:
+            yield " ".join(texts), offsets[0][1], offsets
+            texts, offsets, size = [], [], 0
+    if texts:
+        yield " ".join(texts), offsets[0][1], offsets
+
+
+def match_query(query: str, any_term: bool = False) -> str | None:
+    """
+    Turn free text into an FTS5 query: "quoted phrases" stay phrases, every other word must
+    appear (or any of them, with any_term). FTS5 operators and punctuation are treated as
+    plain text, so no user input can make the query invalid. Returns None for an empty query.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        words = re.findall(r"\w+", phrase or word)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    if not terms:
+        return None
+    return (" OR " if any_term else " ").join(terms)
+
+
+class TranscriptCache:
+    """
+    A persistent transcript store backed by a single SQLite file.
+
+    Entries are keyed by (video_id, source, model). Entries older than ttl_seconds are
+    treated as misses and dropped, and once the stored transcripts exceed max_bytes the
+    least recently read entries are evicted. SQLite handles locking, so the same file can
+    be shared by several threads and several server processes.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_bytes: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.search_enabled = False
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(transcripts)")}
+            if "segments" not in columns:
+                # Caches created before timestamps were kept; their rows read back as one untimed segment
+                conn.execute("ALTER TABLE transcripts ADD COLUMN segments TEXT")
+            self._init_search(conn)
+
+    def _init_search(self, conn: sqlite3.Connection) -> None:
+        """Create the full-text index, indexing any transcripts stored before it existed."""
+        created = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'passages_fts'").fetchone() is None
+        try:
+            conn.executescript(_SEARCH_SCHEMA)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Transcript search disabled; this SQLite build has no FTS5: {e}")
+            return
+        self.search_enabled = True
+        if created:
+            rows = conn.execute("SELECT video_id, source, model, transcript, segments FROM transcripts").fetchall()
+            for row in rows:
+                segments = Segments.from_json(row["segments"]) if row["segments"] else Segments.from_text(
+                    row["transcript"])
+                self._index(conn, row["video_id"], row["source"], row["model"], segments)
+            if rows:
+                logger.info(f"Indexed {len(rows)} stored transcripts for search")
+
+    def _connect(self) -> sqlite3.Connection:
+        # A fresh connection per operation keeps us safe to call from worker threads.
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, video_id: str, source: str, model: str = "") -> dict | None:
+        """
+        Return the cached entry as a dict, or None on a miss or an expired entry.
+        The 'segments' field is decoded into a Segments object.
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT * FROM transcripts WHERE video_id = ? AND source = ? AND model = ?",
+                    (video_id, source, model),
+                ).fetchone()
+                if row is None:
+                    return None
+                if self.ttl_seconds > 0 and now - row["created_at"] > self.ttl_seconds:
+                    logger.info(f"Transcript cache entry expired for {video_id} ({source}/{model or '-'})")
+                    self._delete(conn, video_id, source, model)
+                    return None
+                conn.execute(
+                    "UPDATE transcripts SET last_access = ? WHERE video_id = ? AND source = ? AND model = ?",
+                    (now, video_id, source, model),
+                )
+                entry = dict(row)
+        except sqlite3.Error as e:
+            logger.warning(f"Transcript cache read failed for {video_id}: {e}")
+            return None
+        if entry["segments"]:
+            entry["segments"] = Segments.from_json(entry["segments"])
+        else:
+            entry["segments"] = Segments.from_text(entry["transcript"])
+        return entry
+
+    def get_best(self, video_id: str, model: str | None = None) -> dict | None:
+        """
+        Return the best stored transcript for a video without knowing how it was produced:
+        captions if present, otherwise the most recent Whisper transcript. With model set, only
+        that model's Whisper transcript is considered.
+        """
+        if model:
+            return self.get(video_id, SOURCE_WHISPER, model)
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT source, model FROM transcripts WHERE video_id = ? "
+                    "ORDER BY source = ? DESC, created_at DESC LIMIT 1",
+                    (video_id, SOURCE_CAPTIONS),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Transcript cache read failed for {video_id}: {e}")
+            return None
+        if row is None:
+            return None
+        return self.get(video_id, row["source"], row["model"])
+
+    def list_entries(self, limit: int = 500) -> list[dict]:
+        """Metadata (no transcript text) for the most recently used live entries, newest first."""
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT video_id, source, model, title, url, source_label, size_bytes, created_at, last_access "
+                    "FROM transcripts WHERE created_at >= ? ORDER BY last_access DESC LIMIT ?",
+                    (cutoff, limit),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Transcript cache listing failed: {e}")
+            return []
+        return [dict(row) for row in rows]
+
+    def put(self, video_id: str, source: str, model: str, title: str, url: str,
+            source_label: str, segments: Segments) -> None:
+        """Store (or replace) a transcript, then evict old entries if over the size cap."""
+        now = time.time()
+        transcript = segments.text()
+        segments_json = segments.to_json()
+        size_bytes = len(transcript.encode("utf-8")) + len(segments_json.encode("utf-8"))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcripts "
+                    "(video_id, source, model, title, url, source_label, transcript, segments, size_bytes, created_at, "
+                    "last_access) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (video_id, source, model, title, url, source_label, transcript, segments_json, size_bytes, now,
+                     now),
+                )
+                self._index(conn, video_id, source, model, segments)
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Transcript cache write failed for {video_id}: {e}")
+
+    def _index(self, conn: sqlite3.Connection, video_id: str, source: str, model: str, segments: Segments) -> None:
+        """Replace a transcript's passages in the search index."""
+        if not self.search_enabled:
+            return
+        self._unindex(conn, video_id, source, model)
+        for text, start, offsets in _passages(segments):
+            cursor = conn.execute(
+                "INSERT INTO passages (video_id, source, model, start, segment_offsets) VALUES (?, ?, ?, ?, ?)",
+                (video_id, source, model, start, json.dumps(offsets, separators=(",", ":"))),
+            )
+            conn.execute("INSERT INTO passages_fts (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text))
+
+    def _unindex(self, conn: sqlite3.Connection, video_id: str, source: str, model: str) -> None:
+        if not self.search_enabled:
+            return
+        ids = [row["id"] for row in conn.execute(
+            "SELECT id FROM passages WHERE video_id = ? AND source = ? AND model = ?", (video_id, source, model))]
+        if ids:
+            conn.executemany("DELETE FROM passages_fts WHERE rowid = ?", [(i,) for i in ids])
+            conn.execute("DELETE FROM passages WHERE video_id = ? AND source = ? AND model = ?",
+                         (video_id, source, model))
+
+    def _delete(self, conn: sqlite3.Connection, video_id: str, source: str, model: str) -> None:
+        conn.execute("DELETE FROM transcripts WHERE video_id = ? AND source = ? AND model = ?",
+                     (video_id, source, model))
+        self._unindex(conn, video_id, source, model)
+
+    def search(self, query: str, limit: int = 10, per_video: int = 3) -> list[dict]:
+        """
+        Full-text search over every stored transcript, never touching the network. Returns up to
+        limit videos, best match first, as {'video_id', 'title', 'url', 'source_label', 'matches'},
+        where matches holds up to per_video {'start', 'snippet', 'score'} dicts (start in seconds).
+        Every word must match; if nothing matches all of them, videos matching any word are returned.
+        """
+        if not self.search_enabled:
+            raise RuntimeError("Transcript search needs SQLite with FTS5, which this Python build lacks")
+        all_terms, any_term = match_query(query), match_query(query, any_term=True)
+        if all_terms is None:
+            return []
+        try:
+            with self._connect() as conn:
+                fts_query = all_terms
+                ranked = self._rank(conn, fts_query, limit, per_video)
+                if not ranked and any_term != all_terms:
+                    fts_query = any_term
+                    ranked = self._rank(conn, fts_query, limit, per_video)
+                passages = self._passage_details(conn, fts_query, [pid for pid, _ in ranked])
+        except sqlite3.Error as e:
+            logger.warning(f"Transcript search failed for {query!r}: {e}")
+            return []
+
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0
+        results = {}
+        for passage_id, score in ranked:
+            row = passages.get(passage_id)
+            if row is None or row["created_at"] < cutoff:
+                continue
+            video = results.get(row["video_id"])
+            if video is None:
+                video = results[row["video_id"]] = {
+                    "video_id": row["video_id"], "title": row["title"], "url": row["url"],
+                    "source_label": row["source_label"], "matches": [],
+                }
+            video["matches"].append({
+                "start": _match_start(row["marked"], json.loads(row["segment_offsets"]), row["start"]),
+                "snippet": row["snippet"],
+                "score": round(-score, 3),
+            })
+        return list(results.values())
+
+    @staticmethod
+    def _rank(conn: sqlite3.Connection, fts_query: str, limit: int, per_video: int) -> list[tuple[int, float]]:
+        """
+        (passage id, BM25 score) of the best passages of the best limit videos, in result order.
+        Videos are ranked by their best passage (lower BM25 is better); a video stored by several
+        sources or models is one result, its passages ranked together.
+        """
+        cursor = conn.execute(
+            "SELECT p.video_id, p.id, bm25(passages_fts) AS score FROM passages_fts JOIN passages p "
+            "ON p.id = passages_fts.rowid WHERE passages_fts MATCH ? ORDER BY score",
+            (fts_query,),
+        )
+        videos = {}
+        for video_id, passage_id, score in cursor:
+            hits = videos.get(video_id)
+            if hits is None:
+                if len(videos) >= limit:
+                    continue
+                hits = videos[video_id] = []
+            if len(hits) < per_video:
+                hits.append((passage_id, score))
+        return [hit for hits in videos.values() for hit in hits]
+
+    @staticmethod
+    def _passage_details(conn: sqlite3.Connection, fts_query: str, ids: list[int]) -> dict[int, sqlite3.Row]:
+        """Passage, transcript and snippet columns for the given passages, computed only for those."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = conn.execute(
+            f"SELECT p.*, t.title, t.url, t.source_label, t.created_at, "
+            f"snippet(passages_fts, 0, ?, ?, '...', {_SNIPPET_TOKENS}) AS snippet, "
+            f"highlight(passages_fts, 0, ?, ?) AS marked "
+            f"FROM passages_fts JOIN passages p ON p.id = passages_fts.rowid "
+            f"JOIN transcripts t USING (video_id, source, model) "
+            f"WHERE passages_fts MATCH ? AND passages_fts.rowid IN ({placeholders})",
+            (MATCH_START, MATCH_END, _MARK_START, _MARK_END, fts_query, *ids),
+        ).fetchall()
+        return {row["id"]: row for row in rows}
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop expired entries, then least recently used ones until we fit under max_bytes."""
+        if self.ttl_seconds > 0:
+            expired = conn.execute(
+                "SELECT video_id, source, model FROM transcripts WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            ).fetchall()
+            for row in expired:
+                self._delete(conn, row["video_id"], row["source"], row["model"])
+        if self.max_bytes <= 0:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM transcripts").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        rows = conn.execute(
+            "SELECT video_id, source, model, size_bytes FROM transcripts ORDER BY last_access ASC"
+        ).fetchall()
+        for row in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete(conn, row["video_id"], row["source"], row["model"])
+            total -= row["size_bytes"]
+            evicted += 1
+        logger.info(f"Transcript cache evicted {evicted} entries to stay under {self.max_bytes} bytes")
+
+
+def _match_start(marked: str, segment_offsets: list, passage_start: float) -> float:
+    """The start time of the segment holding the first highlighted match in a passage."""
+    position = marked.find(_MARK_START)
+    start = passage_start
+    for offset, segment_start in segment_offsets:
+        if offset > position:
+            break
+        start = segment_start
+    return start
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """Return the process-wide transcript cache, creating it from the environment on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            db_path = os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join(CACHE_DIR, "transcripts.sqlite3"))
+            ttl_seconds = env_float("TRANSCRIPT_CACHE_TTL", 30 * 24 * 3600)
+            max_bytes = env_int("TRANSCRIPT_CACHE_MAX_MB", 512) * 1024 * 1024
+            logger.info(f"Opening transcript cache at {db_path} (ttl={ttl_seconds}s, max={max_bytes} bytes)")
+            _cache = TranscriptCache(db_path, ttl_seconds, max_bytes)
+        return _cache
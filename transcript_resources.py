@@ -0,0 +1,97 @@
+import logging
+from urllib.parse import parse_qs, quote, urlsplit
+
+from metrics import incr, span
+from segments import FORMAT_JSON, FORMAT_PLAIN, FORMAT_SRT, FORMAT_VTT, OUTPUT_FORMATS, render
+from settings import env_int
+from transcript_cache import SOURCE_WHISPER, get_transcript_cache
+
+logger = logging.getLogger(__name__)
+
+# transcript://<video_id> is the best stored transcript (captions, else the latest Whisper run);
+# ?model=<name> picks a specific Whisper model and ?format=srt|vtt|json changes the rendering.
+SCHEME = "transcript"
+URI_TEMPLATE = "transcript://{video_id}{?model,format}"
+
+# How many stored transcripts resources/list returns, most recently used first
+LIST_LIMIT = env_int("TRANSCRIPT_RESOURCE_LIST_LIMIT", 500)
+# Caps on search_transcripts: videos per search, and matching passages shown per video
+SEARCH_MAX_RESULTS = 50
+SEARCH_MAX_PER_VIDEO = 10
+
+MIME_TYPES = {
+    FORMAT_PLAIN: "text/plain",
+    FORMAT_SRT: "application/x-subrip",
+    FORMAT_VTT: "text/vtt",
+    FORMAT_JSON: "application/json",
+}
+
+
+def transcript_uri(video_id: str, model: str | None = None) -> str:
+    uri = f"{SCHEME}://{quote(video_id, safe='')}"
+    return f"{uri}?model={quote(model)}" if model else uri
+
+
+def parse_transcript_uri(uri: str) -> tuple[str, str | None, str]:
+    """Split a transcript:// URI into (video_id, model or None, output format). Raises ValueError."""
+    parts = urlsplit(uri)
+    if parts.scheme != SCHEME or not parts.netloc:
+        raise ValueError(f"Not a transcript resource: {uri}")
+    params = parse_qs(parts.query)
+    model = params.get("model", [None])[0]
+    output_format = params.get("format", [FORMAT_PLAIN])[0]
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Choose one of: {', '.join(OUTPUT_FORMATS)}")
+    return parts.netloc, model, output_format
+
+
+def list_transcripts() -> list[dict]:
+    """
+    One entry per stored transcript: {'uri', 'name', 'description', 'size'}. Whisper transcripts
+    get a ?model= URI so each model's run (and translation) is addressable; the bare URI is the
+    best one, so of several caption language selections only the most recently used is listed.
+    """
+    resources = []
+    seen = set()
+    for entry in get_transcript_cache().list_entries(LIST_LIMIT):
+        model = entry["model"] if entry["source"] == SOURCE_WHISPER else None
+        uri = transcript_uri(entry["video_id"], model)
+        if uri in seen:
+            continue
+        seen.add(uri)
+        resources.append({
+            "uri": uri,
+            "name": entry["title"] or entry["video_id"],
+            "description": f"{entry['source_label']} - {entry['url']}",
+            "size": entry["size_bytes"],
+        })
+    return resources
+
+
+def read_transcript(uri: str) -> tuple[str, str]:
+    """
+    Read a transcript resource straight from the transcript store; this never downloads or
+    transcribes. Returns (text, mime type). Raises ValueError if nothing is stored for the URI.
+    """
+    video_id, model, output_format = parse_transcript_uri(uri)
+    entry = get_transcript_cache().get_best(video_id, model)
+    if entry is None:
+        raise ValueError(f"No stored transcript for {uri}; call get_youtube_transcript first")
+    logger.info(f"Serving {uri} from the transcript store ({entry['source']}/{entry['model'] or '-'})")
+    return render(entry["segments"], output_format), MIME_TYPES[output_format]
+
+
+def search_transcripts(query: str, limit: int = 10, per_video: int = 3) -> list[dict]:
+    """
+    Search every stored transcript with the full-text index; this never downloads or transcribes.
+    Returns the TranscriptCache.search results, each with the video's transcript:// URI added.
+    """
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+    per_video = max(1, min(per_video, SEARCH_MAX_PER_VIDEO))
+    with span("transcript-search"):
+        results = get_transcript_cache().search(query, limit, per_video)
+    incr("transcript_searches", result="hit" if results else "miss")
+    for result in results:
+        result["uri"] = transcript_uri(result["video_id"])
+    logger.info(f"Transcript search for {query!r} matched {len(results)} videos")
+    return results
@@ -0,0 +1,133 @@
+import logging
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from audio_stream import BYTES_PER_SAMPLE, SAMPLE_RATE
+from metrics import incr
+from segments import Segments
+from settings import env_float
+
+logger = logging.getLogger(__name__)
+
+# Energy-based voice activity detection, run before Whisper so silent intros, pauses and dead air
+# aren't transcribed. Frames louder than the noise floor by VAD_THRESHOLD of the floor-to-peak
+# range count as speech; quieter gaps shorter than VAD_MIN_SILENCE seconds are kept, and every
+# speech region is padded by VAD_PAD seconds so word onsets and tails survive.
+_FRAME_SECONDS = 0.03
+VAD_THRESHOLD = env_float("WHISPER_VAD_THRESHOLD", 0.1)
+VAD_MIN_RMS = env_float("WHISPER_VAD_MIN_RMS", 0.003)
+VAD_MIN_SILENCE = env_float("WHISPER_VAD_MIN_SILENCE", 1.0)
+VAD_MIN_SPEECH = env_float("WHISPER_VAD_MIN_SPEECH", 0.25)
+VAD_PAD = env_float("WHISPER_VAD_PAD", 0.25)
+
+
+def find_speech(samples: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Return the speech regions of 16 kHz float audio as (start, end) sample offsets, padded,
+    merged across short pauses and in order.
+    """
+    frame = int(SAMPLE_RATE * _FRAME_SECONDS)
+    usable = len(samples) - len(samples) % frame
+    if usable == 0:
+        return []
+    energy = np.sqrt(np.mean(samples[:usable].reshape(-1, frame) ** 2, axis=1))
+    floor, peak = np.percentile(energy, 10), np.percentile(energy, 95)
+    threshold = max(VAD_MIN_RMS, floor + (peak - floor) * VAD_THRESHOLD)
+    voiced = energy > threshold
+
+    # Runs of voiced frames as [start, end) frame indices
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    runs = list(zip(edges[::2], edges[1::2]))
+
+    min_gap = int(VAD_MIN_SILENCE / _FRAME_SECONDS)
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    min_run = int(VAD_MIN_SPEECH / _FRAME_SECONDS)
+    pad = int(VAD_PAD * SAMPLE_RATE)
+    regions = []
+    for start, end in merged:
+        if end - start < min_run:
+            continue
+        start, end = max(0, int(start) * frame - pad), min(len(samples), int(end) * frame + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+
+def summarize(audio_seconds: float, speech_seconds: float) -> dict:
+    """The VAD report attached to a result: how much audio there was and how much was skipped."""
+    skipped = max(audio_seconds - speech_seconds, 0.0)
+    return {
+        "audio_seconds": round(audio_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "skipped_fraction": round(skipped / audio_seconds, 4) if audio_seconds else 0.0,
+    }
+
+
+class SpeechMap:
+    """
+    Maps times in the compacted (speech-only) audio back to the original timeline. regions are
+    the (start, end) sample offsets that were kept, in order.
+    """
+
+    def __init__(self, regions: list[tuple[int, int]], total_samples: int):
+        self.regions = regions
+        self.total_samples = total_samples
+        # Where each region starts in the compacted audio, in seconds
+        self._compact_starts = []
+        position = 0
+        for start, end in regions:
+            self._compact_starts.append(position / SAMPLE_RATE)
+            position += end - start
+        self.speech_samples = position
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        """
+        Map a compacted time to the original timeline. A time exactly on the join between two
+        regions is the start of the later region, or with end=True the end of the earlier one, so
+        segment ends don't stretch across the silence that was removed.
+        """
+        find = bisect_left if end else bisect_right
+        index = max(find(self._compact_starts, seconds) - 1, 0)
+        region_start, region_end = self.regions[index]
+        offset = min(seconds - self._compact_starts[index], (region_end - region_start) / SAMPLE_RATE)
+        return region_start / SAMPLE_RATE + max(offset, 0.0)
+
+    def map_segments(self, segments: Segments) -> Segments:
+        mapped = Segments()
+        for start, end, text in segments:
+            original_start = self.to_original(start)
+            mapped.append(original_start, max(self.to_original(end, end=True), original_start), text)
+        return mapped
+
+    def stats(self) -> dict:
+        return summarize(self.total_samples / SAMPLE_RATE, self.speech_samples / SAMPLE_RATE)
+
+
+def trim_silence(pcm: bytes) -> tuple[bytes, SpeechMap]:
+    """
+    Drop the non-speech stretches of 16 kHz mono s16le PCM. Returns the speech-only PCM and the
+    map back to the original timeline. If no speech is found at all, the audio is kept whole:
+    a very quiet recording is better transcribed in full than not at all.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    regions = find_speech(samples.astype(np.float32) / 32768.0)
+    if not regions:
+        logger.info("VAD found no speech; transcribing the whole audio")
+        regions = [(0, len(samples))]
+    speech_map = SpeechMap(regions, len(samples))
+    incr("vad_audio_seconds", len(samples) / SAMPLE_RATE)
+    incr("vad_skipped_seconds", (len(samples) - speech_map.speech_samples) / SAMPLE_RATE)
+    if regions == [(0, len(samples))]:
+        return pcm, speech_map
+    logger.info(f"VAD kept {len(regions)} speech regions: {speech_map.stats()}")
+    trimmed = b"".join(pcm[start * BYTES_PER_SAMPLE:end * BYTES_PER_SAMPLE] for start, end in regions)
+    return trimmed, speech_map
@@ -0,0 +1,186 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+from settings import CACHE_DIR, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+_YOUTUBE_HOSTS = ("youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+                  "youtube-nocookie.com", "www.youtube-nocookie.com")
+_PATH_PREFIXES = ("/shorts/", "/embed/", "/live/", "/v/")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS video_lookups (
+    query      TEXT PRIMARY KEY,
+    video_id   TEXT NOT NULL,
+    title      TEXT,
+    url        TEXT,
+    duration   REAL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def watch_url(video_id: str) -> str:
+    """Return the canonical watch URL for a video ID."""
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+def is_video_id(text: str) -> bool:
+    """True if text is a well-formed video ID, as found in URLs and yt-dlp entries (not free-text queries)."""
+    return bool(_VIDEO_ID_RE.match(text))
+
+
+def _looks_like_video_id(text: str) -> bool:
+    """
+    True if text is shaped like a YouTube video ID.
+    11-letter words, even camel-cased ones (e.g. 'Programming', 'PythonBasic'), also match the ID
+    alphabet, so we only accept strings that contain a digit, '-' or '_'. A letters-only ID is
+    still found, by the search it falls through to.
+    """
+    return is_video_id(text) and any(c.isdigit() or c in "-_" for c in text)
+
+
+def parse_video_id(query: str) -> str | None:
+    """Extract a video ID from a YouTube URL or a bare video ID, or return None for search queries."""
+    text = query.strip()
+    if _looks_like_video_id(text):
+        return text
+
+    if "://" not in text and (text.startswith("youtu") or text.startswith("www.youtu")):
+        text = "https://" + text
+    try:
+        parsed = urlparse(text)
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").lower()
+
+    candidate = None
+    if host in ("youtu.be", "www.youtu.be"):
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            for prefix in _PATH_PREFIXES:
+                if parsed.path.startswith(prefix):
+                    candidate = parsed.path[len(prefix):].split("/")[0]
+                    break
+    if candidate and is_video_id(candidate):
+        return candidate
+    return None
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalise a query so trivially different spellings share a cache entry.
+    Video references keep their case-sensitive ID, so every URL form of a video maps to one key.
+    """
+    video_id = parse_video_id(query)
+    if video_id:
+        return f"id:{video_id}"
+    return " ".join(query.lower().split())
+
+
+class VideoLookupCache:
+    """
+    Maps normalised search queries to (video_id, title, url, duration).
+
+    A bounded in-memory LRU sits in front of a SQLite table so repeat searches within a
+    process cost a dict lookup, and searches seen by earlier processes cost one indexed read.
+    Entries expire after ttl_seconds in both tiers.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float, max_memory_entries: int):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(video_lookups)")}
+            if "duration" not in columns:
+                # Caches created before searches recorded the duration; those rows read back without one
+                conn.execute("ALTER TABLE video_lookups ADD COLUMN duration REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, entry: dict, created_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (entry, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, query: str) -> dict | None:
+        """Return {'video_id', 'title', 'url', 'duration'} for a query, or None if unknown or expired."""
+        key = normalize_query(query)
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                entry, created_at = hit
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    return dict(entry)
+                del self._memory[key]
+
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT video_id, title, url, duration, created_at FROM video_lookups WHERE query = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Video lookup cache read failed: {e}")
+            return None
+        if row is None or self._expired(row[4]):
+            return None
+        entry = {"video_id": row[0], "title": row[1], "url": row[2], "duration": row[3]}
+        self._remember(key, entry, row[4])
+        return dict(entry)
+
+    def put(self, query: str, video_id: str, title: str, url: str, duration: float | None = None) -> None:
+        """Record the resolution of a query in both tiers. duration is in seconds, if known."""
+        key = normalize_query(query)
+        now = time.time()
+        entry = {"video_id": video_id, "title": title, "url": url, "duration": duration}
+        self._remember(key, entry, now)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO video_lookups (query, video_id, title, url, duration, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, video_id, title, url, duration, now),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Video lookup cache write failed: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_lookup_cache() -> VideoLookupCache:
+    """Return the process-wide lookup cache, creating it from the environment on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            db_path = os.getenv("LOOKUP_CACHE_PATH", os.path.join(CACHE_DIR, "lookups.sqlite3"))
+            ttl_seconds = env_float("LOOKUP_CACHE_TTL", 7 * 24 * 3600)
+            max_entries = env_int("LOOKUP_CACHE_MEMORY_ENTRIES", 1024)
+            logger.info(f"Opening video lookup cache at {db_path} (ttl={ttl_seconds}s, memory={max_entries})")
+            _cache = VideoLookupCache(db_path, ttl_seconds, max_entries)
+        return _cache
@@ -0,0 +1,208 @@
+import atexit
+import json
+import logging
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+
+from segments import Segments
+from settings import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+# whisper.cpp's HTTP server binary (examples/server), which keeps the model loaded between requests
+SERVER_BINARY = "whisper-server"
+SERVER_ENABLED = env_bool("WHISPER_CPP_SERVER", True)
+STARTUP_TIMEOUT = env_float("WHISPER_CPP_SERVER_STARTUP_TIMEOUT", 60)
+REQUEST_TIMEOUT = env_float("WHISPER_CPP_SERVER_REQUEST_TIMEOUT", 3600)
+# Resident servers kept at once, one per model. Each holds its model in memory outside the Python
+# model registry's budget; starting one more stops the least recently used idle one.
+MAX_SERVERS = max(1, env_int("WHISPER_CPP_MAX_SERVERS", 1))
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class WhisperCppServer:
+    """
+    A resident whisper.cpp server process bound to localhost.
+
+    The model is loaded once when the process starts; every transcription is then a local
+    HTTP request. whisper-server handles one inference at a time with the thread count it was
+    started with, so a request is only sent while the server is idle and runs with exactly the
+    threads the scheduler gave it; callers use whisper-cli otherwise. A server started with fewer
+    threads is restarted with more, which happens at most a few times as the largest share seen
+    grows. The process is also restarted if it dies, but not once it has been retired to make
+    room for another model's server.
+    """
+
+    def __init__(self, model_path: str, threads: int):
+        self.model_path = model_path
+        self.threads = threads
+        self.port = None
+        self.retired = False
+        self._proc = None
+        self._busy_lock = threading.Lock()
+
+    def _alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self) -> None:
+        self.port = _free_port()
+        cmd = [SERVER_BINARY, '-m', self.model_path, '-t', str(self.threads),
+               '--host', '127.0.0.1', '--port', str(self.port)]
+        logger.info(f"Starting resident whisper.cpp server: {' '.join(cmd)}")
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._proc.poll() is not None:
+                raise RuntimeError(f"whisper-server exited during startup with code {self._proc.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    logger.info(f"whisper.cpp server ready on port {self.port}")
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("whisper-server did not become ready in time")
+
+    def stop(self) -> None:
+        if self._alive():
+            logger.info("Stopping resident whisper.cpp server")
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        self._proc = None
+
+    def idle(self) -> bool:
+        """Whether the server is running and not serving a request."""
+        return self._alive() and not self._busy_lock.locked()
+
+    def accepts(self, threads: int) -> bool:
+        """Whether a request limited to threads would be served right now (transcribe_wav re-checks)."""
+        return not self.retired and not self._busy_lock.locked() and self.threads <= threads
+
+    def transcribe_wav(self, wav_bytes: bytes, threads: int, translate: bool = False) -> Segments | None:
+        """
+        Transcribe 16 kHz WAV bytes with threads CPU threads and return timestamped segments,
+        translated into English if translate is set. Returns None, without waiting, if the server
+        is busy or was started with more threads. Raises on failure.
+        """
+        boundary = uuid.uuid4().hex
+        fields = {"response_format": "verbose_json", "translate": "true" if translate else "false"}
+        body = b"".join([
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="audio.wav"\r\n'
+            f'Content-Type: audio/wav\r\n\r\n'.encode(),
+            wav_bytes,
+            *(f'\r\n--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}'.encode()
+              for name, value in fields.items()),
+            f'\r\n--{boundary}--\r\n'.encode(),
+        ])
+        if not self._busy_lock.acquire(blocking=False):
+            return None
+        try:
+            if self.retired or self.threads > threads:
+                return None
+            if self.threads < threads:
+                logger.info(f"Restarting whisper.cpp server with {threads} threads (was {self.threads})")
+                self.stop()
+                self.threads = threads
+            if not self._alive():
+                self._start()
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{self.port}/inference",
+                data=body,
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                method="POST",
+            )
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                payload = json.loads(response.read().decode("utf-8"))
+        finally:
+            self._busy_lock.release()
+        if "error" in payload:
+            raise RuntimeError(f"whisper-server error: {payload['error']}")
+        segments = Segments()
+        for segment in payload.get("segments") or []:
+            segments.append(float(segment["start"]), float(segment["end"]), segment.get("text", ""))
+        if not segments:
+            # Older servers ignore verbose_json and only return the text
+            return Segments.from_text(payload.get("text", "").strip())
+        return segments
+
+
+_servers = OrderedDict()  # model path -> server, least recently used first
+_servers_lock = threading.Lock()
+_server_binary_available = None
+
+
+def server_binary_available() -> bool:
+    """Whether whisper-server is on PATH. Checked once per process."""
+    global _server_binary_available
+    if _server_binary_available is None:
+        _server_binary_available = shutil.which(SERVER_BINARY) is not None
+        logger.info(f"whisper-server available: {_server_binary_available}")
+    return _server_binary_available
+
+
+def server_idle(model_path: str) -> bool:
+    """Whether a resident server already has this model loaded and is free to take a request."""
+    with _servers_lock:
+        server = _servers.get(model_path)
+    return server is not None and server.idle()
+
+
+def get_server(model_path: str, threads: int) -> WhisperCppServer | None:
+    """
+    Return the resident server for a model, created with threads if there is none yet, or None if
+    server mode is disabled or unavailable.
+    """
+    if not SERVER_ENABLED or not server_binary_available():
+        return None
+    with _servers_lock:
+        server = _servers.get(model_path)
+        if server is None:
+            server = WhisperCppServer(model_path, threads)
+            _servers[model_path] = server
+            _evict_servers()
+        _servers.move_to_end(model_path)
+        return server
+
+
+def _evict_servers() -> None:
+    """
+    Stop least recently used idle servers until at most MAX_SERVERS remain. A server that is
+    serving a request is left alone, so the cap can be exceeded briefly. Caller holds _servers_lock.
+    """
+    for model_path, server in list(_servers.items())[:-1]:
+        if len(_servers) <= MAX_SERVERS:
+            return
+        if not server._busy_lock.acquire(blocking=False):
+            continue
+        try:
+            # Anyone still holding this server falls back to whisper-cli rather than restarting it
+            server.retired = True
+            server.stop()
+        finally:
+            server._busy_lock.release()
+        del _servers[model_path]
+        logger.info(f"Stopped resident whisper.cpp server for {model_path} to stay within {MAX_SERVERS} servers")
+    if len(_servers) > MAX_SERVERS:
+        logger.warning(f"{len(_servers)} resident whisper.cpp servers running, above WHISPER_CPP_MAX_SERVERS="
+                       f"{MAX_SERVERS}, until the busy ones finish")
+
+
+@atexit.register
+def _shutdown_servers():
+    for server in list(_servers.values()):
+        server.stop()
@@ -1,49 +1,228 @@
+import base64
 import logging
 import os
 import subprocess
 import json
-import multiprocessing
-import whisper
-import yt_dlp
-from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
-from yt_dlp.utils import DownloadError
-from pytube import YouTube
-from pytube.exceptions import PytubeError
+import re
+import sys
+import time
+from contextlib import nullcontext
+from audio_cache import KEEP_PCM, KIND_AUDIO, KIND_PCM, get_audio_cache
+from audio_formats import audio_format_selector, describe_format, pick_pytube_stream, ydl_download_options
+from audio_stream import (BYTES_PER_SAMPLE, SAMPLE_RATE, PcmStream, pcm_to_float32, pcm_to_wav_bytes,
+                          resolve_stream_url)
+from concurrency import network_stage
+from singleflight import SingleFlight, file_lock
+from transcript_cache import (SOURCE_CAPTIONS, SOURCE_WHISPER, TASK_TRANSCRIBE, TASK_TRANSLATE, caption_key,
+                              get_transcript_cache, whisper_key)
+from metrics import annotate, incr, request_trace, span
+from model_registry import AVAILABLE_MODELS, MODEL_SIZES_MB, get_model_registry
+from scheduler import BACKEND_PYTHON, BACKEND_WHISPER_CPP, MAX_THREADS, SchedulerBusy, get_scheduler
+from segments import FORMAT_PLAIN, OUTPUT_FORMATS, Segments, render_page
+from settings import env_bool, env_float, env_int
+from whisper_cpp_server import get_server, server_binary_available, server_idle
+from video_lookup import get_lookup_cache, is_video_id, parse_video_id, watch_url
+
+# Heavy backends (whisper/torch, yt-dlp, pytube, the caption client) are imported where they
+# are first used, so importing this module, and therefore starting the MCP server, stays fast.
+# warm_up() loads them in the background once the server is up.
 
 # This will get the logger that was configured in mcp_server.py
 logger = logging.getLogger(__name__)
 
-# A simple cache for the Whisper model so we don't reload it every time
-_whisper_model = None
+# The default Whisper model for both backends; the model is part of the transcript cache key
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")
+
+# Streaming mode pipes the audio through ffmpeg into PCM and transcribes it in chunks while
+# it downloads, instead of writing the MP3 and a WAV to disk first.
+STREAMING_ENABLED = env_bool("WHISPER_STREAMING", False)
+STREAM_CHUNK_SECONDS = env_int("WHISPER_STREAM_CHUNK_SECONDS", 120)
+
+# Voice activity detection: drop silent stretches before Whisper sees the audio (see vad.py).
+# Whole-file audio is decoded to PCM first so both backends get the trimmed audio.
+VAD_ENABLED = env_bool("WHISPER_VAD", False)
+
+# Parallel Python Whisper: long audio is split into ~PARALLEL_CHUNK_SECONDS chunks at quiet points
+# and transcribed across PARALLEL_WORKERS processes. 1 worker keeps the single-process path.
+PARALLEL_WORKERS = env_int("WHISPER_WORKERS", 1)
+PARALLEL_CHUNK_SECONDS = env_float("WHISPER_CHUNK_SECONDS", 300)
+PARALLEL_CHUNK_OVERLAP = env_float("WHISPER_CHUNK_OVERLAP", 2)
+
+# Whisper's translate task only produces English
+WHISPER_TRANSLATE_LANGUAGE = "en"
+
+# Transcripts longer than this many characters are returned a page at a time; later pages are
+# served from the transcript cache. 0 returns the whole transcript in one response.
+PAGE_MAX_CHARS = env_int("TRANSCRIPT_PAGE_MAX_CHARS", 40000)
+
+# Rough model load speed and the one-off torch/Whisper import time, used to estimate what
+# starting a backend costs when its model isn't resident
+_MODEL_LOAD_MB_PER_SECOND = 200
+_TORCH_IMPORT_SECONDS = 3.0
+
+# Result of the one-time whisper.cpp availability check (None until checked)
+_whisper_cpp_available = None
+
+# Coalesces concurrent requests for the same video and mode within this process
+_in_flight = SingleFlight()
 
 
 def _check_whisper_cpp():
-    """Check if whisper.cpp is available in the system PATH."""
+    """
+    Check if whisper.cpp is available in the system PATH.
+    The check spawns a process, so it runs once and the answer is reused for the process lifetime.
+    """
+    global _whisper_cpp_available
+    if _whisper_cpp_available is None:
+        try:
+            result = subprocess.run(['whisper-cli', '--help'],
+                                    capture_output=True,
+                                    text=True)
+            logger.info("whisper.cpp check result: %s", result.returncode == 0)
+            _whisper_cpp_available = result.returncode == 0
+        except FileNotFoundError:
+            logger.info("whisper.cpp not found in PATH")
+            _whisper_cpp_available = False
+    return _whisper_cpp_available
+
+
+def detect_backends():
+    """Probe the transcription backends once at startup so requests never pay for it."""
+    _check_whisper_cpp()
+    server_binary_available()
+
+
+def _whisper_cpp_model_path(model: str):
+    """Return the whisper.cpp model path, or None (with an error logged) if it is missing."""
+    model_path = os.path.join(os.path.dirname(__file__), "models", f"ggml-{model}.bin")
+    if not os.path.exists(model_path):
+        logger.error(f"Model file not found at {model_path}")
+        return None
+    return model_path
+
+
+def _backend_startup(model: str) -> dict:
+    """
+    The backends that can transcribe with model, each with its estimated startup seconds, for the
+    scheduler: nothing if the model is already resident, otherwise the time to load it (plus
+    importing torch, for the first Python Whisper run).
+    """
+    load_seconds = MODEL_SIZES_MB.get(model, 0) / _MODEL_LOAD_MB_PER_SECOND
+    startup = {}
+    model_path = _whisper_cpp_model_path(model) if _check_whisper_cpp() else None
+    if model_path is not None:
+        # whisper-cli loads the model on every run; an idle resident server has it loaded already
+        startup[BACKEND_WHISPER_CPP] = 0.0 if server_idle(model_path) else load_seconds
+    python_startup = 0.0 if model in get_model_registry().loaded() else load_seconds
+    if "whisper" not in sys.modules:
+        python_startup += _TORCH_IMPORT_SECONDS
+    startup[BACKEND_PYTHON] = python_startup
+    return startup
+
+
+class TranscriptionFailed(RuntimeError):
+    """Raised when every Whisper backend in a plan failed to transcribe the audio."""
+
+
+def _run_backends(plan, cpp, python) -> tuple[Segments, str]:
+    """
+    Run a scheduled transcription, trying the plan's backends cheapest first. cpp and python take
+    the thread count and return Segments (None on failure). Returns (segments, source label); the
+    run that succeeds updates the scheduler's cost estimate for its backend. Raises
+    TranscriptionFailed if no backend produced a transcript.
+    """
+    runners = {BACKEND_WHISPER_CPP: cpp, BACKEND_PYTHON: python}
+    labels = {BACKEND_WHISPER_CPP: "whisper.cpp (AI Generated)", BACKEND_PYTHON: "Python Whisper (AI Generated)"}
+    for i, backend in enumerate(plan.backends):
+        last = i == len(plan.backends) - 1
+        started = time.perf_counter()
+        try:
+            segments = runners[backend](plan.threads)
+        except Exception as e:
+            if last:
+                raise TranscriptionFailed(f"Transcription failed with every Whisper backend; {backend}: {e}") from e
+            logger.warning(f"{backend} failed, trying {plan.backends[i + 1]}: {e}", exc_info=True)
+            segments = None
+        if segments or (segments is not None and last):
+            get_scheduler().record(backend, plan.model, plan.duration or segments.duration, plan.threads,
+                                   time.perf_counter() - started)
+            return segments, labels[backend]
+        incr("whisper_cpp_fallback" if backend == BACKEND_WHISPER_CPP else "python_whisper_fallback")
+    raise TranscriptionFailed(f"Transcription failed with every Whisper backend ({', '.join(plan.backends)}).")
+
+
+def _limit_torch_threads(threads: int) -> None:
+    """Apply the scheduler's thread share to torch, if Whisper has loaded it."""
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def preload_models():
+    """Warm the model registry with the models listed in WHISPER_PRELOAD (comma separated)."""
+    names = [name.strip() for name in os.getenv("WHISPER_PRELOAD", "").split(",") if name.strip()]
+    if names:
+        logger.info(f"Preloading Whisper models: {names}")
+        get_model_registry().preload(names)
+
+
+def warm_up():
+    """
+    Load the heavy backends after startup so the first request doesn't pay for them: probe the
+    transcription backends, import yt-dlp and the caption client, then preload WHISPER_PRELOAD models.
+    Meant to run on a background thread; a request that arrives first simply imports what it needs.
+    """
+    started = time.perf_counter()
     try:
-        result = subprocess.run(['whisper-cli', '--help'],
-                                capture_output=True,
-                                text=True)
-        logger.info("whisper.cpp check result: %s", result.returncode == 0)
-        return result.returncode == 0
-    except FileNotFoundError:
-        logger.info("whisper.cpp not found in PATH")
-        return False
+        detect_backends()
+        with span("warm-up:imports"):
+            import yt_dlp  # noqa: F401
+            import caption_client  # noqa: F401
+        preload_models()
+    except Exception as e:
+        logger.error(f"Background warm-up failed: {e}", exc_info=True)
+        return
+    logger.info(f"Background warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+def _is_download_error(e: Exception) -> bool:
+    """Whether e is a yt-dlp DownloadError, without importing yt-dlp just to find out."""
+    utils = sys.modules.get("yt_dlp.utils")
+    return utils is not None and isinstance(e, utils.DownloadError)
 
 
-def _transcribe_with_whisper_cpp(audio_path):
+@span("whisper.cpp")
+def _transcribe_with_whisper_cpp(audio_path, model, task=TASK_TRANSCRIBE, threads=MAX_THREADS):
     """
-    Transcribe audio using whisper.cpp.
-    Returns the transcript text if successful, None if failed.
+    Transcribe audio using whisper.cpp with the given thread count, or translate it into English
+    when task is 'translate'. Returns timestamped Segments if successful, None if failed.
     """
     try:
         logger.info("Attempting transcription with whisper.cpp...")
-        model_path = os.path.join(os.path.dirname(__file__), "models", "ggml-tiny.bin")
-        if not os.path.exists(model_path):
-            logger.error(f"Model file not found at {model_path}")
+        model_path = _whisper_cpp_model_path(model)
+        if model_path is None:
             return None
 
-        # Convert MP3 to WAV
-        wav_path = audio_path.replace('.mp3', '.wav')
+        # Prefer the resident server when it is free: the model is already loaded and the WAV never touches disk
+        server = get_server(model_path, threads)
+        if server is not None and server.accepts(threads):
+            decode_result = subprocess.run(
+                ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', audio_path,
+                 '-ar', str(SAMPLE_RATE), '-ac', '1', '-f', 'wav', 'pipe:1'],
+                capture_output=True
+            )
+            if decode_result.returncode == 0:
+                try:
+                    segments = server.transcribe_wav(decode_result.stdout, threads, translate=task == TASK_TRANSLATE)
+                    if segments is not None:
+                        return segments
+                except Exception as e:
+                    logger.warning(f"Resident whisper.cpp server failed, falling back to whisper-cli: {e}")
+            else:
+                logger.warning(f"Failed to decode audio for whisper.cpp server: {decode_result.stderr!r}")
+
+        # Convert to WAV in the cache's tmp dir (cached blobs have no extension to swap)
+        wav_path = get_audio_cache().tmp_path(".wav")
         logger.info(f"Converting {audio_path} to WAV format...")
         convert_result = subprocess.run(
             ['ffmpeg', '-y', '-i', audio_path, wav_path],
@@ -57,19 +236,12 @@ def _transcribe_with_whisper_cpp(audio_path):
         # Run whisper.cpp on the WAV file
         json_output_path = wav_path + '.json'
 
-        # Determine thread count
-        thread_env = os.getenv("WHISPER_THREADS")
-        try:
-            threads = int(thread_env) if thread_env else multiprocessing.cpu_count()
-        except ValueError:
-            threads = multiprocessing.cpu_count()
-
         cmd = [
             'whisper-cli',
             '-m', model_path,
             '-t', str(threads),  # multi-threading
             '--output-json-full',
-            '--no-timestamps',
+            *(['-tr'] if task == TASK_TRANSLATE else []),
             wav_path
         ]
         logger.info(f"Running whisper.cpp command: {' '.join(cmd)}")
@@ -95,10 +267,12 @@ def _transcribe_with_whisper_cpp(audio_path):
                 except Exception as e:
                     logger.warning(f"Failed to remove JSON output file: {e}")
 
-                # Extract text from the full JSON output
-                segments = output.get('transcription', [])
-                text = ' '.join(seg.get('text', '') for seg in segments)
-                return text.strip()
+                # Offsets in the full JSON output are in milliseconds
+                segments = Segments()
+                for seg in output.get('transcription', []):
+                    offsets = seg.get('offsets', {})
+                    segments.append(offsets.get('from', 0) / 1000, offsets.get('to', 0) / 1000, seg.get('text', ''))
+                return segments
             except (json.JSONDecodeError, FileNotFoundError) as e:
                 logger.error(f"Failed to read whisper.cpp JSON output: {e}")
                 return None
@@ -110,6 +284,170 @@ def _transcribe_with_whisper_cpp(audio_path):
         return None
 
 
+@span("python-whisper")
+def _transcribe_with_python_whisper(audio, model_name: str, task: str = TASK_TRANSCRIBE,
+                                    threads: int | None = None) -> Segments:
+    """
+    Transcribe (or, with task='translate', translate into English) a file path or a 16 kHz float32
+    array with Python Whisper. Long audio is split at quiet points and spread over a process pool
+    when WHISPER_WORKERS > 1; everything else runs on the in-process model. Either way at most
+    threads CPU threads are used.
+    """
+    if PARALLEL_WORKERS > 1:
+        if isinstance(audio, str):
+            import whisper
+            audio = whisper.load_audio(audio)
+        if len(audio) > 2 * PARALLEL_CHUNK_SECONDS * SAMPLE_RATE:
+            from parallel_whisper import transcribe_parallel
+            logger.info("Starting parallel Python Whisper transcription...")
+            segments = transcribe_parallel(audio, model_name, PARALLEL_WORKERS, PARALLEL_CHUNK_SECONDS,
+                                           PARALLEL_CHUNK_OVERLAP, task, threads)
+            logger.info("Parallel Python Whisper transcription complete.")
+            return Segments(*zip(*segments)) if segments else Segments()
+
+    with get_model_registry().use(model_name) as model:
+        if threads:
+            _limit_torch_threads(threads)
+        logger.info(f"Starting Python Whisper {task} with '{model_name}'...")
+        result = model.transcribe(audio, fp16=False, task=task)
+    logger.info("Python Whisper transcription complete.")
+    return _whisper_result_segments(result)
+
+
+def _whisper_result_segments(result: dict) -> Segments:
+    """Timestamped segments from a Python Whisper transcribe() result."""
+    segments = Segments()
+    for seg in result.get("segments", []):
+        segments.append(seg["start"], seg["end"], seg["text"])
+    return segments
+
+
+# whisper-cli prints one "[00:00:01.000 --> 00:00:04.500]  text" line per segment
+_CLI_SEGMENT_LINE = re.compile(r"^\[(\d+):(\d+):(\d+(?:\.\d+)?) --> (\d+):(\d+):(\d+(?:\.\d+)?)\]\s*(.*)$")
+
+
+def _parse_whisper_cli_output(stdout: str) -> Segments:
+    segments = Segments()
+    for line in stdout.splitlines():
+        match = _CLI_SEGMENT_LINE.match(line.strip())
+        if match:
+            h1, m1, s1, h2, m2, s2, text = match.groups()
+            segments.append(int(h1) * 3600 + int(m1) * 60 + float(s1), int(h2) * 3600 + int(m2) * 60 + float(s2),
+                            text)
+    return segments
+
+
+@span("whisper.cpp")
+def _transcribe_wav_bytes_with_whisper_cpp(wav_bytes: bytes, model_path: str, task: str = TASK_TRANSCRIBE,
+                                           threads: int = MAX_THREADS):
+    """
+    Transcribe an in-memory WAV with the given thread count, preferring the resident whisper.cpp
+    server when it is free and otherwise piping it to whisper-cli's stdin ('-f -').
+    Returns timestamped Segments, or None if whisper.cpp failed.
+    """
+    server = get_server(model_path, threads)
+    if server is not None:
+        try:
+            segments = server.transcribe_wav(wav_bytes, threads, translate=task == TASK_TRANSLATE)
+            if segments is not None:
+                return segments
+        except Exception as e:
+            logger.warning(f"Resident whisper.cpp server failed, falling back to whisper-cli: {e}")
+
+    cmd = [
+        'whisper-cli',
+        '-m', model_path,
+        '-t', str(threads),
+        '--no-prints',
+        *(['-tr'] if task == TASK_TRANSLATE else []),
+        '-f', '-'
+    ]
+    result = subprocess.run(cmd, input=wav_bytes, capture_output=True)
+    if result.returncode != 0:
+        logger.error(f"whisper.cpp failed on streamed chunk: {result.stderr.decode('utf-8', errors='replace')}")
+        return None
+    return _parse_whisper_cli_output(result.stdout.decode("utf-8", errors="replace"))
+
+
+def _transcribe_streaming(video_url: str, model_name: str, pcm_out_path: str | None = None,
+                          task: str = TASK_TRANSCRIBE) -> tuple[Segments | None, str, dict | None, dict | None]:
+    """
+    Stream the audio through ffmpeg into 16 kHz PCM and transcribe it chunk by chunk while the
+    rest is still downloading. Avoids writing the MP3 and the intermediate WAV to disk.
+    If pcm_out_path is given, the decoded PCM is also written there for the audio cache. With
+    WHISPER_VAD each chunk is trimmed to its speech regions before transcription.
+    Returns (segments, source label, download info, VAD report), or (None, "Not Available", None, None)
+    so the caller can fall back to the download-then-transcribe path. ffmpeg reads the whole
+    stream, so the bytes fetched are the stream's size as reported by yt-dlp.
+    """
+    with network_stage("resolve-stream"):
+        stream = resolve_stream_url(video_url)
+    if stream is None:
+        return None, "Not Available", None, None
+    stream_url, headers, stream_format = stream
+    download = {
+        "method": "stream",
+        "format": stream_format["format"],
+        "bytes_fetched": stream_format["filesize"],
+        "resumed_bytes": 0,
+        "duration": stream_format["duration"],
+    }
+
+    if VAD_ENABLED:
+        from vad import summarize, trim_silence
+    segments = Segments()
+    offset = 0.0  # start of the current chunk, in seconds
+    speech_seconds = 0.0
+    previous_text = ""
+    # Chunks are transcribed as they arrive, so the whole stream runs on the backend the scheduler
+    # ranks first. Its timings include waiting for the network, so they don't update cost estimates.
+    with get_scheduler().admit(model_name, stream_format["duration"], _backend_startup(model_name)) as plan:
+        use_cpp = plan.backends[0] == BACKEND_WHISPER_CPP
+        model_path = _whisper_cpp_model_path(model_name) if use_cpp else None
+        transcript_source = ("whisper.cpp (AI Generated, streamed)" if use_cpp
+                             else "Python Whisper (AI Generated, streamed)")
+        model_context = nullcontext() if use_cpp else get_model_registry().use(model_name)
+        pcm_out = open(pcm_out_path, "wb") if pcm_out_path else nullcontext()
+        with model_context as model, pcm_out, PcmStream(stream_url, headers, STREAM_CHUNK_SECONDS) as pcm:
+            if not use_cpp:
+                _limit_torch_threads(plan.threads)
+            for index, chunk in enumerate(pcm):
+                if pcm_out_path:
+                    pcm_out.write(chunk)
+                chunk_seconds = len(chunk) / (SAMPLE_RATE * BYTES_PER_SAMPLE)
+                logger.info(f"Transcribing streamed chunk {index} ({int(chunk_seconds)}s)...")
+                speech_map = None
+                if VAD_ENABLED:
+                    with span("vad"):
+                        chunk, speech_map = trim_silence(chunk)
+                    speech_seconds += speech_map.speech_samples / SAMPLE_RATE
+                if use_cpp:
+                    chunk_segments = _transcribe_wav_bytes_with_whisper_cpp(pcm_to_wav_bytes(chunk), model_path, task,
+                                                                            plan.threads)
+                    if chunk_segments is None:
+                        return None, "Not Available", None, None
+                else:
+                    # Feed the tail of the previous chunk as a prompt so words keep flowing across boundaries
+                    prompt = previous_text[-200:] or None
+                    chunk_segments = _whisper_result_segments(
+                        model.transcribe(pcm_to_float32(chunk), fp16=False, initial_prompt=prompt, task=task))
+                if speech_map is not None:
+                    chunk_segments = speech_map.map_segments(chunk_segments)
+                # Chunk timestamps start at 0, so shift them to the chunk's place in the stream
+                segments.extend(chunk_segments, offset)
+                previous_text = chunk_segments.text()
+                offset += chunk_seconds
+            logger.info(f"Streaming transcription complete ({pcm.bytes_decoded} PCM bytes decoded).")
+
+    vad_report = summarize(offset, speech_seconds) if VAD_ENABLED else None
+    return segments, _task_label(transcript_source, task), download, vad_report
+
+
+def _task_label(label: str, task: str) -> str:
+    """Mark a Whisper source label as a translation when the translate task produced it."""
+    return f"{label} [translated to English]" if task == TASK_TRANSLATE else label
+
+
 def _yt_dlp_hook(d):
     """
     A hook for yt-dlp to capture its progress. We use this to prevent it from
@@ -121,41 +459,56 @@ def _yt_dlp_hook(d):
     # We ignore the 'downloading' status to prevent log spam.
 
 
-def _download_audio_with_fallbacks(video_url: str, audio_path: str) -> bool:
+def _download_audio_with_fallbacks(video_url: str, audio_path: str) -> dict | None:
     """
     Tries to download audio, first with yt-dlp, then with pytube as a fallback.
-    Returns True if download is successful, False otherwise.
+    Both pick the smallest audio-only format that is good enough for ASR (see audio_formats).
+    yt-dlp resumes a partial download left at audio_path by an earlier attempt and fetches
+    DASH fragments concurrently.
+    Returns {'method', 'format', 'bytes_fetched', 'resumed_bytes', 'duration'} on success, None
+    otherwise. duration is the video's length in seconds from the extractor's metadata, if known.
     """
+    import yt_dlp
+    from yt_dlp.utils import DownloadError
+
+    part_path = audio_path + '.part'
+    resumed_bytes = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if resumed_bytes:
+        logger.info(f"Resuming partial download ({resumed_bytes} bytes already fetched)")
+
     # --- Attempt 1: yt-dlp (Primary Method) ---
     try:
-        logger.info(f"Attempting audio download with yt-dlp...")
-        ydl_opts_audio = {
-            'format': 'bestaudio/best',
-            'outtmpl': audio_path,
-            'quiet': True,
-            'noprogress': True,
-            'overwrites': True,
-            'logger': logger,
-            'progress_hooks': [_yt_dlp_hook],
+        logger.info(f"Attempting audio download with yt-dlp (format '{audio_format_selector()}')...")
+        with yt_dlp.YoutubeDL(ydl_download_options(audio_path, [_yt_dlp_hook])) as ydl:
+            info = ydl.extract_info(video_url, download=True)
+        total_bytes = os.path.getsize(audio_path)
+        download = {
+            "method": "yt-dlp",
+            "format": describe_format(info or {}),
+            "bytes_fetched": max(total_bytes - resumed_bytes, 0),
+            "resumed_bytes": resumed_bytes,
+            "duration": (info or {}).get("duration"),
         }
-        with yt_dlp.YoutubeDL(ydl_opts_audio) as ydl:
-            ydl.download([video_url])
-        logger.info("Audio download with yt-dlp complete.")
-        return True
+        logger.info(f"Audio download with yt-dlp complete: {download}")
+        _count_download(download)
+        return download
     except DownloadError as e:
         logger.warning(f"yt-dlp failed to download audio: {e}. Falling back to pytube.")
     except Exception as e:
         logger.error(f"An unexpected error occurred with yt-dlp: {e}. Falling back to pytube.")
+    incr("ytdlp_fallback_to_pytube")
 
     # --- Attempt 2: pytube (Fallback Method) ---
+    from pytube import YouTube
+    from pytube.exceptions import PytubeError
     try:
         logger.info("Attempting audio download with pytube...")
         yt = YouTube(video_url)
-        # Get the best available audio stream (usually .mp4 container with audio)
-        audio_stream = yt.streams.filter(only_audio=True).order_by('abr').desc().first()
+        audio_stream = pick_pytube_stream(yt.streams)
         if not audio_stream:
-            logger.error("Pytube could not find any audio-only streams.")
-            return False
+            logger.error("Pytube could not find any usable streams.")
+            incr("audio_downloads", method="failed")
+            return None
 
         # pytube downloads to a file with its own name, so we download and then rename if needed.
         # Or, we can specify the filename directly.
@@ -163,139 +516,548 @@ def _download_audio_with_fallbacks(video_url: str, audio_path: str) -> bool:
         file_name = os.path.basename(audio_path)
 
         audio_stream.download(output_path=output_dir, filename=file_name)
-        logger.info("Audio download with pytube complete.")
-        return True
+        download = {
+            "method": "pytube",
+            "format": f"{audio_stream.itag} {audio_stream.mime_type} {audio_stream.abr or ''}".strip(),
+            "bytes_fetched": os.path.getsize(audio_path),
+            "resumed_bytes": 0,
+            "duration": yt.length,
+        }
+        logger.info(f"Audio download with pytube complete: {download}")
+        _count_download(download)
+        return download
     except PytubeError as e:
         logger.error(f"Pytube also failed to download audio: {e}")
-        return False
     except Exception as e:
         logger.error(f"An unexpected error occurred with pytube: {e}")
-        return False
+    incr("audio_downloads", method="failed")
+    return None
+
+
+def _count_download(download: dict) -> None:
+    incr("audio_downloads", method=download["method"])
+    incr("audio_bytes_fetched", download["bytes_fetched"], method=download["method"])
+
+
+def _resolve_video(query: str) -> dict:
+    """
+    Resolve a query to {'video_id', 'title', 'url', 'duration'}.
+    YouTube URLs and bare video IDs are parsed locally (title and duration are None until we learn
+    them), previously seen searches come from the lookup cache, and anything else runs a yt-dlp search.
+    The search is a flat probe: it reads the result listing only, without resolving formats or
+    streaming manifests, which the caption path never needs. Formats are resolved when audio is
+    actually downloaded or streamed.
+    """
+    lookup_cache = get_lookup_cache()
+    video_id = parse_video_id(query)
+    if video_id:
+        logger.info(f"Query is a direct video reference ({video_id}), skipping search.")
+        incr("lookups", result="direct")
+        cached = lookup_cache.get(video_id)
+        return {
+            "video_id": video_id,
+            "title": cached["title"] if cached else None,
+            "url": watch_url(video_id),
+            "duration": cached["duration"] if cached else None,
+        }
+
+    cached = lookup_cache.get(query)
+    if cached is not None:
+        logger.info(f"Lookup cache hit for query '{query}' -> {cached['video_id']}")
+        incr("lookups", result="cache_hit")
+        return cached
+    incr("lookups", result="search")
+
+    # Search for the video and get its info (using yt-dlp for robust search)
+    import yt_dlp
+    logger.info("Searching for video with yt-dlp to get info...")
+    ydl_opts_info = {
+        'extract_flat': 'in_playlist',
+        'noplaylist': True,
+        'default_search': 'ytsearch',
+        'quiet': True,
+        'noprogress': True,
+        'logger': logger,
+    }
+    with network_stage("search"), yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
+        info = ydl.extract_info(query, download=False)
+        video_info = info['entries'][0] if 'entries' in info else info
+
+    video = {
+        "video_id": video_info.get("id"),
+        "title": video_info.get("title", "Unknown Title"),
+        # Flat search entries carry the watch URL as 'url'; fully extracted pages as 'webpage_url'
+        "url": video_info.get("webpage_url") or video_info.get("url"),
+        "duration": video_info.get("duration"),
+    }
+    if video["video_id"]:
+        lookup_cache.put(query, video["video_id"], video["title"], video["url"], video["duration"])
+        # Also remember the title and duration under the ID so later direct-ID queries can use them
+        lookup_cache.put(video["video_id"], video["video_id"], video["title"], video["url"], video["duration"])
+    return video
+
+
+def list_playlist_videos(url: str, limit: int) -> list[str]:
+    """
+    Return watch URLs for up to limit videos of a playlist or channel URL.
+    Uses flat extraction, so only the listing is fetched, not every video's formats; the titles
+    it returns are stored in the lookup cache so the per-video calls can skip searching.
+    """
+    import yt_dlp
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'playlistend': limit,
+        'quiet': True,
+        'noprogress': True,
+        'logger': logger,
+    }
+    with network_stage("playlist"), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    lookup_cache = get_lookup_cache()
+    urls = []
+    for entry in info.get('entries') or []:
+        video_id = entry.get('id') if entry else None
+        if not video_id or not is_video_id(video_id):
+            # Channel pages list their tabs (Videos, Shorts, ...) as nested playlists; skip those
+            continue
+        video_url = watch_url(video_id)
+        if entry.get('title'):
+            lookup_cache.put(video_id, video_id, entry['title'], video_url, entry.get('duration'))
+        urls.append(video_url)
+        if len(urls) >= limit:
+            break
+    logger.info(f"Playlist {url} expanded to {len(urls)} videos")
+    return urls
+
+
+def _success_result(title: str, url: str, source: str, segments: Segments, cache_status: str,
+                    download: dict | None = None, vad: dict | None = None) -> dict:
+    """
+    Build the success payload returned by get_youtube_transcript: the plain transcript plus its
+    timestamped segments (rendered into the requested format later). download describes the audio
+    fetched for this request (method, format, bytes_fetched, resumed_bytes); bytes_fetched is 0
+    when nothing was downloaded (captions, cache hits, cached audio). vad reports how much audio
+    voice activity detection kept from Whisper (audio_seconds, speech_seconds, skipped_fraction).
+    """
+    return {
+        "status": "success",
+        "title": title,
+        "url": url,
+        "source": source,
+        "transcript": segments.text(),
+        "segments": segments,
+        "cache": cache_status,
+        "bytes_fetched": download["bytes_fetched"] if download else 0,
+        "download": download,
+        "vad": vad
+    }
+
+
+def _fetch_official_transcript(video_id: str, languages: list[str] | None = None,
+                               translate_to: str | None = None) -> tuple[Segments | None, str]:
+    """
+    Fetch the official YouTube transcript for a video, ranked by the language preferences and
+    translated server-side by YouTube if needed (see caption_client.select_captions).
+    Returns (segments, source label), or (None, "Not Available") if there is none.
+    """
+    from caption_client import fetch_best_captions
+    from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled
+
+    logger.info("Attempting to fetch official YouTube transcript...")
+    try:
+        with network_stage("captions"):
+            captions = fetch_best_captions(video_id, languages, translate_to)
+        if captions:
+            logger.info("Successfully fetched official YouTube transcript.")
+            return captions
+        logger.info("No official transcript found for this video.")
+
+    except NoTranscriptFound:
+        logger.info("No official transcript found for this video (NoTranscriptFound exception).")
+    except TranscriptsDisabled:
+        logger.info("Transcripts are disabled for this video.")
+    except Exception as e:
+        logger.warning(f"Error fetching official transcript: {e}", exc_info=True)
+    return None, "Not Available"
+
+
+@span("ffmpeg-decode")
+def _decode_to_pcm(audio_path: str) -> str | None:
+    """Decode audio to 16 kHz mono s16le PCM in the audio cache's tmp dir. Returns the tmp path or None."""
+    pcm_tmp = get_audio_cache().tmp_path(".pcm")
+    result = subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', audio_path,
+         '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), pcm_tmp],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        logger.warning(f"Failed to decode audio to PCM: {result.stderr}")
+        if os.path.exists(pcm_tmp):
+            os.remove(pcm_tmp)
+        return None
+    return pcm_tmp
+
+
+def _transcribe_pcm(pcm_path: str, model: str,
+                    task: str = TASK_TRANSCRIBE) -> tuple[Segments, str, dict | None]:
+    """
+    Transcribe 16 kHz PCM with whisper.cpp or Python Whisper, with no ffmpeg pass. With
+    WHISPER_VAD only the speech regions are transcribed and timestamps are mapped back onto the
+    full audio. Returns (segments, source label, VAD report or None); raises TranscriptionFailed
+    if no backend could transcribe it.
+    """
+    with open(pcm_path, "rb") as f:
+        pcm = f.read()
+    speech_map = None
+    if VAD_ENABLED:
+        from vad import trim_silence
+        with span("vad"):
+            pcm, speech_map = trim_silence(pcm)
+
+    # The PCM's length is exactly the audio Whisper will see
+    duration = len(pcm) / (SAMPLE_RATE * BYTES_PER_SAMPLE)
+    with get_scheduler().admit(model, duration, _backend_startup(model)) as plan:
+        segments, transcript_source = _run_backends(
+            plan,
+            lambda threads: _transcribe_wav_bytes_with_whisper_cpp(pcm_to_wav_bytes(pcm),
+                                                                   _whisper_cpp_model_path(model), task, threads),
+            lambda threads: _transcribe_with_python_whisper(pcm_to_float32(pcm), model, task, threads),
+        )
+    if speech_map is None:
+        return segments, transcript_source, None
+    return speech_map.map_segments(segments), transcript_source, speech_map.stats()
+
+
+def _transcribe_with_whisper(video_id: str | None, video_title: str, video_url: str, model: str,
+                             task: str = TASK_TRANSCRIBE) -> dict:
+    """
+    Download the audio and transcribe it with whisper.cpp, falling back to Python whisper. With
+    task='translate' the speech is translated into English instead; the audio cache is shared.
+    Audio (and, with AUDIO_CACHE_KEEP_PCM, the decoded PCM) comes from the managed audio cache
+    when present, so re-transcribing with another model skips the download and possibly ffmpeg.
+    Work on a video's artifacts runs under a per-video file lock; whoever waited re-checks the
+    transcript cache before redoing work. Without a video ID nothing is cached: the audio goes to
+    a scratch file that is removed afterwards.
+    """
+    cache = get_transcript_cache()
+    audio_cache = get_audio_cache()
+    cache_model = whisper_key(model, task)
+    # Refuse before downloading anything if the transcription would be refused anyway
+    get_scheduler().refuse_if_busy()
+
+    with file_lock(audio_cache.lock_path(video_id)) if video_id else nullcontext():
+        if video_id:
+            cached = cache.get(video_id, SOURCE_WHISPER, cache_model)
+            if cached is not None:
+                logger.info(f"Transcript for {video_id} was produced by another worker while we waited.")
+                return _success_result(video_title, video_url, cached["source_label"], cached["segments"], "hit")
+
+        pcm_path = audio_cache.get(video_id, KIND_PCM) if video_id else None
+        audio_path = None
+        download = None
+        if pcm_path is not None:
+            logger.info(f"Using cached PCM for {video_id}; skipping download and decode.")
+        elif video_id:
+            audio_path = audio_cache.get(video_id, KIND_AUDIO)
+        incr("audio_cache", result="pcm_hit" if pcm_path else "audio_hit" if audio_path else "miss")
+
+        if pcm_path is None and audio_path is None and STREAMING_ENABLED:
+            pcm_tmp = audio_cache.tmp_path(".pcm") if KEEP_PCM and video_id else None
+            try:
+                segments, transcript_source, download, vad_report = _transcribe_streaming(video_url, model, pcm_tmp,
+                                                                                          task)
+            except SchedulerBusy:
+                raise
+            except Exception as e:
+                logger.warning(f"Streaming transcription failed, falling back to full download: {e}", exc_info=True)
+                segments = None
+            if segments:
+                if pcm_tmp:
+                    audio_cache.put(video_id, KIND_PCM, pcm_tmp)
+                if video_id:
+                    cache.put(video_id, SOURCE_WHISPER, cache_model, video_title, video_url, transcript_source,
+                              segments)
+                return _success_result(video_title, video_url, transcript_source, segments, "miss",
+                                       download, vad_report)
+            if pcm_tmp and os.path.exists(pcm_tmp):
+                os.remove(pcm_tmp)
+
+        scratch_audio = None
+        if pcm_path is None and audio_path is None:
+            # A stable path per video, so a download interrupted by a crash or timeout resumes
+            download_path = audio_cache.partial_path(video_id) if video_id else audio_cache.tmp_path()
+            logger.info(f"Downloading audio to: {download_path}")
+            with network_stage("download"):
+                download = _download_audio_with_fallbacks(video_url, download_path)
+
+            if download is None:
+                message = "Failed to download audio using all available methods (yt-dlp, pytube)."
+                logger.error(message)
+                return {"status": "error", "message": message}
+            if video_id:
+                audio_path = audio_cache.put(video_id, KIND_AUDIO, download_path)
+            else:
+                audio_path = scratch_audio = download_path
+
+        vad_report = None
+        pcm_tmp = None
+        try:
+            # VAD works on decoded PCM; it is only kept in the audio cache with AUDIO_CACHE_KEEP_PCM
+            keep_pcm = KEEP_PCM and video_id is not None
+            if pcm_path is None and (keep_pcm or VAD_ENABLED):
+                pcm_tmp = _decode_to_pcm(audio_path)
+                if pcm_tmp and keep_pcm:
+                    pcm_path = audio_cache.put(video_id, KIND_PCM, pcm_tmp)
+                    pcm_tmp = None
+
+            # Transcription is CPU-bound, so the scheduler admits it against the CPU budget and picks the backend
+            if pcm_path is not None or pcm_tmp is not None:
+                segments, transcript_source, vad_report = _transcribe_pcm(pcm_path or pcm_tmp, model, task)
+            else:
+                duration = download["duration"] if download else None
+                if duration is None and video_id:
+                    # Audio from the cache: fall back to the duration the search probe recorded
+                    known = get_lookup_cache().get(video_id)
+                    duration = known["duration"] if known else None
+                with get_scheduler().admit(model, duration, _backend_startup(model)) as plan:
+                    segments, transcript_source = _run_backends(
+                        plan,
+                        lambda threads: _transcribe_with_whisper_cpp(audio_path, model, task, threads),
+                        lambda threads: _transcribe_with_python_whisper(audio_path, model, task, threads),
+                    )
+        finally:
+            for path in (pcm_tmp, scratch_audio):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+        transcript_source = _task_label(transcript_source, task)
+        if video_id and segments:
+            cache.put(video_id, SOURCE_WHISPER, cache_model, video_title, video_url, transcript_source, segments)
+    return _success_result(video_title, video_url, transcript_source, segments, "miss", download, vad_report)
 
 
-def get_youtube_transcript(query: str, force_whisper: bool = False) -> dict:
+def _produce_transcript(video_id: str | None, video_title: str, video_url: str, force_whisper: bool,
+                        model: str, languages: list[str] | None = None, translate_to: str | None = None) -> dict:
+    """
+    Produce a transcript after a cache miss: official captions first (unless forced), in the
+    preferred language or translated by YouTube, then Whisper, whose translate task covers
+    translate_to='en' when no captions could be translated.
+    """
+    # --- 3. Try to get the official transcript FIRST (unless forced to Whisper) ---
+    if not force_whisper and video_id:
+        segments, transcript_source = _fetch_official_transcript(video_id, languages, translate_to)
+        if segments:
+            get_transcript_cache().put(video_id, SOURCE_CAPTIONS, caption_key(languages, translate_to), video_title,
+                                       video_url, transcript_source, segments)
+            return _success_result(video_title, video_url, transcript_source, segments, "miss")
+
+    if translate_to and translate_to.split("-")[0].lower() != WHISPER_TRANSLATE_LANGUAGE:
+        return {"status": "error", "message": f"No captions could be translated to '{translate_to}', and Whisper can "
+                                              f"only translate into English."}
+
+    # --- 4. If no official transcript or force_whisper, use Whisper (audio download + transcribe) ---
+    logger.info(
+        "Proceeding to audio download and Whisper transcription as no official transcript was available or force_whisper is True.")
+    task = TASK_TRANSLATE if translate_to else TASK_TRANSCRIBE
+    try:
+        return _transcribe_with_whisper(video_id, video_title, video_url, model, task)
+    except (SchedulerBusy, TranscriptionFailed) as e:
+        logger.warning(str(e))
+        return {"status": "error", "message": str(e)}
+
+
+def _encode_cursor(video_key: str, index: int) -> str:
+    """An opaque page cursor: the video it belongs to and the first segment of the next page."""
+    return base64.urlsafe_b64encode(json.dumps({"v": video_key, "i": index}).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(data["v"]), int(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def get_youtube_transcript(query: str, force_whisper: bool = False, model: str | None = None,
+                           output_format: str = FORMAT_PLAIN, start_time: float | None = None,
+                           end_time: float | None = None, cursor: str | None = None,
+                           max_chars: int | None = None, languages: list[str] | None = None,
+                           translate_to: str | None = None, cache_only: bool = False) -> dict:
     """
     Searches for a YouTube video, downloads it, and returns the transcript.
     It will try to get an official transcript first, unless force_whisper is True.
     If force_whisper is True, it will try whisper.cpp first, then fall back to Python whisper.
+    model selects the Whisper model (see model_registry.AVAILABLE_MODELS); defaults to WHISPER_MODEL.
+    languages ranks caption languages by preference (e.g. ['de', 'en']); translate_to asks for the
+    transcript in one language, using YouTube's caption translation where available and otherwise
+    Whisper's translate task (English only). Neither re-transcribes audio when captions will do.
+    output_format is one of segments.OUTPUT_FORMATS (plain, srt, vtt, json), and start_time /
+    end_time (seconds) limit the transcript to the segments overlapping that range; the
+    result's 'segments' holds the same range as Segments.
+    Transcripts longer than max_chars (default TRANSCRIPT_PAGE_MAX_CHARS) are split into pages on
+    segment boundaries; 'next_cursor' is set while more pages remain, and passing it back with the
+    same arguments returns the next page straight from the cache. A cursor for another video, or
+    for a transcript that is no longer stored, is an error; nothing is fetched or transcribed for it.
+    Transcripts are served from the on-disk transcript cache when available; the
+    'cache' field of the result is 'hit' or 'miss' accordingly. Concurrent calls for the
+    same video and mode share a single computation. With cache_only, a video URL or ID is read
+    from the cache alone; when it isn't there, the error result's 'cache' is 'miss' and nothing is
+    searched, fetched or transcribed.
     """
-    global _whisper_model
-    logger.info(f"get_youtube_transcript called with query: '{query}', force_whisper: {force_whisper}")
+    model = model or WHISPER_MODEL
+    languages = [code.strip() for code in languages or [] if code and code.strip()] or None
+    translate_to = translate_to.strip() if translate_to and translate_to.strip() else None
+    logger.info(f"get_youtube_transcript called with query: '{query}', force_whisper: {force_whisper}, model: {model}, "
+                f"format: {output_format}, range: {start_time}-{end_time}, languages: {languages}, "
+                f"translate_to: {translate_to}")
+    if model not in AVAILABLE_MODELS:
+        return {"status": "error", "message": f"Unknown Whisper model '{model}'. Choose one of: {', '.join(AVAILABLE_MODELS)}"}
+    if output_format not in OUTPUT_FORMATS:
+        return {"status": "error", "message": f"Unknown output format '{output_format}'. Choose one of: {', '.join(OUTPUT_FORMATS)}"}
+    if start_time is not None and end_time is not None and end_time <= start_time:
+        return {"status": "error", "message": "end_time must be greater than start_time"}
+    page_start = 0
+    if cursor:
+        try:
+            cursor_video, page_start = _decode_cursor(cursor)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+    max_chars = PAGE_MAX_CHARS if max_chars is None else max_chars
 
-    try:
-        # --- 1. Search for the video and get its info (using yt-dlp for robust search) ---
-        logger.info("Searching for video with yt-dlp to get info...")
-        ydl_opts_info = {
-            'format': 'bestaudio/best',
-            'noplaylist': True,
-            'default_search': 'ytsearch',
-            'quiet': True,
-            'noprogress': True,
-            'logger': logger,
-        }
-        with yt_dlp.YoutubeDL(ydl_opts_info) as ydl:
-            info = ydl.extract_info(query, download=False)
-            video_info = info['entries'][0] if 'entries' in info else info
+    with request_trace("get_youtube_transcript", query=query, model=model, force_whisper=force_whisper) as trace:
+        if cursor:
+            result = _get_cursor_transcript(query, cursor_video, force_whisper, model, languages, translate_to)
+        elif cache_only:
+            result = _get_cached_transcript(query, force_whisper, model, languages, translate_to)
+        else:
+            result = _get_transcript(query, force_whisper, model, languages, translate_to)
+        trace["status"] = result.get("status")
+        if result.get("status") == "success":
+            annotate(cache=result["cache"], source=result["source"], bytes_fetched=result["bytes_fetched"])
+    if result.get("status") != "success":
+        return result
+    video_key = result["url"]
 
-        video_url = video_info.get("webpage_url")
-        video_title = video_info.get("title", "Unknown Title")
-        video_id = video_info.get("id")  # Get video ID for transcript API
-        logger.info(f"Found video: '{video_title}' (ID: {video_id}) at {video_url}")
+    # The result may be shared with coalesced callers asking for other ranges and pages, so it is
+    # only read here; this call's page goes into a new dict
+    segments = result["segments"].slice(start_time, end_time)
+    if page_start > len(segments):
+        return {"status": "error", "message": "Cursor is past the end of the transcript."}
+    page_max = max_chars if max_chars > 0 else float("inf")
+    text, next_index = render_page(segments, output_format, page_start, page_max)
+    page_end = next_index if next_index is not None else len(segments)
+    return {
+        **result,
+        "segments": segments[page_start:page_end],
+        "transcript": text,
+        "format": output_format,
+        "page": {"first_segment": page_start, "end_segment": page_end, "total_segments": len(segments)},
+        "next_cursor": _encode_cursor(video_key, next_index) if next_index is not None else None,
+        # Per-stage seconds for this request (search, captions, download, transcribe, ...)
+        "timings": dict(trace["stages"], total=trace["seconds"]),
+    }
 
-        transcript_text = None
-        transcript_source = "Not Available"
 
-        # --- 2. Try to get the official transcript FIRST (unless forced to Whisper) ---
-        if not force_whisper and video_id:
-            logger.info("Attempting to fetch official YouTube transcript...")
-            try:
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-                # Prioritize manually created transcripts, then auto-generated
-                transcript_obj = None
-                for t in transcript_list:
-                    if t.is_generated:
-                        # Keep auto-generated as a fallback, but prefer manual
-                        if transcript_obj is None:
-                            transcript_obj = t
-                    else:
-                        # Found a manual transcript, use it immediately
-                        transcript_obj = t
-                        break  # Found best option, exit loop
-
-                if transcript_obj:
-                    # Fetch the actual transcript parts
-                    transcript_parts = transcript_obj.fetch()
-                    transcript_text = " ".join([item.text for item in transcript_parts])
-                    transcript_source = f"Official YouTube Captions ({'Generated' if transcript_obj.is_generated else 'Manual'})"
-                    logger.info("Successfully fetched official YouTube transcript.")
-                else:
-                    logger.info("No official transcript found for this video.")
+def _produce_and_count(video_id: str | None, video_title: str, video_url: str, force_whisper: bool,
+                       model: str, languages: list[str] | None, translate_to: str | None) -> dict:
+    """_produce_transcript, counting the backend that produced each new transcript."""
+    result = _produce_transcript(video_id, video_title, video_url, force_whisper, model, languages, translate_to)
+    if result.get("status") == "success" and result.get("cache") == "miss":
+        incr("transcripts_produced", source=result["source"])
+    return result
 
-            except NoTranscriptFound:
-                logger.info("No official transcript found for this video (NoTranscriptFound exception).")
-            except TranscriptsDisabled:
-                logger.info("Transcripts are disabled for this video.")
-            except Exception as e:
-                logger.warning(f"Error fetching official transcript: {e}", exc_info=True)
-
-        if transcript_text:
-            return {
-                "status": "success",
-                "title": video_title,
-                "url": video_url,
-                "source": transcript_source,
-                "transcript": transcript_text
-            }
-
-        # --- 3. If no official transcript or force_whisper, use Whisper (audio download + transcribe) ---
-        # This block only runs if transcript_text is still None after the official transcript attempt
-        logger.info(
-            "Proceeding to audio download and Whisper transcription as no official transcript was available or force_whisper is True.")
-        output_dir = os.path.join(os.path.dirname(__file__), "testing", "audio_cache")
-        os.makedirs(output_dir, exist_ok=True)
-        audio_path = os.path.join(output_dir, f"{video_info.get('id', 'default_id')}.mp3")
-
-        logger.info(f"Downloading audio to: {audio_path}")
-        download_successful = _download_audio_with_fallbacks(video_url, audio_path)
-
-        if not download_successful:
-            message = "Failed to download audio using all available methods (yt-dlp, pytube)."
-            logger.error(message)
-            return {"status": "error", "message": message}
-
-        # First try whisper.cpp if available
-        if _check_whisper_cpp():
-            transcript_text = _transcribe_with_whisper_cpp(audio_path)
-            if transcript_text:
-                transcript_source = "whisper.cpp (AI Generated)"
-                logger.info("Successfully transcribed using whisper.cpp")
-
-        # Fall back to Python whisper if whisper.cpp failed or isn't available
-        if transcript_text is None:
-            logger.info("Falling back to Python whisper...")
-            transcript_source = "Python Whisper (AI Generated)"
-
-            if _whisper_model is None:
-                logger.info("Whisper model not loaded. Loading 'tiny' model now...")
-                _whisper_model = whisper.load_model("tiny")
-                logger.info("Whisper model 'tiny' loaded successfully.")
-
-            logger.info("Starting Python Whisper transcription...")
-            result = _whisper_model.transcribe(audio_path, fp16=False)
-            transcript_text = result["text"]
-            logger.info("Python Whisper transcription complete.")
 
-        return {
-            "status": "success",
-            "title": video_title,
-            "url": video_url,
-            "source": transcript_source,
-            "transcript": transcript_text
-        }
+def _lookup_cached(video_id: str, force_whisper: bool, model: str, languages: list[str] | None,
+                   translate_to: str | None) -> dict | None:
+    """The cached transcript for a video and mode: captions unless forced to Whisper, then Whisper."""
+    cache = get_transcript_cache()
+    cached = None
+    if not force_whisper:
+        cached = cache.get(video_id, SOURCE_CAPTIONS, caption_key(languages, translate_to))
+    if cached is None:
+        task = TASK_TRANSLATE if translate_to else TASK_TRANSCRIBE
+        cached = cache.get(video_id, SOURCE_WHISPER, whisper_key(model, task))
+    return cached
+
+
+def _get_cached_transcript(query: str, force_whisper: bool, model: str, languages: list[str] | None = None,
+                           translate_to: str | None = None) -> dict:
+    """Return the transcript for a video URL or ID from the cache only, or an error result with cache 'miss'."""
+    video_id = parse_video_id(query)
+    if video_id is None:
+        return {"status": "error", "message": f"'{query}' is not a YouTube video URL or ID."}
+    cached = _lookup_cached(video_id, force_whisper, model, languages, translate_to)
+    if cached is None:
+        return {"status": "error", "cache": "miss",
+                "message": "The transcript is no longer stored (it expired or was evicted from the cache)."}
+    annotate(video_id=video_id)
+    return _success_result(cached["title"] or "Unknown Title", watch_url(video_id), cached["source_label"],
+                           cached["segments"], "hit")
+
+
+def _get_cursor_transcript(query: str, cursor_video: str, force_whisper: bool, model: str,
+                           languages: list[str] | None = None, translate_to: str | None = None) -> dict:
+    """
+    Return the stored transcript a cursor pages through. The query is resolved first (locally for
+    URLs and IDs), and a cursor for another video, or for a transcript that has left the cache, is
+    rejected before anything is fetched or transcribed.
+    """
+    try:
+        video = _resolve_video(query)
+    except Exception as e:
+        logger.error(f"Could not resolve '{query}' to check its cursor: {e}", exc_info=True)
+        return {"status": "error", "message": f"Could not find video info: {e}"}
+    if not video["video_id"] or parse_video_id(cursor_video) != video["video_id"]:
+        return {"status": "error", "message": "This cursor belongs to a different video; repeat the original query."}
+    result = _get_cached_transcript(watch_url(video["video_id"]), force_whisper, model, languages, translate_to)
+    if result.get("cache") == "miss":
+        result["message"] += " Repeat the query without the cursor to produce it again."
+    return result
+
+
+def _get_transcript(query: str, force_whisper: bool, model: str, languages: list[str] | None = None,
+                    translate_to: str | None = None) -> dict:
+    """Resolve the query and return the full transcript result from the cache or a fresh run."""
+    try:
+        # --- 1. Resolve the query to a video (local URL/ID parse, lookup cache, then yt-dlp search) ---
+        video = _resolve_video(query)
+        video_url = video["url"]
+        video_title = video["title"] or "Unknown Title"
+        video_id = video["video_id"]  # Get video ID for transcript API
+        logger.info(f"Found video: '{video_title}' (ID: {video_id}) at {video_url}")
+        annotate(video_id=video_id)
+
+        # --- 2. Check the transcript cache before doing any network or Whisper work ---
+        if video_id:
+            cached = _lookup_cached(video_id, force_whisper, model, languages, translate_to)
+            if cached is not None:
+                logger.info(f"Transcript cache hit for {video_id} ({cached['source']}/{cached['model'] or '-'})")
+                if not video["title"] and cached["title"]:
+                    video_title = cached["title"]
+                incr("transcript_cache", result="hit")
+                return _success_result(video_title, video_url, cached["source_label"], cached["segments"], "hit")
+            logger.info(f"Transcript cache miss for {video_id}")
+            incr("transcript_cache", result="miss")
+        else:
+            return _produce_and_count(video_id, video_title, video_url, force_whisper, model, languages, translate_to)
+
+        # Concurrent callers asking for the same video in the same mode wait on one computation
+        result, shared = _in_flight.do(
+            (video_id, force_whisper, model, caption_key(languages, translate_to)),
+            lambda: _produce_and_count(video_id, video_title, video_url, force_whisper, model, languages,
+                                       translate_to),
+        )
+        if shared:
+            incr("coalesced_requests")
+            annotate(coalesced=True)
+        return result
 
-    except DownloadError as e:
-        logger.error(f"yt-dlp download error during info extraction: {e}", exc_info=True)
-        return {"status": "error", "message": f"Could not find video info or initial download failed: {e}"}
     except Exception as e:
+        if _is_download_error(e):
+            logger.error(f"yt-dlp download error during info extraction: {e}", exc_info=True)
+            return {"status": "error", "message": f"Could not find video info or initial download failed: {e}"}
         logger.error(f"An unexpected error occurred in get_youtube_transcript: {e}", exc_info=True)
         return {"status": "error", "message": f"An unexpected error occurred: {str(e)}"}